@@ -1,11 +1,13 @@
 from picarx import Picarx
+from picarx.calibration import GrayscaleCalibrator
 import time
 import threading
 import readchar 
 import os
 
 px = Picarx()
-config_path = px.CONFIG
+calibrator = GrayscaleCalibrator(px)
+config_path = px.config.path
 
 manual = f'''\
         ┌────────────────────────────────────┐
@@ -73,16 +75,10 @@ def read_data_loop():
 
     while run_flag:
         try:
-            current_grayscale_value = px.get_grayscale_data()
+            # the calibrator owns the sensor while it is sampling
+            if cali_status != 'work':
+                current_grayscale_value = px.get_grayscale_data()
 
-            # calculate the reference
-            if cali_status == 'work':
-                for i in range(3):
-                    if current_grayscale_value[i] < thresholds[i][0]:
-                        thresholds[i][0] = current_grayscale_value[i]
-                    if current_grayscale_value[i] > thresholds[i][1]:
-                        thresholds[i][1] = current_grayscale_value[i]
-                    line_reference[i] = int((thresholds[i][0] + thresholds[i][1])/2)
             if cali_status == 'done':
                 if (cliff_reference[0] < line_reference[0]) and (cliff_reference[1] < line_reference[1]) and (cliff_reference[2] < line_reference[2]):
                     cliff_reference[0] = int((cliff_reference[0] + line_reference[0]) / 2)
@@ -148,36 +144,13 @@ def start_line_calibrate():
         global current_mode, cali_status, thresholds
         current_mode = 'line_cali'
         cali_status = 'work'
-        # reset thresholds
+        result = calibrator.calibrate_line()
+        line_reference[:] = result.reference
+        # robust spread of each channel, for display
         thresholds = [
-            [4096, 0], # min, max
-            [4096, 0],
-            [4096, 0],
+            [int(calibrator.histogram.percentile(i, 1)), int(calibrator.histogram.percentile(i, 99))]
+            for i in range(3)
         ]
-        _angle = 35
-        _delay = 0.8
-        # front left
-        px.set_dir_servo_angle(-_angle)
-        px.forward(10)
-        time.sleep(_delay)
-        # back left
-        px.backward(10)
-        time.sleep(_delay)
-        # stop
-        px.set_dir_servo_angle(0)
-        px.stop()
-        time.sleep(0.2)
-        # front right
-        px.set_dir_servo_angle(_angle)
-        px.forward(10)
-        time.sleep(_delay)
-        # back right
-        px.backward(10)
-        time.sleep(_delay)
-        # stop
-        px.set_dir_servo_angle(0)
-        px.stop()
-        time.sleep(0.2)
         current_mode = 'line_cali_done'
         cali_status = 'done'
     line_calibrate_thread = threading.Thread(target=line_calibrate_work)
@@ -187,32 +160,12 @@ def start_line_calibrate():
 # cliff reference calibration
 def start_cliff_calibrate():
     def cliff_calibrate_work():
-        global current_mode, cliff_reference, thresholds
+        global current_mode, cliff_reference, cali_status
         current_mode = 'cliff_cali'
-        count = 0
-        _left_val = 0
-        _mid_val = 0
-        _right_val = 0
-
-        while True:
-            _left_val += current_grayscale_value[0]
-            _mid_val += current_grayscale_value[1]
-            _right_val += current_grayscale_value[2]
-            if count >= 10:
-                break
-            else:
-                count += 1
-            time.sleep(0.2)
-
-        _left_val /= 10
-        _mid_val /= 10
-        _right_val /= 10
-
-        if _left_val < thresholds[0][0] and _mid_val < thresholds[1][0] and _right_val < thresholds[2][0]:
-            _left_val = int((_left_val + thresholds[0][0]) / 2)
-            _mid_val = int((_mid_val + thresholds[1][0]) / 2)
-            _right_val = int((_right_val + thresholds[2][0]) / 2)
-        cliff_reference = [int(_left_val), int(_mid_val), int(_right_val)]
+        cali_status = 'work'
+        result = calibrator.calibrate_cliff()
+        cliff_reference = result.reference
+        cali_status = 'none'
         current_mode = 'cliff_cali_done'
 
     cliff_calibrate_thread = threading.Thread(target=cliff_calibrate_work)
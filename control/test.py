@@ -3,6 +3,9 @@ from flask import Flask, request, jsonify, Response
 import time
 import cv2
 from picarx import Picarx   # Assumes Picarx is available as provided
+from picarx.arbiter import CommandArbiter
+from picarx.vision import VisionControl
+from picarx.telemetry import Telemetry
 from vilib import Vilib     # Handles video feed and detection
 
 app = Flask(__name__)
@@ -11,6 +14,19 @@ app = Flask(__name__)
 car = Picarx()
 Vilib.camera_start(vflip=False, hflip=False, size=(640, 480))
 
+# All browser tabs drive through one arbiter channel, so the motors get a
+# single coherent target per control tick and repeated commands are not
+# re-sent to the hardware.
+arbiter = CommandArbiter(car)
+web_channel = arbiter.channel('web', priority=1, timeout=0)
+# Detector toggles only reach Vilib when they actually change.
+vision = VisionControl(Vilib)
+# Live state for every open page, serialized once per tick and pushed over
+# Server-Sent Events.
+TELEMETRY_RATE = 10
+telemetry = Telemetry(car, rate=TELEMETRY_RATE,
+                      extra=lambda: {'speed': drive_speed, 'owner': arbiter.owner('speed')})
+
 # Defaults
 DEFAULT_SPEED      = 50
 STEERING_ANGLE     = 30
@@ -20,6 +36,7 @@ AVAILABLE_COLORS   = ["red", "orange", "yellow", "green", "blue", "purple", "mag
 
 # State
 current_speed    = DEFAULT_SPEED
+drive_speed      = 0   # signed speed actually requested
 current_steering = 0
 current_pan      = 0
 current_tilt     = 0
@@ -55,6 +72,7 @@ def index():
     #colorSelect {{ font-size:.9em; padding:2px; }}
     #videoFeed {{ display:block; margin:20px auto; border:2px solid #333; }}
     #status {{ margin:10px auto; text-align:center; font-size:1.1em; }}
+    #telemetry {{ margin:10px auto; text-align:center; font-size:.95em; color:#444; }}
     #instructions {{ margin:10px auto; text-align:center; }}
     span.value {{ font-weight:bold; }}
     button.popup {{ padding:4px 8px; }}
@@ -84,6 +102,12 @@ def index():
      | Pan: <span id="panValue" class="value">{current_pan}</span>°
      | Tilt: <span id="tiltValue" class="value">{current_tilt}</span>°
   </div>
+  <div id="telemetry">
+    PWM L/R: <span id="pwmValue" class="value">-</span>
+     | Grayscale: <span id="grayValue" class="value">-</span>
+     | Distance: <span id="distValue" class="value">-</span> cm
+     | Control: <span id="ownerValue" class="value">-</span>
+  </div>
   <div id="instructions">
     <p>
       <strong>Drive:</strong> W/S: Forward/Backward, A/D: Left/Right<br>
@@ -93,6 +117,16 @@ def index():
   </div>
   <script>
     let motorInt, steerInt, panInt, tiltInt;
+    const telemetry = new EventSource('/telemetry');
+    telemetry.onmessage = e => {{
+      const s = JSON.parse(e.data);
+      document.getElementById('pwmValue').innerText  = s.pwm.join(' / ');
+      document.getElementById('grayValue').innerText = s.gray ? s.gray.join(', ') : '-';
+      document.getElementById('distValue').innerText = s.dist !== undefined ? s.dist : '-';
+      document.getElementById('ownerValue').innerText = s.owner || 'none';
+      document.getElementById('panValue').innerText  = s.pan;
+      document.getElementById('tiltValue').innerText = s.tilt;
+    }};
     document.getElementById('faceToggle').addEventListener('change', function() {{
       sendCmd(this.checked ? 'enable_face' : 'disable_face');
     }});
@@ -236,7 +270,7 @@ def calibrate_tilt():
 @app.route('/keypress', methods=['POST'])
 def keypress():
     global current_speed, current_steering, current_pan, current_tilt
-    global face_enabled, color_enabled, selected_color
+    global face_enabled, color_enabled, selected_color, drive_speed
 
     data = request.get_json(force=True)
     key = data.get('key','').lower()
@@ -246,20 +280,17 @@ def keypress():
     try:
         # Driving & steering
         if key == 'forward':
-            car.forward(current_speed)
+            drive_speed = current_speed
         elif key == 'backward':
-            car.backward(current_speed)
+            drive_speed = -current_speed
         elif key == 'left':
             current_steering = -STEERING_ANGLE
-            car.set_dir_servo_angle(current_steering)
         elif key == 'right':
             current_steering = STEERING_ANGLE
-            car.set_dir_servo_angle(current_steering)
         elif key == 'stop':
-            car.stop()
+            drive_speed = 0
         elif key == 'reset_steering':
             current_steering = 0
-            car.set_dir_servo_angle(0)
         # Speed
         elif key == 'speed_down':
             current_speed = max(0, current_speed - 10)
@@ -268,47 +299,43 @@ def keypress():
         # Camera pan/tilt/reset
         elif key == 'pan_left':
             current_pan = max(current_pan - CAMERA_PAN_STEP, car.CAM_PAN_MIN)
-            car.set_cam_pan_angle(current_pan)
         elif key == 'pan_right':
             current_pan = min(current_pan + CAMERA_PAN_STEP, car.CAM_PAN_MAX)
-            car.set_cam_pan_angle(current_pan)
         elif key == 'tilt_up':
             current_tilt = min(current_tilt + CAMERA_TILT_STEP, car.CAM_TILT_MAX)
-            car.set_cam_tilt_angle(current_tilt)
         elif key == 'tilt_down':
             current_tilt = max(current_tilt - CAMERA_TILT_STEP, car.CAM_TILT_MIN)
-            car.set_cam_tilt_angle(current_tilt)
         elif key == 'reset_camera':
             current_pan = 0
             current_tilt = 0
-            car.set_cam_pan_angle(0)
-            car.set_cam_tilt_angle(0)
         # Face detection toggle
         elif key == 'enable_face':
             face_enabled = True
-            Vilib.face_detect_switch(True)
+            vision.face(True)
         elif key == 'disable_face':
             face_enabled = False
-            Vilib.face_detect_switch(False)
+            vision.face(False)
         # Color detection toggle
         elif key == 'enable_color':
             color_enabled = True
-            Vilib.color_detect(selected_color)
+            vision.color(selected_color)
         elif key == 'disable_color':
             color_enabled = False
-            Vilib.close_color_detection()
+            vision.color(None)
         # Color selection
         elif key.startswith('set_color_'):
             col = key.split('set_color_')[1]
             if col in AVAILABLE_COLORS:
                 selected_color = col
                 if color_enabled:
-                    Vilib.color_detect(col)
+                    vision.color(col)
             else:
                 return jsonify(success=False, error='Unknown color'), 400
         else:
             return jsonify(success=False, error='Invalid command'), 400
 
+        web_channel.set(speed=drive_speed, steering=current_steering,
+                        pan=current_pan, tilt=current_tilt)
         return jsonify(
             success=True,
             command=key,
@@ -333,6 +360,14 @@ def generate_frames():
                b'Content-Type: image/jpeg\r\n\r\n' + buf.tobytes() + b'\r\n')
         time.sleep(0.05)
 
+@app.route('/telemetry')
+def telemetry_stream():
+    return Response(
+        telemetry.stream(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/video_feed')
 def video_feed():
     return Response(
@@ -342,5 +377,7 @@ def video_feed():
 
 if __name__ == '__main__':
     car.reset()
+    arbiter.start()
+    telemetry.start()
     print("Starting Robot Car Controller with full calibration popup…")
     app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
@@ -1,49 +1,45 @@
 from picarx import Picarx
-from time import sleep
+from picarx.vision import VisionEvents
+from picarx.tracking import TargetTracker
+from time import sleep, monotonic
 from vilib import Vilib
 
 
 px = Picarx()
 
-def clamp_number(num,a,b):
-  return max(min(num, max(a, b)), min(a, b))
-
 def main():
     Vilib.camera_start()
     Vilib.display()
     Vilib.color_detect("red")
     speed = 50
     dir_angle=0
-    x_angle =0
-    y_angle =0
-    while True:
-        if Vilib.detect_obj_parameter['color_n']!=0:
-            coordinate_x = Vilib.detect_obj_parameter['color_x']
-            coordinate_y = Vilib.detect_obj_parameter['color_y']
-            
-            # change the pan-tilt angle for track the object
-            x_angle +=(coordinate_x*10/640)-5
-            x_angle = clamp_number(x_angle,-35,35)
-            px.set_cam_pan_angle(x_angle)
-
-            y_angle -=(coordinate_y*10/480)-5
-            y_angle = clamp_number(y_angle,-35,35)
-            px.set_cam_tilt_angle(y_angle)
-
-            # move
-            # The movement direction will change slower than the pan/tilt direction 
-            # change to avoid confusion when the picture changes at high speed.
-            if dir_angle > x_angle:
-                dir_angle -= 1
-            elif dir_angle < x_angle:
-                dir_angle += 1
-            px.set_dir_servo_angle(x_angle)
-            px.forward(speed)
-            sleep(0.05)
 
-        else :
-            px.forward(0)
+    # pan/tilt follow the red object through the tracker; the car steers
+    # toward wherever the camera is pointing
+    tracker = TargetTracker(px, pan_range=(-35, 35), tilt_range=(-35, 35))
+    vision = VisionEvents()
+    vision.subscribe('color', tracker.on_detection)
+    vision.start()
+    tracker.start()
+    try:
+        while True:
+            if monotonic() - tracker.last_update < 0.5:
+                x_angle = px.cam_pan_current_angle
+                # move
+                # The movement direction will change slower than the pan/tilt direction 
+                # change to avoid confusion when the picture changes at high speed.
+                if dir_angle > x_angle:
+                    dir_angle -= 1
+                elif dir_angle < x_angle:
+                    dir_angle += 1
+                px.set_dir_servo_angle(x_angle)
+                px.forward(speed)
+            else:
+                px.forward(0)
             sleep(0.05)
+    finally:
+        tracker.stop()
+        vision.stop()
 
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@
 
 from robot_hat.utils import reset_mcu
 from picarx import Picarx
+from picarx.photo import PhotoCapture
 from vilib import Vilib
 from time import sleep, time, strftime, localtime
 import readchar
@@ -30,13 +31,15 @@ Press key to call the function(non-case sensitive):
 
 
 px = Picarx()
+photos = PhotoCapture(Vilib)
 
 def take_photo():
     _time = strftime('%Y-%m-%d-%H-%M-%S',localtime(time()))
     name = 'photo_%s'%_time
     path = f"{user_home}/Pictures/picar-x/"
-    Vilib.take_photo(name, path)
-    print('\nphoto save as %s%s.jpg'%(path,name))
+    # encoded and written in the background; driving keeps going
+    photos.take(f'{path}{name}.jpg').add_done_callback(
+        lambda f: print('\nphoto save as %s' % f.result() if not f.exception() else '\nphoto failed: %s' % f.exception()))
 
 
 def move(operate:str, speed):
@@ -115,8 +118,6 @@ def main():
             Vilib.camera_close()
             break 
 
-        sleep(0.1)
-
 
 if __name__ == "__main__":
     try:
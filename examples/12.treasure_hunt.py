@@ -1,6 +1,7 @@
 from picarx import Picarx
+from picarx.speech import Speech
 from time import sleep
-from robot_hat import Music,TTS
+from robot_hat import Music
 from vilib import Vilib
 import readchar
 import random
@@ -9,7 +10,7 @@ import threading
 px = Picarx()
 
 music = Music()
-tts = TTS()
+tts = Speech()
 
 manual = '''
 Press keys on keyboard to control Picar-X!
@@ -23,6 +24,7 @@ Press keys on keyboard to control Picar-X!
 
 color = "red"
 color_list=["red","orange","yellow","green","blue","purple"]
+tts.preload(["game start", "will done"] + ["Look for " + c for c in color_list])
 
 def renew_color_detect():
     global color
@@ -74,13 +76,11 @@ def main():
     _key_t.start()
 
     tts.say("game start")
-    sleep(0.05)
     renew_color_detect()
     while True:
 
         if Vilib.detect_obj_parameter['color_n']!=0 and Vilib.detect_obj_parameter['color_w']>100:
-            tts.say("will done")
-            sleep(0.05)
+            tts.say("will done", priority=1)
             renew_color_detect()
 
         with lock:
@@ -1,9 +1,13 @@
 from sunfounder_controller import SunFounderController
 from picarx import Picarx
-from robot_hat import utils, Music
+from picarx.arbiter import CommandArbiter
+from picarx.controller import ControllerBridge
+from picarx.vision import VisionControl
+from picarx.audio import SoundBank, Mixer
+from robot_hat import utils
 from vilib import Vilib
 import os
-from time import sleep
+from time import sleep, monotonic
 
 # reset robot_hat
 utils.reset_mcu()
@@ -15,10 +19,26 @@ sc.set_name('Picarx-001')
 sc.set_type('Picarx')
 sc.start()
 
+# sensor values go out only when they change (or at most 10 times a second),
+# widgets are polled at a fixed rate by the bridge thread
+bridge = ControllerBridge(sc, rate=50, max_rate=10,
+                          inputs=('M', 'J', 'I', 'E', 'K', 'Q', 'N', 'O', 'P'))
+bridge.deadband('D', 10)
+bridge.deadband('F', 1)
+LOOP_PERIOD = 0.02
+
 # init picarx
 px = Picarx()
 speed = 0
 
+# every control source drives through its own channel; the arbiter picks
+# the highest-priority active one each tick and only forwards changes
+arbiter = CommandArbiter(px)
+auto_ch = arbiter.channel('autonomous', priority=3, timeout=1.0)
+joystick_ch = arbiter.channel('joystick', priority=2, timeout=0.5)
+voice_ch = arbiter.channel('voice', priority=1, timeout=0)
+camera_ch = arbiter.channel('camera', priority=1, timeout=0)
+
 current_line_state = None
 last_line_state = "stop"
 LINE_TRACK_SPEED = 10
@@ -30,30 +50,27 @@ DangerDistance = 20 # > 20 && < 40 turn around, < 20 backward
 
 DETECT_COLOR = 'red' # red, green, blue, yellow , orange, purple
 
-# init music player
+# init sound effects: decoded once, played through one persistent stream
 User = os.popen('echo ${SUDO_USER:-$LOGNAME}').readline().strip()
 UserHome = os.popen('getent passwd %s | cut -d: -f 6' %User).readline().strip()
 
-music = Music()
-if os.geteuid() != 0:
-    print('\033[33mPlay sound needs to be run with sudo.\033[m')
+# detector switches are cached, Vilib only hears about real changes
+vision = VisionControl()
+
+mixer = Mixer(SoundBank(f'{UserHome}/picar-x/sounds'))
 
 def horn(): 
-    _status, _result = utils.run_command('sudo killall pulseaudio')
-    music.sound_play_threading(f'{UserHome}/picar-x/sounds/car-double-horn.wav')
+    mixer.play('car-double-horn')
 
 def avoid_obstacles():
     distance = px.get_distance()
     if distance >= SafeDistance:
-        px.set_dir_servo_angle(0)
-        px.forward(AVOID_OBSTACLES_SPEED)
+        auto_ch.set(speed=AVOID_OBSTACLES_SPEED, steering=0)
     elif distance >= DangerDistance:
-        px.set_dir_servo_angle(30)
-        px.forward(AVOID_OBSTACLES_SPEED)
+        auto_ch.set(speed=AVOID_OBSTACLES_SPEED, steering=30)
         sleep(0.1)
     else:
-        px.set_dir_servo_angle(-30)
-        px.backward(AVOID_OBSTACLES_SPEED)
+        auto_ch.set(speed=-AVOID_OBSTACLES_SPEED, steering=-30)
         sleep(0.5) 
 
 def get_status(val_list):
@@ -70,12 +87,11 @@ def get_status(val_list):
 def outHandle():
     global last_line_state, current_line_state
     if last_line_state == 'left':
-        px.set_dir_servo_angle(-30)
-        px.backward(10)
+        auto_ch.set(speed=-10, steering=-30)
     elif last_line_state == 'right':
-        px.set_dir_servo_angle(30)
-        px.backward(10)
+        auto_ch.set(speed=-10, steering=30)
     while True:
+        auto_ch.refresh()
         gm_val_list = px.get_grayscale_data()
         gm_state = get_status(gm_val_list)
         currentSta = gm_state
@@ -92,14 +108,11 @@ def line_track():
         last_line_state = gm_state
 
     if gm_state == 'forward':
-        px.set_dir_servo_angle(0)
-        px.forward(LINE_TRACK_SPEED) 
+        auto_ch.set(speed=LINE_TRACK_SPEED, steering=0)
     elif gm_state == 'left':
-        px.set_dir_servo_angle(LINE_TRACK_ANGLE_OFFSET)
-        px.forward(LINE_TRACK_SPEED) 
+        auto_ch.set(speed=LINE_TRACK_SPEED, steering=LINE_TRACK_ANGLE_OFFSET)
     elif gm_state == 'right':
-        px.set_dir_servo_angle(-LINE_TRACK_ANGLE_OFFSET)
-        px.forward(LINE_TRACK_SPEED) 
+        auto_ch.set(speed=LINE_TRACK_SPEED, steering=-LINE_TRACK_ANGLE_OFFSET)
     else:
         outHandle()
 
@@ -112,94 +125,88 @@ def main():
 
     Vilib.camera_start(vflip=False,hflip=False)
     Vilib.display(local=False, web=True)
+    arbiter.start()
+    bridge.start()
     speak = None
+    horn_pressed = False
+    next_tick = monotonic()
     while True:
         # --- send data ---
-        sc.set("A", speed)
+        bridge.publish("A", speed)
 
         grayscale_data = px.get_grayscale_data()
-        sc.set("D", grayscale_data )
+        bridge.publish("D", grayscale_data)
 
         distance = px.get_distance()
-        sc.set("F", distance)
+        bridge.publish("F", distance)
 
         # --- control ---
 
-        # # horn
-        if sc.get('M') == True:
+        # # horn: once per press, not on every 20 ms tick it is held
+        pressed = bridge.get('M') == True
+        if pressed and not horn_pressed:
             horn()
+        horn_pressed = pressed
 
         # speaker
-        if sc.get('J') != None:
-            speak=sc.get('J')
+        if bridge.get('J') != None:
+            speak=bridge.get('J')
             print(f'speaker: {speak}')
         if speak in ["forward"]:
-            px.forward(speed)
+            voice_ch.set(speed=speed)
         elif speak in ["backward"]:
-            px.backward(speed)
+            voice_ch.set(speed=-speed)
         elif speak in ["left"]:
-            px.set_dir_servo_angle(-30)
-            px.forward(60)
+            voice_ch.set(speed=60, steering=-30)
             sleep(1.2)
-            px.set_dir_servo_angle(0)
-            px.forward(speed)
+            voice_ch.set(speed=speed, steering=0)
         elif speak in ["right", "white", "rice"]:
-            px.set_dir_servo_angle(30)
-            px.forward(60)
+            voice_ch.set(speed=60, steering=30)
             sleep(1.2)
-            px.set_dir_servo_angle(0)
-            px.forward(speed)
+            voice_ch.set(speed=speed, steering=0)
         elif speak in ["stop"]:
-            px.stop()
+            voice_ch.set(speed=0)
 
         # line_track and avoid_obstacles
-        line_track_switch = sc.get('I')
-        avoid_obstacles_switch = sc.get('E')
+        line_track_switch = bridge.get('I')
+        avoid_obstacles_switch = bridge.get('E')
         if line_track_switch == True:
             speed = LINE_TRACK_SPEED
             line_track()
         elif avoid_obstacles_switch == True:
             speed = AVOID_OBSTACLES_SPEED
             avoid_obstacles()
+        else:
+            auto_ch.release()
     
         # joystick moving
         if line_track_switch != True and avoid_obstacles_switch != True:
-            Joystick_K_Val = sc.get('K')
+            Joystick_K_Val = bridge.get('K')
             if Joystick_K_Val != None:
                 dir_angle = utils.mapping(Joystick_K_Val[0], -100, 100, -30, 30)
-                speed = Joystick_K_Val[1]
-                px.set_dir_servo_angle(dir_angle)
-                if speed > 0:
-                    px.forward(speed)
-                elif speed < 0:
-                    speed = -speed
-                    px.backward(speed)
-                else:
-                    px.stop()
+                joystick_ch.set(speed=Joystick_K_Val[1], steering=dir_angle)
+                speed = abs(Joystick_K_Val[1])
+        else:
+            joystick_ch.release()
 
         # camera servos control
-        Joystick_Q_Val = sc.get('Q')
+        Joystick_Q_Val = bridge.get('Q')
         if Joystick_Q_Val != None:
             pan = min(90, max(-90, Joystick_Q_Val[0]))
             tilt = min(65, max(-35, Joystick_Q_Val[1]))
-            px.set_cam_pan_angle(pan)
-            px.set_cam_tilt_angle(tilt)
+            camera_ch.set(pan=pan, tilt=tilt)
 
         # image recognition
-        if sc.get('N') == True:
-            Vilib.color_detect(DETECT_COLOR)
-        else:
-            Vilib.color_detect("close")
-
-        if sc.get('O') == True:
-            Vilib.face_detect_switch(True)  
-        else:
-            Vilib.face_detect_switch(False)  
-
-        if sc.get('P') == True:
-            Vilib.object_detect_switch(True) 
+        vision.color(DETECT_COLOR if bridge.get('N') == True else None)
+        vision.face(bridge.get('O') == True)
+        vision.object(bridge.get('P') == True)
+
+        next_tick += LOOP_PERIOD
+        delay = next_tick - monotonic()
+        if delay > 0:
+            sleep(delay)
         else:
-            Vilib.object_detect_switch(False)
+            next_tick = monotonic()
 
 
 if __name__ == "__main__":
@@ -207,6 +214,8 @@ if __name__ == "__main__":
         main()
     finally:
         print("stop and exit")
+        bridge.stop()
+        arbiter.stop()
         px.stop()
         Vilib.camera_close()
 
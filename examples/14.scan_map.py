@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+from picarx import Picarx, PanScanner, OccupancyGrid
+import time
+import numpy as np
+
+# The car stays parked; its pose is the map origin facing +x.
+POSE = (0.0, 0.0, 0.0)
+
+def main():
+    grid = OccupancyGrid(path='scan_map.npy')
+    with Picarx() as px:
+        scanner = PanScanner(px, start=-60, end=60, step=5)
+        try:
+            while True:
+                sweep = scanner.sweep()
+                for angle, dist in zip(sweep.angles, sweep.distances):
+                    # missed echoes come back as NaN
+                    if np.isfinite(dist):
+                        grid.update(POSE, angle, dist)
+                print("sweeps/s: %.2f  closest: %.1f cm" % (scanner.sweeps_per_second, np.nanmin(sweep.distances)))
+        except KeyboardInterrupt:
+            print("\nInterrupted by user — exiting...")
+        finally:
+            scanner.close()
+            grid.flush()
+            px.set_cam_pan_angle(0)
+            time.sleep(0.2)
+
+if __name__ == "__main__":
+    main()
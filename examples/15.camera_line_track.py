@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+from picarx import Picarx
+from picarx.linetrack import CameraLineTracker
+from vilib import Vilib
+import time
+
+# Line following from the camera: the tracker fits the line over the ground
+# ahead, so the car steers toward a look-ahead point and turns in before a
+# curve instead of reacting once the grayscale module drifts off the line.
+SPEED = 20
+MAX_ANGLE = 30
+LOOKAHEAD = 0.5
+
+def main():
+    Vilib.camera_start(vflip=False, hflip=False)
+    Vilib.display(local=False, web=True)
+    time.sleep(0.8)  # wait for startup
+
+    with Picarx() as px:
+        px.set_cam_tilt_angle(px.CAM_TILT_MIN)   # look at the floor
+        tracker = CameraLineTracker(Vilib)
+        print(tracker.benchmark(Vilib.img))
+
+        def steer(estimate):
+            if estimate is None:
+                px.stop()
+                return
+            px.set_dir_servo_angle(estimate.steering_angle(MAX_ANGLE, LOOKAHEAD))
+            px.forward(SPEED)
+
+        tracker.start(steer)
+        try:
+            while True:
+                time.sleep(1)
+                print(tracker.latest(), tracker.metrics())
+        except KeyboardInterrupt:
+            print("\nInterrupted by user — exiting...")
+        finally:
+            tracker.stop()
+            px.set_cam_tilt_angle(0)
+            Vilib.camera_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
-from time import sleep
 from robot_hat import Music,TTS
+from picarx.audio import SoundBank, Mixer
 import readchar
+import threading
+import time
 from os import geteuid
 
 if geteuid() != 0:
@@ -8,15 +10,24 @@ if geteuid() != 0:
 
 music = Music()
 tts = TTS()
+# sound effects are decoded once at startup and mixed in one output stream
+mixer = Mixer(SoundBank('../sounds'))
 
 manual = '''
 Input key to call the function!
     space: Play sound effect (Car horn)
-    c: Play sound effect with threads
+    c: Play sound effect (Engine start)
     t: Text to speak
     q: Play/Stop Music
 '''
 
+def report_latency():
+    # the latency is only measured once the mixer has started the sound;
+    # wait for it to finish playing, without holding up the key loop
+    while mixer.active:
+        time.sleep(0.05)
+    print('trigger-to-sound latency: %.1f ms' % (mixer.metrics()['latency_last'] * 1000))
+
 def main():
     print(manual)
 
@@ -38,13 +49,12 @@ def main():
 
         elif key == readchar.key.SPACE:
             print('Beep beep beep !')
-            music.sound_play('../sounds/car-double-horn.wav')
-            sleep(0.05)
+            mixer.play('car-double-horn')
 
         elif key == "c":
-            print('Beep beep beep !')
-            music.sound_play_threading('../sounds/car-double-horn.wav')
-            sleep(0.05)
+            print('Vroom !')
+            mixer.play('car-start-engine')
+            threading.Thread(target=report_latency, daemon=True).start()
 
         elif key == "t":
             words = "Hello"
@@ -13,16 +13,19 @@
 
 '''
 from picarx import Picarx
+from picarx.speech import Speech
 from time import sleep
-from robot_hat import TTS
 
-tts = TTS()
-tts.lang("en-US")
+# say() only queues the phrase, so the cliff loop is never blocked
+tts = Speech(lang="en-US")
+tts.preload(["danger"])
 
 px = Picarx()
 # px = Picarx(grayscale_pins=['A0', 'A1', 'A2'])
 # manual modify reference value
 px.set_cliff_reference([200, 200, 200])
+# brake inside the driver as soon as any sample sees the edge
+px.enable_cliff_guard()
 
 current_state = None
 px_power = 10
@@ -40,13 +43,13 @@ if __name__=='__main__':
 
             if gm_state is False:
                 state = "safe"
+                px.clear_cliff()
                 px.stop()
             else:
                 state = "danger"   
                 px.backward(80)
                 if last_state == "safe":
-                    tts.say("danger")
-                    sleep(0.1)
+                    tts.say("danger", interrupt=True)
             last_state = state
 
     finally:
@@ -1,13 +1,15 @@
 from pydoc import text
 from vilib import Vilib
+from picarx.vision import VisionEvents
+from picarx.photo import PhotoCapture
 from time import sleep, time, strftime, localtime
-import threading
 import readchar
 import os
 
 flag_face = False
 flag_color = False
 qr_code_flag = False
+last_qr_text = None
 
 manual = '''
 Input key to call the function!
@@ -33,23 +35,25 @@ def face_detect(flag):
     Vilib.face_detect_switch(flag)
 
 
-def qrcode_detect():
-    global qr_code_flag
-    if qr_code_flag == True:
-        Vilib.qrcode_detect_switch(True)
+def on_qrcode(det):
+    # called once per camera frame that contains a QR code
+    global last_qr_text
+    if det.data != last_qr_text:
+        last_qr_text = det.data
+        print('QR code:%s'%det.data)
+
+
+def qrcode_detect(flag):
+    global last_qr_text
+    last_qr_text = None
+    Vilib.qrcode_detect_switch(flag)
+    if flag:
         print("Waitting for QR code")
+    else:
+        print('QRcode Detect: close')
 
-    text = None
-    while True:
-        temp = Vilib.detect_obj_parameter['qr_data']
-        if temp != "None" and temp != text:
-            text = temp
-            print('QR code:%s'%text)
-        if qr_code_flag == False:
-            break
-        sleep(0.5)
-    Vilib.qrcode_detect_switch(False)
 
+photos = PhotoCapture(Vilib)
 
 def take_photo():
     _time = strftime('%Y-%m-%d-%H-%M-%S',localtime(time()))
@@ -57,8 +61,9 @@ def take_photo():
     username = os.getlogin()
 
     path = f"/home/{username}/Pictures/"
-    Vilib.take_photo(name, path)
-    print('photo save as %s%s.jpg'%(path,name))
+    # encoded and written in the background; driving keeps going
+    photos.take(f'{path}{name}.jpg').add_done_callback(
+        lambda f: print('photo save as %s' % f.result() if not f.exception() else 'photo failed: %s' % f.exception()))
 
 
 def object_show():
@@ -83,10 +88,12 @@ def object_show():
 
 def main():
     global flag_face, flag_color, qr_code_flag
-    qrcode_thread = None
 
     Vilib.camera_start(vflip=False,hflip=False)
     Vilib.display(local=True,web=True)
+    vision = VisionEvents()
+    vision.subscribe('qr', on_qrcode)
+    vision.start()
     print(manual)
 
     while True:
@@ -113,16 +120,7 @@ def main():
         # qrcode detection
         elif key =="r":
             qr_code_flag = not qr_code_flag
-            if qr_code_flag == True:
-                if qrcode_thread == None or not qrcode_thread.is_alive():
-                    qrcode_thread = threading.Thread(target=qrcode_detect)
-                    qrcode_thread.daemon = True
-                    qrcode_thread.start()
-            else:
-                if qrcode_thread != None and qrcode_thread.is_alive():
-                # wait for thread to end
-                    qrcode_thread.join()
-                    print('QRcode Detect: close')
+            qrcode_detect(qr_code_flag)
         # show detected object information
         elif key == "s":
             object_show()
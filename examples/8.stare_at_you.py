@@ -1,37 +1,34 @@
 from picarx import Picarx
+from picarx.vision import VisionEvents, VisionControl, ChangeGate
+from picarx.tracking import TargetTracker
 from time import sleep
 from vilib import Vilib
 
 px = Picarx()
 
-def clamp_number(num,a,b):
-  return max(min(num, max(a, b)), min(a, b))
-
 def main():
     Vilib.camera_start()
     Vilib.display()
-    Vilib.face_detect_switch(True)
-    x_angle =0
-    y_angle =0
-    while True:
-        if Vilib.detect_obj_parameter['human_n']!=0:
-            coordinate_x = Vilib.detect_obj_parameter['human_x']
-            coordinate_y = Vilib.detect_obj_parameter['human_y']
-            
-            # change the pan-tilt angle for track the object
-            x_angle +=(coordinate_x*10/640)-5
-            x_angle = clamp_number(x_angle,-35,35)
-            px.set_cam_pan_angle(x_angle)
-
-            y_angle -=(coordinate_y*10/480)-5
-            y_angle = clamp_number(y_angle,-35,35)
-            px.set_cam_tilt_angle(y_angle)
-
-            sleep(0.05)
-
-        else :
-            pass
-            sleep(0.05)
+    control = VisionControl(Vilib)
+    control.face(True)
+
+    # the tracker commands pan/tilt at a fixed rate from a filtered,
+    # latency-compensated prediction of the face position
+    tracker = TargetTracker(px, pan_range=(-35, 35), tilt_range=(-35, 35))
+    vision = VisionEvents()
+    # while the picture is static, skip face detection and reuse the last result
+    vision.gate = ChangeGate(control)
+    vision.subscribe('face', tracker.on_detection)
+    vision.start()
+    tracker.start()
+    try:
+        while True:
+            sleep(1)
+    finally:
+        tracker.stop()
+        vision.stop()
+        control.close()
+        print(vision.gate.metrics())
 
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
 from time import sleep,strftime,localtime
 from vilib import Vilib
+from picarx.recorder import VideoRecorder
 import readchar
 import os
 
@@ -18,8 +19,11 @@ def main():
     rec_flag = 'stop' # start,pause,stop
     vname = None
     username = os.getlogin()
-    
-    Vilib.rec_video_set["path"] = f"/home/{username}/Videos/" # set path
+
+    # frames go through a bounded queue to an encoder thread; files roll
+    # over every minute or 100 MB, each with a frame timestamp index
+    recorder = VideoRecorder(f"/home/{username}/Videos/", Vilib,
+                             segment_seconds=60, segment_mb=100)
 
     Vilib.camera_start(vflip=False,hflip=False)
     Vilib.display(local=True,web=True)
@@ -37,27 +41,29 @@ def main():
                 rec_flag = 'start'
                 # set name
                 vname = strftime("%Y-%m-%d-%H.%M.%S", localtime())
-                Vilib.rec_video_set["name"] = vname
                 # start record
-                Vilib.rec_video_run()
-                Vilib.rec_video_start()
+                recorder.start(vname)
                 print_overwrite('rec start ...')
             elif rec_flag == 'start':
                 rec_flag = 'pause'
-                Vilib.rec_video_pause()
+                recorder.pause()
                 print_overwrite('pause')
             elif rec_flag == 'pause':
                 rec_flag = 'start'
-                Vilib.rec_video_start()
+                recorder.resume()
                 print_overwrite('continue')
         # stop
         elif key == 'e' and rec_flag != 'stop':
             key = None
             rec_flag = 'stop'
-            Vilib.rec_video_stop()
-            print_overwrite("The video saved as %s%s.avi"%(Vilib.rec_video_set["path"],vname),end='\n')
+            segments = recorder.stop()
+            m = recorder.metrics()
+            print_overwrite("The video saved as %s (%d segments, %d frames, %d dropped)"
+                            %(vname, len(segments), m['encoded'], m['dropped']), end='\n')
         # quit
         elif key == readchar.key.CTRL_C:
+            if rec_flag != 'stop':
+                recorder.stop()
             Vilib.camera_close()
             print('\nquit')
             break
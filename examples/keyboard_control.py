@@ -1,14 +1,16 @@
 #!/usr/bin/env python3
-from picarx import Picarx
-from time import sleep
-import readchar
+from picarx import Picarx, KeyboardTeleop
+
+# a held key counts as released if its first autorepeat takes longer than
+# this (seconds); raise it if your terminal's repeat delay is longer
+INITIAL_DELAY = 0.7
 
 manual = '''
-Press keys on keyboard to control PiCar-X!
+Hold keys on keyboard to control PiCar-X!
     w: Forward
-    a: Turn left
+    a: Turn left (drives forward, or backward while s is held)
     s: Backward
-    d: Turn right
+    d: Turn right (drives forward, or backward while s is held)
     i: Head up
     k: Head down
     j: Turn head left
@@ -22,55 +24,24 @@ def show_info():
     print(manual)
 
 def main():
-    pan_angle = 0
-    tilt_angle = 0
-
     show_info()
     # __enter__ will init; __exit__ will stop & cleanup GPIO
     with Picarx() as px:
+        # reads keys on its own thread and drives while they are held
+        teleop = KeyboardTeleop(px, speed=80, steer=30, initial_delay=INITIAL_DELAY)
+        teleop.start()
         try:
-            while True:
-                key = readchar.readkey().lower()
-
-                if key in ('w','a','s','d','i','k','j','l'):
-                    # Drive controls
-                    if   key == 'w':
-                        px.set_dir_servo_angle(0);    px.forward(80)
-                    elif key == 's':
-                        px.set_dir_servo_angle(0);    px.backward(80)
-                    elif key == 'a':
-                        px.set_dir_servo_angle(-30);  px.forward(80)
-                    elif key == 'd':
-                        px.set_dir_servo_angle(30);   px.forward(80)
-
-                    # Head controls
-                    elif key == 'i':
-                        tilt_angle = min(tilt_angle + 5,  30)
-                    elif key == 'k':
-                        tilt_angle = max(tilt_angle - 5, -30)
-                    elif key == 'l':
-                        pan_angle  = min(pan_angle  + 5,  30)
-                    elif key == 'j':
-                        pan_angle  = max(pan_angle  - 5, -30)
-
-                    # Apply head movement
-                    px.set_cam_tilt_angle(tilt_angle)
-                    px.set_cam_pan_angle( pan_angle )
-                    sleep(0.5)
-
-                    # Stop driving after each command
-                    px.forward(0)
-                    show_info()
-
-                # Exit on Ctrl+C
-                elif key == readchar.key.CTRL_C:
-                    break
-
+            while not teleop.quit.wait(1.0):
+                m = teleop.metrics()
+                print("\rkey latency: %.1f ms (max %.1f ms)   "
+                      % (m['latency_mean'] * 1000, m['latency_max'] * 1000), end='', flush=True)
         except KeyboardInterrupt:
-            # clean exit on second Ctrl+C
             pass
+        finally:
+            teleop.stop()
+            print()
 
     # context-manager __exit__ has called px.stop() and GPIO.cleanup()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
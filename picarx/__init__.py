@@ -1,3 +1,20 @@
 #!/usr/bin/env python3
 from .picarx import Picarx
+from .mapping import OccupancyGrid
+from .scanner import PanScanner, Sweep
+from .calibration import GrayscaleCalibrator
+from .vision import VisionEvents, VisionControl, ChangeGate, Detection, FaceDetection, ColorDetection, QRDetection
+from .tracking import TargetTracker
+from .speech import Speech
+from .audio import SoundBank, Mixer
+from .arbiter import CommandArbiter
+from .motion import MotionQueue, Segment
+from .teleop import KeyboardTeleop
+from .controller import ControllerBridge
+from .telemetry import Telemetry
+from .recorder import VideoRecorder
+from .photo import PhotoCapture
+from .linetrack import CameraLineTracker, LineEstimate
+from .config import Config, ConfigError, PROFILE_KEYS
+from .profiler import SamplingProfiler
 from .version import __version__
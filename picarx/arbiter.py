@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+import threading
+import time
+from typing import Dict, Tuple, Union
+
+
+class Command:
+    """
+    Desired drive state from one source.  Fields left as None are not
+    controlled by that source and fall through to lower-priority channels.
+
+    :ivar speed: Drive speed, -100 to 100; negative drives backward.
+    :ivar steering: Steering servo angle.
+    :ivar pan: Camera pan angle.
+    :ivar tilt: Camera tilt angle.
+    """
+
+    FIELDS = ('speed', 'steering', 'pan', 'tilt')
+
+    def __init__(self, speed: Union[int, None] = None, steering: Union[float, None] = None,
+                 pan: Union[float, None] = None, tilt: Union[float, None] = None) -> None:
+        self.speed = speed
+        self.steering = steering
+        self.pan = pan
+        self.tilt = tilt
+
+    def __repr__(self) -> str:
+        return (f"Command(speed={self.speed}, steering={self.steering}, "
+                f"pan={self.pan}, tilt={self.tilt})")
+
+
+class Channel:
+    """
+    A named control source registered with a :class:`CommandArbiter`.
+    """
+
+    def __init__(self, arbiter: "CommandArbiter", name: str, priority: int, timeout: float) -> None:
+        self.arbiter = arbiter
+        self.name = name
+        self.priority = priority
+        self.timeout = timeout
+        self.command: Union[Command, None] = None
+        self.updated = 0.0
+
+    @property
+    def active(self) -> bool:
+        return self.command is not None and (
+            self.timeout <= 0 or time.monotonic() - self.updated <= self.timeout)
+
+    def set(self, speed: Union[int, None] = None, steering: Union[float, None] = None,
+            pan: Union[float, None] = None, tilt: Union[float, None] = None) -> None:
+        """
+        Replace this channel's command and refresh its timeout.
+        """
+        with self.arbiter._lock:
+            self.command = Command(speed, steering, pan, tilt)
+            self.updated = time.monotonic()
+
+    def refresh(self) -> None:
+        """
+        Keep the current command alive without changing it.
+        """
+        with self.arbiter._lock:
+            self.updated = time.monotonic()
+
+    def release(self) -> None:
+        """
+        Give up control; lower-priority channels take over on the next tick.
+        """
+        with self.arbiter._lock:
+            self.command = None
+
+
+class CommandArbiter:
+    """
+    Priority arbitration between several control sources.
+
+    Each source drives through its own :class:`Channel` instead of calling
+    the Picarx directly.  Once per control tick the arbiter picks, field by
+    field, the value from the highest-priority channel that is active (set
+    within its timeout) and forwards to the car only the fields that
+    changed since the last tick.  With no active channel the car stops.
+    """
+
+    def __init__(self, px, rate: float = 50.0) -> None:
+        """
+        :param px: Picarx instance.
+        :param rate: Control ticks per second.
+        """
+        self.px = px
+        self.period = 1.0 / rate
+        self.channels: Dict[str, Channel] = {}
+        self._lock = threading.Lock()
+        self._applied: Dict[str, Union[float, None]] = {f: None for f in Command.FIELDS}
+        self._owner: Dict[str, Union[str, None]] = {f: None for f in Command.FIELDS}
+        self._running = False
+        self._thread: Union[threading.Thread, None] = None
+        self.ticks = 0
+        self.writes = 0
+        self.suppressed = 0
+
+    def channel(self, name: str, priority: int = 0, timeout: float = 0.5) -> Channel:
+        """
+        Register (or fetch) a named channel.
+
+        :param priority: Higher priorities win.
+        :param timeout: Seconds a command stays valid without a refresh;
+                        0 keeps it until released.
+        """
+        with self._lock:
+            ch = self.channels.get(name)
+            if ch is None:
+                ch = Channel(self, name, priority, timeout)
+                self.channels[name] = ch
+            return ch
+
+    def resolve(self) -> Tuple[Dict[str, Union[float, None]], Dict[str, Union[str, None]]]:
+        """
+        Compute the winning value and owning channel for each field.
+        """
+        values: Dict[str, Union[float, None]] = {f: None for f in Command.FIELDS}
+        owners: Dict[str, Union[str, None]] = {f: None for f in Command.FIELDS}
+        with self._lock:
+            ranked = sorted((c for c in self.channels.values() if c.active),
+                            key=lambda c: c.priority, reverse=True)
+            for ch in ranked:
+                for f in Command.FIELDS:
+                    value = getattr(ch.command, f)
+                    if values[f] is None and value is not None:
+                        values[f] = value
+                        owners[f] = ch.name
+        return values, owners
+
+    def tick(self) -> None:
+        """
+        Resolve once and write only changed fields to the car.
+        """
+        values, owners = self.resolve()
+        if values['speed'] is None:
+            values['speed'] = 0
+        px = self.px
+        # steering first: forward() reads the steering angle to split speed
+        for f in ('steering', 'speed', 'pan', 'tilt'):
+            value = values[f]
+            if value is None or value == self._applied[f]:
+                self.suppressed += 1
+                continue
+            if f == 'steering':
+                px.set_dir_servo_angle(value)
+                # differential speeds depend on the angle, so re-send speed
+                self._applied['speed'] = None
+            elif f == 'speed':
+                if value > 0:
+                    px.forward(value)
+                elif value < 0:
+                    px.backward(-value)
+                else:
+                    px.stop()
+            elif f == 'pan':
+                px.set_cam_pan_angle(value)
+            elif f == 'tilt':
+                px.set_cam_tilt_angle(value)
+            self._applied[f] = value
+            self.writes += 1
+        self._owner = owners
+        self.ticks += 1
+
+    def owner(self, field: str = 'speed') -> Union[str, None]:
+        """
+        Name of the channel that won ``field`` on the last tick.
+        """
+        return self._owner[field]
+
+    def metrics(self) -> Dict[str, int]:
+        return {'ticks': self.ticks, 'writes': self.writes, 'suppressed': self.suppressed}
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self) -> None:
+        next_tick = time.monotonic()
+        while self._running:
+            self.tick()
+            next_tick += self.period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+import struct
+import subprocess
+import threading
+import time
+import wave
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+DEFAULT_SOUNDS_DIR = Path(__file__).resolve().parent.parent / "sounds"
+
+
+def load_wav(path: Union[str, Path]) -> Tuple[np.ndarray, int]:
+    """
+    Decode a PCM or float WAV file, including WAVE_FORMAT_EXTENSIBLE files
+    the standard ``wave`` module rejects.
+
+    :return: Samples as float32 in [-1, 1] shaped (frames, channels), and
+             the sample rate.
+    :raises ValueError: If the file is not a supported WAV.
+    """
+    data = Path(path).read_bytes()
+    if data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        raise ValueError(f"{path} is not a WAV file.")
+    fmt = None
+    pcm = None
+    pos = 12
+    while pos + 8 <= len(data):
+        cid, size = data[pos:pos + 4], struct.unpack('<I', data[pos + 4:pos + 8])[0]
+        body = data[pos + 8:pos + 8 + size]
+        if cid == b'fmt ':
+            tag, channels, rate = struct.unpack('<HHI', body[:8])
+            bits = struct.unpack('<H', body[14:16])[0]
+            if tag == 0xFFFE:
+                tag = struct.unpack('<H', body[24:26])[0]
+            fmt = (tag, channels, rate, bits)
+        elif cid == b'data':
+            pcm = body
+        pos += 8 + size + (size & 1)
+    if fmt is None or pcm is None:
+        raise ValueError(f"{path} has no fmt or data chunk.")
+
+    tag, channels, rate, bits = fmt
+    if tag == 3 and bits == 32:
+        samples = np.frombuffer(pcm, dtype='<f4').astype(np.float32)
+    elif tag == 1 and bits == 8:
+        samples = (np.frombuffer(pcm, dtype=np.uint8).astype(np.float32) - 128) / 128.0
+    elif tag == 1 and bits == 16:
+        samples = np.frombuffer(pcm, dtype='<i2').astype(np.float32) / 32768.0
+    elif tag == 1 and bits == 24:
+        raw = np.frombuffer(pcm[:len(pcm) - len(pcm) % 3], dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        ints = np.where(ints & 0x800000, ints - (1 << 24), ints)
+        samples = ints.astype(np.float32) / float(1 << 23)
+    elif tag == 1 and bits == 32:
+        samples = np.frombuffer(pcm, dtype='<i4').astype(np.float32) / float(1 << 31)
+    else:
+        raise ValueError(f"{path}: unsupported WAV format {tag} with {bits} bits.")
+    frames = len(samples) // channels
+    return samples[:frames * channels].reshape(frames, channels), rate
+
+
+class SoundBank:
+    """
+    Sound effects decoded once into PCM buffers in the mixer's format.
+
+    Every ``.wav`` file in ``directory`` is loaded at construction and can
+    be played by file stem, e.g. ``'car-double-horn'``.
+    """
+
+    def __init__(self, directory: Union[str, Path, None] = None,
+                 rate: int = 44100, channels: int = 2) -> None:
+        self.rate = rate
+        self.channels = channels
+        self.sounds: Dict[str, np.ndarray] = {}
+        directory = Path(directory).expanduser() if directory else DEFAULT_SOUNDS_DIR
+        if directory.is_dir():
+            for path in sorted(directory.glob("*.wav")):
+                self.load(path)
+
+    def load(self, path: Union[str, Path], name: Union[str, None] = None) -> str:
+        """
+        Decode one file into the bank and return its name.
+        """
+        samples, rate = load_wav(path)
+        if rate != self.rate:
+            n = int(round(len(samples) * self.rate / rate))
+            src = np.arange(len(samples))
+            dst = np.linspace(0, len(samples) - 1, n)
+            samples = np.stack([np.interp(dst, src, samples[:, c]) for c in range(samples.shape[1])], axis=1)
+        if samples.shape[1] != self.channels:
+            samples = np.repeat(samples.mean(axis=1, keepdims=True), self.channels, axis=1)
+        name = name or Path(path).stem
+        self.sounds[name] = np.ascontiguousarray(samples, dtype=np.float32)
+        return name
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.sounds[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.sounds
+
+
+class NullSink:
+    """
+    Discards audio; for headless runs and tests.
+    """
+
+    latency: float = 0.0
+
+    def open(self, rate: int, channels: int) -> None:
+        self.frames = 0
+        self.channels = channels
+
+    def write(self, block: np.ndarray) -> None:
+        self.frames += len(block)
+
+    def close(self) -> None:
+        pass
+
+
+class FileSink(NullSink):
+    """
+    Records the mixed output to a 16-bit WAV file.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = str(path)
+        self._wav = None
+
+    def open(self, rate: int, channels: int) -> None:
+        super().open(rate, channels)
+        self._wav = wave.open(self.path, 'wb')
+        self._wav.setnchannels(channels)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(rate)
+
+    def write(self, block: np.ndarray) -> None:
+        super().write(block)
+        self._wav.writeframes(block.tobytes())
+
+    def close(self) -> None:
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+
+
+class AplaySink(NullSink):
+    """
+    One long-lived ``aplay`` process reading raw S16_LE from a pipe.  It is
+    started once with a short ALSA buffer and never restarted per sound.
+    """
+
+    def __init__(self, device: str = 'default', buffer_time: float = 0.02) -> None:
+        self.device = device
+        self.latency = buffer_time
+        self._proc: Union[subprocess.Popen, None] = None
+
+    def open(self, rate: int, channels: int) -> None:
+        super().open(rate, channels)
+        self._proc = subprocess.Popen(
+            ['aplay', '-q', '-D', self.device, '-t', 'raw', '-f', 'S16_LE',
+             '-r', str(rate), '-c', str(channels), f'--buffer-time={int(self.latency * 1e6)}', '-'],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def write(self, block: np.ndarray) -> None:
+        super().write(block)
+        self._proc.stdin.write(block.tobytes())
+        self._proc.stdin.flush()
+
+    def close(self) -> None:
+        if self._proc is not None:
+            try:
+                self._proc.stdin.close()
+            except OSError:
+                pass
+            self._proc.terminate()
+            self._proc = None
+
+
+class Mixer:
+    """
+    Mixes overlapping sound effects into a single persistent output stream.
+
+    A mixer thread renders fixed-size blocks, summing every active voice,
+    and keeps at most ``lead`` blocks ahead of real time so a newly
+    triggered sound is heard within a few milliseconds.  Trigger-to-output
+    latency is measured for every sound and reported by :meth:`metrics`.
+    """
+
+    def __init__(self, bank: SoundBank, sink=None, block: int = 256, lead: int = 2) -> None:
+        """
+        :param bank: Preloaded sound effects.
+        :param sink: Output backend; defaults to :class:`AplaySink`.
+        :param block: Frames rendered per mix cycle.
+        :param lead: Blocks the mixer may run ahead of real time.
+        """
+        self.bank = bank
+        self.sink = sink if sink is not None else AplaySink()
+        self.block = block
+        self.lead = lead
+        self.rate = bank.rate
+        self.channels = bank.channels
+        self._voices: List[list] = []
+        self._pending: List[list] = []
+        self._lock = threading.Lock()
+        self._latencies: List[float] = []
+        self.triggered = 0
+        self.underruns = 0
+        self.volume = 1.0
+        self._running = True
+        self.sink.open(self.rate, self.channels)
+        self._thread = threading.Thread(target=self._mix_loop, daemon=True)
+        self._thread.start()
+
+    def play(self, name: str, volume: float = 1.0) -> None:
+        """
+        Trigger a sound; returns immediately.
+
+        :raises KeyError: If the sound is not in the bank.
+        """
+        samples = self.bank[name]
+        with self._lock:
+            # [samples, position, volume, trigger time]
+            self._pending.append([samples, 0, volume, time.monotonic()])
+            self.triggered += 1
+
+    def stop_all(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._voices.clear()
+
+    @property
+    def active(self) -> int:
+        with self._lock:
+            return len(self._voices) + len(self._pending)
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        Trigger-to-output latency (seconds) over the last 100 sounds, plus
+        counters.
+        """
+        with self._lock:
+            lat = list(self._latencies)
+        return {
+            'triggered': self.triggered,
+            'underruns': self.underruns,
+            'latency_last': lat[-1] if lat else 0.0,
+            'latency_mean': sum(lat) / len(lat) if lat else 0.0,
+            'latency_max': max(lat) if lat else 0.0,
+        }
+
+    def close(self) -> None:
+        self._running = False
+        self._thread.join()
+        self.sink.close()
+
+    def _mix_loop(self) -> None:
+        block = self.block
+        period = block / self.rate
+        mix = np.zeros((block, self.channels), dtype=np.float32)
+        out = np.empty((block, self.channels), dtype='<i2')
+        start = time.monotonic()
+        written = 0
+        while self._running:
+            ahead = start + written * period - time.monotonic()
+            if ahead > self.lead * period:
+                time.sleep(ahead - self.lead * period)
+            elif ahead < -period:
+                self.underruns += 1
+                start = time.monotonic()
+                written = 0
+                ahead = 0.0
+
+            now = time.monotonic()
+            with self._lock:
+                for voice in self._pending:
+                    self._latencies.append(now - voice[3] + max(ahead, 0.0) + self.sink.latency)
+                del self._latencies[:-100]
+                self._voices.extend(self._pending)
+                self._pending.clear()
+                voices = list(self._voices)
+
+            mix.fill(0.0)
+            finished = []
+            for voice in voices:
+                samples, pos, vol, _ = voice
+                chunk = samples[pos:pos + block]
+                mix[:len(chunk)] += chunk * vol
+                voice[1] = pos + len(chunk)
+                if voice[1] >= len(samples):
+                    finished.append(voice)
+            if finished:
+                done = set(map(id, finished))
+                with self._lock:
+                    self._voices = [v for v in self._voices if id(v) not in done]
+
+            np.clip(mix * (self.volume * 32767.0), -32768, 32767, out=mix)
+            out[...] = mix
+            self.sink.write(out)
+            written += 1
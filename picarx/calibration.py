@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+import time
+from typing import List, Tuple, Union
+
+import numpy as np
+
+ADC_MAX: int = 4096
+
+
+class ChannelHistogram:
+    """
+    Fixed-bin histogram of grayscale readings for a set of channels.
+
+    Memory is constant no matter how many samples are added, and
+    percentiles come from the cumulative counts, so a single noisy sample
+    moves the statistics by at most one count.
+    """
+
+    def __init__(self, channels: int = 3, bins: int = 128, value_range: int = ADC_MAX) -> None:
+        self.bins = bins
+        self.width = value_range / bins
+        self.counts = np.zeros((channels, bins), dtype=np.int64)
+        self.centers = (np.arange(bins) + 0.5) * self.width
+        self._rows = np.arange(channels)
+
+    @property
+    def total(self) -> int:
+        return int(self.counts[0].sum())
+
+    def add(self, values: List[float]) -> None:
+        idx = np.clip((np.asarray(values) / self.width).astype(np.intp), 0, self.bins - 1)
+        self.counts[self._rows, idx] += 1
+
+    def reset(self) -> None:
+        self.counts[...] = 0
+
+    def percentile(self, channel: int, q: float, lo: int = 0, hi: Union[int, None] = None) -> float:
+        """
+        Return the ``q``-th percentile (0-100) of one channel, optionally
+        restricted to the bins ``lo`` to ``hi`` inclusive.
+        """
+        counts = self.counts[channel, lo:None if hi is None else hi + 1]
+        cum = np.cumsum(counts)
+        if cum[-1] == 0:
+            return float('nan')
+        k = int(np.searchsorted(cum, cum[-1] * q / 100.0))
+        return float(self.centers[lo + min(k, len(counts) - 1)])
+
+    def split(self, channel: int) -> Tuple[int, float]:
+        """
+        Split one channel into a dark and a bright cluster (Otsu's method).
+
+        :return: The index of the last bin in the dark cluster, and the
+                 distance between the cluster medians in pooled robust
+                 standard deviations (0 if there is only one cluster).
+        """
+        counts = self.counts[channel].astype(float)
+        total = counts.sum()
+        if total == 0:
+            return 0, 0.0
+        p = counts / total
+        omega = np.cumsum(p)
+        mu = np.cumsum(p * self.centers)
+        denom = omega * (1.0 - omega)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            between = np.where(denom > 0, (mu[-1] * omega - mu) ** 2 / denom, 0.0)
+        k = int(np.argmax(between))
+
+        if counts[:k + 1].sum() == 0 or counts[k + 1:].sum() == 0:
+            return k, 0.0
+        # Spread from the interquartile range so stray readings in the tails
+        # do not mask an otherwise clean split.
+        floor = self.width / np.sqrt(12.0)
+        m_lo = self.percentile(channel, 50, 0, k)
+        m_hi = self.percentile(channel, 50, k + 1)
+        s_lo = max((self.percentile(channel, 75, 0, k) - self.percentile(channel, 25, 0, k)) / 1.349, floor)
+        s_hi = max((self.percentile(channel, 75, k + 1) - self.percentile(channel, 25, k + 1)) / 1.349, floor)
+        return k, float((m_hi - m_lo) / np.sqrt((s_lo ** 2 + s_hi ** 2) / 2.0))
+
+
+class CalibrationResult:
+    """
+    Outcome of a calibration run.
+
+    :ivar reference: Per-channel reference values.
+    :ivar separation: Per-channel cluster separation (line calibration only).
+    :ivar samples: Number of sensor reads taken.
+    :ivar elapsed: Seconds spent sampling.
+    :ivar converged: True if the run stopped on confidence rather than timeout.
+    """
+
+    def __init__(self, reference: List[int], separation: List[float],
+                 samples: int, elapsed: float, converged: bool) -> None:
+        self.reference = reference
+        self.separation = separation
+        self.samples = samples
+        self.elapsed = elapsed
+        self.converged = converged
+
+    @property
+    def rate(self) -> float:
+        return self.samples / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self) -> str:
+        return (f"CalibrationResult(reference={self.reference}, separation={self.separation}, "
+                f"samples={self.samples}, elapsed={self.elapsed:.3f}, converged={self.converged})")
+
+
+class GrayscaleCalibrator:
+    """
+    Streaming grayscale reference calibration.
+
+    Sensors are read back to back at the full ADC rate and folded into
+    per-channel histograms.  Line calibration drives the same sweep as
+    ``calibration/grayscale_calibration.py`` but stops the moment every
+    channel shows a dark and a bright cluster separated by at least
+    ``min_separation`` pooled standard deviations.
+    """
+
+    # (steering angle, speed, seconds); positive speed is forward
+    MANEUVER: List[Tuple[float, int, float]] = [
+        (-30, 10, 0.8), (-30, -10, 0.8), (0, 0, 0.2),
+        (30, 10, 0.8), (30, -10, 0.8), (0, 0, 0.2),
+    ]
+
+    def __init__(self, px,
+                 min_separation: float = 4.0,
+                 min_cluster_fraction: float = 0.05,
+                 min_samples: int = 50,
+                 bins: int = 128) -> None:
+        """
+        :param px: Picarx instance.
+        :param min_separation: Cluster separation required to stop early.
+        :param min_cluster_fraction: Smallest share of samples either cluster
+                                     must hold before it is trusted.
+        :param min_samples: Samples to take before checking for convergence.
+        :param bins: Histogram bins across the ADC range.
+        """
+        self.px = px
+        self.min_separation = min_separation
+        self.min_cluster_fraction = min_cluster_fraction
+        self.min_samples = min_samples
+        self.histogram = ChannelHistogram(bins=bins)
+        self.line_result: Union[CalibrationResult, None] = None
+        self.cliff_result: Union[CalibrationResult, None] = None
+
+    def _separated(self) -> Tuple[bool, List[int], List[float]]:
+        hist = self.histogram
+        total = hist.total
+        splits = [hist.split(ch) for ch in range(3)]
+        ok = total >= self.min_samples
+        for ch, (k, sep) in enumerate(splits):
+            dark = hist.counts[ch, :k + 1].sum()
+            share = min(dark, total - dark) / total if total else 0.0
+            if sep < self.min_separation or share < self.min_cluster_fraction:
+                ok = False
+        return ok, [k for k, _ in splits], [round(sep, 2) for _, sep in splits]
+
+    def calibrate_line(self, drive: bool = True, timeout: float = 5.0) -> CalibrationResult:
+        """
+        Find the line reference: the midpoint between the median of the dark
+        (line) cluster and the median of the bright (background) cluster.
+
+        :param drive: Run the left/right sweep maneuver while sampling.  Set
+                      False to move the car by hand instead.
+        :param timeout: Give up after this many seconds.
+        """
+        px = self.px
+        hist = self.histogram
+        hist.reset()
+        samples = 0
+        converged = False
+        last_leg = None
+        start = time.monotonic()
+        try:
+            while time.monotonic() - start < timeout:
+                if drive and (last_leg is None or last_leg.done()):
+                    # the driver runs the legs on its own timing thread
+                    for angle, speed, duration in self.MANEUVER:
+                        last_leg = px.queue_motion(speed, angle, duration)
+
+                hist.add(px.get_grayscale_data())
+                samples += 1
+                if samples >= self.min_samples and samples % 10 == 0:
+                    converged, _, _ = self._separated()
+                    if converged:
+                        break
+        finally:
+            if drive:
+                px.cancel_motion()
+                px.set_dir_servo_angle(0)
+
+        _, splits, separation = self._separated()
+        reference = []
+        for ch, k in enumerate(splits):
+            dark = hist.percentile(ch, 50, 0, k)
+            bright = hist.percentile(ch, 50, k + 1)
+            reference.append(int((dark + bright) / 2) if not np.isnan(bright) else int(dark))
+        self.line_result = CalibrationResult(reference, separation, samples,
+                                             time.monotonic() - start, converged)
+        return self.line_result
+
+    def calibrate_cliff(self, timeout: float = 2.0, tolerance: float = 20.0) -> CalibrationResult:
+        """
+        Find the cliff reference with the sensors held over a drop-off.
+
+        Samples until the interquartile range of every channel is within
+        ``tolerance`` ADC counts.  If a line calibration has been run, the
+        reference is set halfway between the cliff median and the low end of
+        the line cluster, matching the TUI helper.
+
+        :param timeout: Give up after this many seconds.
+        :param tolerance: Interquartile range required to stop early.
+        """
+        hist = ChannelHistogram(bins=self.histogram.bins)
+        samples = 0
+        converged = False
+        start = time.monotonic()
+        while time.monotonic() - start < timeout:
+            hist.add(self.px.get_grayscale_data())
+            samples += 1
+            if samples >= self.min_samples and samples % 10 == 0:
+                if all(hist.percentile(ch, 75) - hist.percentile(ch, 25) <= tolerance for ch in range(3)):
+                    converged = True
+                    break
+
+        reference = []
+        for ch in range(3):
+            cliff = hist.percentile(ch, 50)
+            if self.line_result is not None:
+                line_low = self.histogram.percentile(ch, 5)
+                if cliff < line_low:
+                    cliff = (cliff + line_low) / 2
+            reference.append(int(cliff))
+        self.cliff_result = CalibrationResult(reference, [], samples,
+                                              time.monotonic() - start, converged)
+        return self.cliff_result
+
+    def apply(self) -> None:
+        """
+        Store the calibrated references on the Picarx (and its config file).
+        """
+        if self.line_result is not None:
+            self.px.set_line_reference(self.line_result.reference)
+        if self.cliff_result is not None:
+            self.px.set_cliff_reference(self.cliff_result.reference)
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+import json
+import os
+import pwd
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Tuple, Union
+
+
+class ConfigError(ValueError):
+    """
+    Raised when the configuration file or a value written to it is invalid.
+    """
+
+
+class Field:
+    """
+    One typed configuration key.
+
+    :ivar kind: ``float`` or ``int``.
+    :ivar length: Number of elements for list values, None for scalars.
+    :ivar default: Value used when the key is missing.
+    :ivar limits: Inclusive (min, max) range of every element.
+    :ivar choices: Allowed element values, if restricted.
+    """
+
+    def __init__(self, kind: type, default: Any, length: Union[int, None] = None,
+                 limits: Union[Tuple[float, float], None] = None,
+                 choices: Union[Tuple, None] = None, doc: str = '') -> None:
+        self.kind = kind
+        self.default = default
+        self.length = length
+        self.limits = limits
+        self.choices = choices
+        self.doc = doc
+
+    def describe(self) -> str:
+        item = 'number' if self.kind is float else 'integer'
+        if self.length:
+            item = f"a list of {self.length} {item}s"
+        else:
+            item = f"a {item}"
+        if self.choices is not None:
+            item += f" from {list(self.choices)}"
+        elif self.limits is not None:
+            item += f" in [{self.limits[0]}, {self.limits[1]}]"
+        return item
+
+    def parse(self, raw: Any) -> Any:
+        """
+        Convert a stored value, either JSON or the legacy fileDB string
+        form (``'0'``, ``'[1, 1]'``), into its typed form.
+
+        :raises ValueError: If it does not match the field.
+        """
+        if isinstance(raw, str):
+            text = raw.strip()
+            if self.length:
+                if not (text.startswith('[') and text.endswith(']')):
+                    raise ValueError("not a list")
+                parts = [p.strip() for p in text[1:-1].split(',')]
+                raw = [p for p in parts if p] if parts != [''] else []
+            else:
+                raw = text
+        if self.length:
+            if not isinstance(raw, (list, tuple)) or len(raw) != self.length:
+                raise ValueError(f"expected {self.length} elements")
+            return [self._scalar(v) for v in raw]
+        return self._scalar(raw)
+
+    def _scalar(self, raw: Any) -> Union[int, float]:
+        if isinstance(raw, bool):
+            raise ValueError(f"{raw!r} is not a number")
+        try:
+            value = float(raw)
+        except (TypeError, ValueError):
+            raise ValueError(f"{raw!r} is not a number") from None
+        if value != value or value in (float('inf'), float('-inf')):
+            raise ValueError(f"{raw!r} is not finite")
+        if self.kind is int:
+            if value != int(value):
+                raise ValueError(f"{raw!r} is not an integer")
+            value = int(value)
+        if self.choices is not None and value not in self.choices:
+            raise ValueError(f"{raw!r} is not one of {list(self.choices)}")
+        if self.limits is not None and not self.limits[0] <= value <= self.limits[1]:
+            raise ValueError(f"{raw!r} is outside [{self.limits[0]}, {self.limits[1]}]")
+        return value
+
+
+SCHEMA: Dict[str, Field] = {
+    'picarx_dir_servo': Field(float, 0.0, limits=(-90, 90), doc="Steering servo trim in degrees."),
+    'picarx_cam_pan_servo': Field(float, 0.0, limits=(-90, 90), doc="Camera pan servo trim in degrees."),
+    'picarx_cam_tilt_servo': Field(float, 0.0, limits=(-90, 90), doc="Camera tilt servo trim in degrees."),
+    'picarx_dir_motor': Field(int, [1, 1], length=2, choices=(1, -1),
+                              doc="Direction of the left and right motor."),
+    'line_reference': Field(float, [1000.0, 1000.0, 1000.0], length=3, limits=(0, 4095),
+                            doc="Grayscale line/background threshold per channel."),
+    'cliff_reference': Field(float, [500.0, 500.0, 500.0], length=3, limits=(0, 4095),
+                             doc="Grayscale cliff threshold per channel."),
+}
+
+# surface- and car-specific calibration that named profiles switch between
+PROFILE_KEYS = ('line_reference', 'cliff_reference',
+                'picarx_dir_servo', 'picarx_cam_pan_servo', 'picarx_cam_tilt_servo')
+
+
+class Config:
+    """
+    Typed Picar-X configuration, parsed once and held in memory.
+
+    The file is JSON (``{"version": 1, "values": {...}}``).  If ``path``
+    holds the old ``robot_hat.fileDB`` ``key = value`` format, the values
+    are migrated into a ``.json`` file next to it, which :attr:`path` then
+    points at; the old file is left untouched for software that still
+    reads it.
+    Reads are dictionary lookups; writes are validated against
+    :data:`SCHEMA` and saved atomically.  Keys not in the schema are kept
+    as they are.
+
+    Named calibration profiles (a subset of :data:`PROFILE_KEYS`) are
+    stored in the same file under ``"profiles"``, with the last activated
+    one under ``"profile"``.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Union[str, Path], owner: Union[str, None] = None,
+                 mode: int = 0o600) -> None:
+        """
+        :param path: Configuration file; created with defaults if missing.
+        :param owner: User the file should belong to when running as root.
+        :param mode: Permission bits for a newly written file.
+        :raises ConfigError: If the file holds invalid values.
+        """
+        self.path = Path(path).expanduser()
+        self.legacy_path: Union[Path, None] = None
+        self.owner = owner
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._values: Dict[str, Any] = {k: self._copy(f.default) for k, f in SCHEMA.items()}
+        self._extra: Dict[str, Any] = {}
+        self._profiles: Dict[str, Dict[str, Any]] = {}
+        self.active_profile: Union[str, None] = None
+        self.migrated = False
+        self.load()
+
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        return list(value) if isinstance(value, list) else value
+
+    def load(self) -> None:
+        """
+        (Re)read the file.
+
+        :raises ConfigError: Listing every invalid key.
+        """
+        if not self.path.exists():
+            self.save()
+            return
+        text = self.path.read_text()
+        try:
+            data = json.loads(text) if text.strip() else {'version': self.VERSION, 'values': {}}
+            if not isinstance(data, dict) or not isinstance(data.get('values'), dict):
+                raise ConfigError(f"{self.path}: expected an object with a 'values' mapping.")
+            raw = data['values']
+            raw_profiles = data.get('profiles', {})
+            active = data.get('profile')
+            legacy = False
+        except json.JSONDecodeError:
+            target = self._migration_target(self.path)
+            self.legacy_path, self.path = self.path, target
+            if target.exists():
+                # migrated on an earlier run
+                self.load()
+                return
+            raw = self._parse_filedb(text)
+            raw_profiles, active = {}, None
+            legacy = True
+
+        values = {k: self._copy(f.default) for k, f in SCHEMA.items()}
+        extra: Dict[str, Any] = {}
+        errors: List[str] = []
+        for key, value in raw.items():
+            field = SCHEMA.get(key)
+            if field is None:
+                extra[key] = value
+                continue
+            try:
+                values[key] = field.parse(value)
+            except ValueError as e:
+                errors.append(f"  {key} = {value!r}: {e}; expected {field.describe()}")
+        profiles: Dict[str, Dict[str, Any]] = {}
+        for name, raw_profile in raw_profiles.items():
+            try:
+                profiles[name] = self._parse_profile(raw_profile)
+            except ConfigError as e:
+                errors.append(f"  profile {name!r}: {e}")
+        if errors:
+            raise ConfigError(f"Invalid values in {self.path}:\n" + "\n".join(errors))
+
+        with self._lock:
+            self._values = values
+            self._extra = extra
+            self._profiles = profiles
+            self.active_profile = active if active in profiles else None
+        if legacy:
+            self.save()
+            self.migrated = True
+
+    @staticmethod
+    def _migration_target(path: Path) -> Path:
+        target = path.with_suffix('.json')
+        return target if target != path else path.with_name(path.stem + '.migrated.json')
+
+    @staticmethod
+    def _parse_filedb(text: str) -> Dict[str, str]:
+        raw = {}
+        for line in text.splitlines():
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            key, value = line.split('=', 1)
+            raw[key.strip()] = value.strip()
+        return raw
+
+    def save(self) -> None:
+        """
+        Write the current values atomically.
+        """
+        with self._lock:
+            data = {'version': self.VERSION, 'values': {**self._extra, **self._values}}
+            if self._profiles:
+                data['profiles'] = self._profiles
+                data['profile'] = self.active_profile
+            text = json.dumps(data, indent=2) + "\n"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        tmp.write_text(text)
+        os.chmod(tmp, self.mode)
+        if self.owner and os.geteuid() == 0:
+            try:
+                pw = pwd.getpwnam(self.owner)
+                os.chown(tmp, pw.pw_uid, pw.pw_gid)
+            except KeyError:
+                pass
+        os.replace(tmp, self.path)
+
+    def get(self, key: str) -> Any:
+        """
+        Typed value of ``key``; lists are returned as copies.
+
+        :raises KeyError: If the key is not in the schema.
+        """
+        return self._copy(self._values[key])
+
+    def __getitem__(self, key: str) -> Any:
+        return self.get(key)
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Validate, store and save one value.
+
+        :raises ConfigError: If the key is unknown or the value is invalid.
+        """
+        self.update({key: value})
+
+    def update(self, values: Dict[str, Any]) -> None:
+        """
+        Validate several values, then store and save them together.
+
+        :raises ConfigError: If any key is unknown or any value is invalid;
+                             nothing is changed in that case.
+        """
+        parsed = self._parse_values(values)
+        with self._lock:
+            self._values.update(parsed)
+        self.save()
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {k: self._copy(v) for k, v in self._values.items()}
+
+    @staticmethod
+    def _parse_values(values: Dict[str, Any]) -> Dict[str, Any]:
+        parsed = {}
+        for key, value in values.items():
+            field = SCHEMA.get(key)
+            if field is None:
+                raise ConfigError(f"Unknown configuration key {key!r}.")
+            try:
+                parsed[key] = field.parse(value)
+            except ValueError as e:
+                raise ConfigError(f"{key} = {value!r}: {e}; expected {field.describe()}") from None
+        return parsed
+
+    def _parse_profile(self, values: Any) -> Dict[str, Any]:
+        if not isinstance(values, dict):
+            raise ConfigError("a profile must be a mapping of calibration keys.")
+        extra = set(values) - set(PROFILE_KEYS)
+        if extra:
+            raise ConfigError(f"keys {sorted(extra)} cannot be part of a profile; "
+                              f"allowed are {list(PROFILE_KEYS)}.")
+        return self._parse_values(values)
+
+    def profiles(self) -> List[str]:
+        with self._lock:
+            return sorted(self._profiles)
+
+    def profile(self, name: str) -> Dict[str, Any]:
+        """
+        Values stored in profile ``name``.
+
+        :raises ConfigError: If there is no such profile.
+        """
+        with self._lock:
+            if name not in self._profiles:
+                raise ConfigError(f"Unknown calibration profile {name!r}; "
+                                  f"available: {sorted(self._profiles)}.")
+            return {k: self._copy(v) for k, v in self._profiles[name].items()}
+
+    def save_profile(self, name: str, values: Union[Dict[str, Any], None] = None) -> None:
+        """
+        Store a profile, by default a snapshot of the current calibration.
+
+        :raises ConfigError: If a value is invalid or not profile data.
+        """
+        if values is None:
+            values = {k: self.get(k) for k in PROFILE_KEYS}
+        parsed = self._parse_profile(values)
+        with self._lock:
+            self._profiles[name] = parsed
+        self.save()
+
+    def delete_profile(self, name: str) -> None:
+        with self._lock:
+            self._profiles.pop(name, None)
+            if self.active_profile == name:
+                self.active_profile = None
+        self.save()
+
+    def activate(self, name: str, persist: bool = True) -> Dict[str, Any]:
+        """
+        Make profile ``name`` the current calibration.
+
+        :param persist: Also write the change to the file.
+        :return: The profile's values.
+        :raises ConfigError: If there is no such profile.
+        """
+        values = self.profile(name)
+        with self._lock:
+            self._values.update(values)
+            self.active_profile = name
+        if persist:
+            self.save()
+        return values
+
+
+class FileDBCompat:
+    """
+    ``robot_hat.fileDB``-style view of a :class:`Config` for code written
+    against the old ``Picarx.config_file``: values are read and written as
+    strings (``'0.0'``, ``'[1, 1]'``).
+    """
+
+    def __init__(self, config: Config) -> None:
+        self.config = config
+
+    def get(self, name: str, default_value: Union[str, None] = None) -> Union[str, None]:
+        if name in SCHEMA:
+            return str(self.config.get(name))
+        with self.config._lock:
+            value = self.config._extra.get(name)
+        return default_value if value is None else str(value)
+
+    def set(self, name: str, value: Any) -> None:
+        """
+        :raises ConfigError: If ``name`` is a schema key and ``value`` does
+                             not parse.
+        """
+        if name in SCHEMA:
+            self.config.set(name, value)
+            return
+        with self.config._lock:
+            self.config._extra[name] = str(value)
+        self.config.save()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+import threading
+import time
+from typing import Any, Dict, Iterable, Union
+
+
+def _changed(old: Any, new: Any, deadband: float) -> bool:
+    """
+    True if ``new`` differs from ``old`` by more than ``deadband``.  Numbers
+    and equal-length numeric sequences are compared element-wise; anything
+    else by equality.
+    """
+    if old is None:
+        return True
+    try:
+        if isinstance(new, (list, tuple)):
+            if len(new) != len(old):
+                return True
+            return any(abs(n - o) > deadband for n, o in zip(new, old))
+        return abs(new - old) > deadband
+    except TypeError:
+        return new != old
+
+
+class ControllerBridge:
+    """
+    Rate-controlled link between the car and a ``SunFounderController``.
+
+    Outputs are handed to :meth:`publish` as often as convenient; a bridge
+    thread forwards a value only when it moved beyond its deadband, no more
+    often than ``max_rate`` per key, and re-sends it every ``keepalive``
+    seconds so a reconnecting app catches up.  The same thread polls the
+    input widgets at ``rate`` into a snapshot that :meth:`get` reads
+    without touching the link.
+    """
+
+    def __init__(self, sc, rate: float = 50.0, max_rate: float = 10.0,
+                 keepalive: float = 2.0, inputs: Iterable[str] = ()) -> None:
+        """
+        :param sc: SunFounderController instance.
+        :param rate: Bridge ticks per second (input polling and flushing).
+        :param max_rate: Maximum sends per second for any one output.
+        :param keepalive: Seconds after which an unchanged output is re-sent.
+        :param inputs: Widget keys to poll; more are added on first :meth:`get`.
+        """
+        self.sc = sc
+        self.period = 1.0 / rate
+        self.min_interval = 1.0 / max_rate
+        self.keepalive = keepalive
+        self._lock = threading.Lock()
+        self._inputs: Dict[str, Any] = {key: None for key in inputs}
+        self._deadbands: Dict[str, float] = {}
+        self._pending: Dict[str, Any] = {}
+        self._sent: Dict[str, Any] = {}
+        self._sent_at: Dict[str, float] = {}
+        self._running = False
+        self._thread: Union[threading.Thread, None] = None
+        self.sent = 0
+        self.suppressed = 0
+        self.polls = 0
+
+    def deadband(self, key: str, value: float) -> None:
+        """
+        Set how far an output must move before it is sent again.
+        """
+        with self._lock:
+            self._deadbands[key] = value
+
+    def publish(self, key: str, value: Any) -> None:
+        """
+        Offer a new value for an output; returns immediately.  Values
+        superseded before the next flush are counted as suppressed.
+        """
+        with self._lock:
+            if key in self._pending:
+                self.suppressed += 1
+            self._pending[key] = value
+
+    def get(self, key: str) -> Any:
+        """
+        Latest polled value of an input widget.
+        """
+        with self._lock:
+            if key not in self._inputs:
+                self._inputs[key] = self.sc.get(key)
+            return self._inputs[key]
+
+    def metrics(self) -> Dict[str, int]:
+        return {'sent': self.sent, 'suppressed': self.suppressed, 'polls': self.polls}
+
+    def poll(self) -> None:
+        """
+        Refresh the input snapshot.
+        """
+        with self._lock:
+            keys = list(self._inputs)
+        values = {key: self.sc.get(key) for key in keys}
+        with self._lock:
+            self._inputs.update(values)
+        self.polls += 1
+
+    def flush(self) -> None:
+        """
+        Send the pending outputs that are due.
+        """
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for key, value in list(self._pending.items()):
+                last = self._sent_at.get(key)
+                age = float('inf') if last is None else now - last
+                if age < self.min_interval:
+                    # keep it pending; it may still go out once the key is due
+                    continue
+                del self._pending[key]
+                if age < self.keepalive and not _changed(self._sent.get(key), value,
+                                                          self._deadbands.get(key, 0.0)):
+                    self.suppressed += 1
+                    continue
+                self._sent[key] = value
+                self._sent_at[key] = now
+                due.append((key, value))
+        for key, value in due:
+            self.sc.set(key, value)
+        self.sent += len(due)
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self) -> None:
+        next_tick = time.monotonic()
+        while self._running:
+            try:
+                self.poll()
+                self.flush()
+            except Exception as e:
+                print(f'\033[31mcontroller bridge error: {e}\033[m')
+            next_tick += self.period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+import argparse
+import builtins
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from numbers import Integral, Real
+from typing import Any, Dict, List, Tuple, Union
+
+
+def default_socket_path() -> str:
+    """
+    ``$PICARX_SOCKET``, else ``picarx.sock`` in ``$XDG_RUNTIME_DIR`` or /tmp.
+    """
+    path = os.getenv("PICARX_SOCKET")
+    if path:
+        return path
+    return os.path.join(os.getenv("XDG_RUNTIME_DIR") or "/tmp", "picarx.sock")
+
+
+# Methods callable over the socket, identified on the wire by their index.
+# Append only: reordering breaks clients of a different version.
+METHODS = (
+    'forward', 'backward', 'stop', 'brake', 'set_power', 'set_motor_speed',
+    'set_dir_servo_angle', 'set_cam_pan_angle', 'set_cam_tilt_angle',
+    'get_distance', 'get_grayscale_data', 'get_line_status', 'get_cliff_status',
+    'set_grayscale_reference', 'set_line_reference', 'set_cliff_reference',
+    'get_motor_pwm', 'cancel_motion', 'reset',
+    'dir_servo_calibrate', 'cam_pan_servo_calibrate', 'cam_tilt_servo_calibrate',
+    'motor_direction_calibrate', 'motor_speed_calibration',
+    'enable_cliff_guard', 'disable_cliff_guard', 'clear_cliff', 'cliff_guard_metrics',
+    'save_profile', 'use_profile',
+    '_getattr',
+)
+METHOD_IDS = {name: i for i, name in enumerate(METHODS)}
+
+# Methods that set the motors going; the car is stopped when the
+# connection that last called one of them goes away.
+MOTION_METHODS = frozenset(('forward', 'backward', 'set_power', 'set_motor_speed'))
+
+# Attributes readable through the client's properties.
+ATTRIBUTES = (
+    'line_reference', 'cliff_reference', 'cliff_detected',
+    'dir_current_angle', 'cam_pan_current_angle', 'cam_tilt_current_angle',
+    'dir_cali_val', 'cam_pan_cali_val', 'cam_tilt_cali_val', 'cali_dir_value',
+    'DIR_MIN', 'DIR_MAX', 'CAM_PAN_MIN', 'CAM_PAN_MAX', 'CAM_TILT_MIN', 'CAM_TILT_MAX',
+)
+
+_LEN = struct.Struct('<I')
+_REQUEST = struct.Struct('<IH')
+_RESPONSE = struct.Struct('<IB')
+_INT = struct.Struct('<q')
+_FLOAT = struct.Struct('<d')
+_COUNT = struct.Struct('<H')
+
+
+class RemoteError(RuntimeError):
+    """
+    An exception raised in the daemon that has no builtin equivalent.
+    """
+
+
+def encode(value: Any, out: bytearray) -> None:
+    """
+    Append ``value`` in the wire format: a one-byte tag followed by a
+    fixed-size number or a length-prefixed string, list or dict.
+    """
+    if value is None:
+        out += b'N'
+    elif value is True:
+        out += b'T'
+    elif value is False:
+        out += b'F'
+    elif isinstance(value, Integral):
+        out += b'i'
+        out += _INT.pack(int(value))
+    elif isinstance(value, Real):
+        out += b'd'
+        out += _FLOAT.pack(float(value))
+    elif isinstance(value, str):
+        data = value.encode()
+        out += b's'
+        out += _LEN.pack(len(data))
+        out += data
+    elif isinstance(value, (list, tuple)):
+        out += b'l'
+        out += _COUNT.pack(len(value))
+        for item in value:
+            encode(item, out)
+    elif isinstance(value, dict):
+        out += b'm'
+        out += _COUNT.pack(len(value))
+        for key, item in value.items():
+            encode(str(key), out)
+            encode(item, out)
+    else:
+        raise TypeError(f"Cannot send {type(value).__name__} over the picarx socket.")
+
+
+def decode(data: bytes, pos: int = 0) -> Tuple[Any, int]:
+    """
+    Decode one value starting at ``pos``.
+
+    :return: The value and the position after it.
+    """
+    tag = data[pos:pos + 1]
+    pos += 1
+    if tag == b'N':
+        return None, pos
+    if tag == b'T':
+        return True, pos
+    if tag == b'F':
+        return False, pos
+    if tag == b'i':
+        return _INT.unpack_from(data, pos)[0], pos + 8
+    if tag == b'd':
+        return _FLOAT.unpack_from(data, pos)[0], pos + 8
+    if tag == b's':
+        n = _LEN.unpack_from(data, pos)[0]
+        pos += 4
+        return data[pos:pos + n].decode(), pos + n
+    if tag == b'l':
+        n = _COUNT.unpack_from(data, pos)[0]
+        pos += 2
+        items = []
+        for _ in range(n):
+            item, pos = decode(data, pos)
+            items.append(item)
+        return items, pos
+    if tag == b'm':
+        n = _COUNT.unpack_from(data, pos)[0]
+        pos += 2
+        result = {}
+        for _ in range(n):
+            key, pos = decode(data, pos)
+            result[key], pos = decode(data, pos)
+        return result, pos
+    raise ValueError(f"Bad tag {tag!r} in picarx message.")
+
+
+def _read_frame(stream) -> Union[bytes, None]:
+    header = stream.read(4)
+    if len(header) < 4:
+        return None
+    n = _LEN.unpack(header)[0]
+    body = stream.read(n)
+    return body if len(body) == n else None
+
+
+class _SensorCache:
+    """
+    Shares sensor readings between clients: a reading younger than
+    ``max_age`` is returned instead of touching the hardware again, and
+    concurrent requests for a stale value wait for a single read.
+    """
+
+    def __init__(self, read, max_age: float) -> None:
+        self.read = read
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._value = None
+        self._at = 0.0
+        self.reads = 0
+        self.shared = 0
+
+    def get(self) -> Any:
+        with self._lock:
+            if time.monotonic() - self._at > self.max_age:
+                self._value = self.read()
+                self._at = time.monotonic()
+                self.reads += 1
+            else:
+                self.shared += 1
+            return self._value
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self) -> None:
+        daemon: "PicarxDaemon" = self.server.owner
+        daemon.clients += 1
+        try:
+            while True:
+                body = _read_frame(self.rfile)
+                if body is None:
+                    return
+                req_id, method_id = _REQUEST.unpack_from(body)
+                try:
+                    args, _ = decode(body, _REQUEST.size)
+                    name = METHODS[method_id]
+                    if name in MOTION_METHODS:
+                        daemon.driver = self
+                    result = daemon.call(name, args)
+                    status = 0
+                except Exception as e:
+                    result = [type(e).__name__, str(e)]
+                    status = 1
+                out = bytearray(_LEN.size + _RESPONSE.size)
+                try:
+                    encode(result, out)
+                except TypeError as e:
+                    status = 1
+                    del out[_LEN.size + _RESPONSE.size:]
+                    encode(['TypeError', str(e)], out)
+                _LEN.pack_into(out, 0, len(out) - _LEN.size)
+                _RESPONSE.pack_into(out, _LEN.size, req_id, status)
+                self.wfile.write(out)
+        finally:
+            # a client that crashes or exits mid-drive must not leave the
+            # car running; another client driving it since is left alone
+            if daemon.driver is self:
+                daemon.driver = None
+                try:
+                    daemon.px.stop()
+                except Exception as e:
+                    print(f'\033[31mpicarx daemon: stop on disconnect failed: {e}\033[m')
+            daemon.clients -= 1
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class PicarxDaemon:
+    """
+    Owns a :class:`Picarx` and serves it to :class:`PicarxClient` instances.
+
+    Run ``python3 -m picarx.daemon`` once: it constructs the only Picarx
+    (the only GPIO cleanup and MCU reset) and keeps its ramp thread
+    running, so scripts attach in milliseconds and several programs can
+    share the car.  Each connection is handled on its own thread; requests
+    on one connection are executed in order and answered as they complete,
+    so a client may keep many requests in flight.  Sensor reads are shared
+    between clients through a short-lived cache.  When a connection closes
+    while it was the last one to drive the motors, the car is stopped.
+    """
+
+    def __init__(self, px=None, path: Union[str, None] = None,
+                 sensor_max_age: float = 0.01, mode: int = 0o660) -> None:
+        """
+        :param px: Picarx to serve; constructed if None.
+        :param path: Socket path; see :func:`default_socket_path`.
+        :param sensor_max_age: Seconds a sensor reading may be shared.
+        :param mode: Permission bits of the socket file.
+        """
+        if px is None:
+            from .picarx import Picarx
+            px = Picarx()
+        self.px = px
+        self.path = path or default_socket_path()
+        self.mode = mode
+        self.clients = 0
+        self.requests = 0
+        # connection that last sent a motion command
+        self.driver: Union[_Handler, None] = None
+        self._sensors: Dict[str, _SensorCache] = {
+            'get_distance': _SensorCache(px.get_distance, sensor_max_age),
+            'get_grayscale_data': _SensorCache(px.get_grayscale_data, sensor_max_age),
+        }
+        self._server: Union[_Server, None] = None
+
+    def call(self, name: str, args: List[Any]) -> Any:
+        self.requests += 1
+        if name == '_getattr':
+            if args[0] not in ATTRIBUTES:
+                raise AttributeError(f"Picarx attribute {args[0]!r} is not served.")
+            return getattr(self.px, args[0])
+        cache = self._sensors.get(name)
+        if cache is not None and not args:
+            return cache.get()
+        return getattr(self.px, name)(*args)
+
+    def metrics(self) -> Dict[str, int]:
+        m = {'clients': self.clients, 'requests': self.requests}
+        for name, cache in self._sensors.items():
+            m[f'{name}_reads'] = cache.reads
+            m[f'{name}_shared'] = cache.shared
+        return m
+
+    def serve_forever(self) -> None:
+        if os.path.exists(self.path):
+            # a live daemon would still be accepting connections
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise RuntimeError(f"A picarx daemon is already serving {self.path}.")
+            finally:
+                probe.close()
+        self._server = _Server(self.path, _Handler)
+        self._server.owner = self
+        os.chmod(self.path, self.mode)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def shutdown(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+
+
+class PicarxClient:
+    """
+    Drop-in stand-in for :class:`Picarx` talking to a running daemon.
+
+    Every method of the driver listed in :data:`METHODS` is available with
+    the same arguments.  ``call_async`` sends a request without waiting and
+    returns a future, so many commands can be pipelined on one connection;
+    the plain methods are ``call_async(...).result()``.
+    """
+
+    def __init__(self, path: Union[str, None] = None, timeout: float = 5.0) -> None:
+        """
+        :param path: Daemon socket path; see :func:`default_socket_path`.
+        :param timeout: Seconds to wait for each synchronous reply.
+        """
+        self.path = path or default_socket_path()
+        self.timeout = timeout
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(self.path)
+        self._rfile = self._sock.makefile('rb')
+        self._send_lock = threading.Lock()
+        self._pending: Dict[int, Future] = {}
+        self._next_id = 0
+        self._closed = False
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    def call_async(self, name: str, *args) -> Future:
+        """
+        Send one request and return a future for its result.
+
+        :raises AttributeError: If ``name`` is not a served method.
+        """
+        method_id = METHOD_IDS.get(name)
+        if method_id is None:
+            raise AttributeError(f"Picarx method {name!r} is not served by the daemon.")
+        out = bytearray(_LEN.size + _REQUEST.size)
+        encode(list(args), out)
+        future: Future = Future()
+        with self._send_lock:
+            if self._closed:
+                raise ConnectionError("The picarx client is closed.")
+            req_id = self._next_id
+            self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+            self._pending[req_id] = future
+            _LEN.pack_into(out, 0, len(out) - _LEN.size)
+            _REQUEST.pack_into(out, _LEN.size, req_id, method_id)
+            self._sock.sendall(out)
+        return future
+
+    def call(self, name: str, *args) -> Any:
+        return self.call_async(name, *args).result(self.timeout)
+
+    def _read_loop(self) -> None:
+        error: Exception = ConnectionError("The picarx daemon closed the connection.")
+        try:
+            while True:
+                body = _read_frame(self._rfile)
+                if body is None:
+                    break
+                req_id, status = _RESPONSE.unpack_from(body)
+                value, _ = decode(body, _RESPONSE.size)
+                with self._send_lock:
+                    future = self._pending.pop(req_id, None)
+                if future is None:
+                    continue
+                if status == 0:
+                    future.set_result(value)
+                else:
+                    name, message = value
+                    cls = getattr(builtins, name, None)
+                    if not (isinstance(cls, type) and issubclass(cls, Exception)):
+                        cls = RemoteError
+                        message = f"{name}: {message}"
+                    future.set_exception(cls(message))
+        except OSError as e:
+            error = e
+        with self._send_lock:
+            self._closed = True
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(error)
+
+    def close(self) -> None:
+        with self._send_lock:
+            self._closed = True
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
+        try:
+            self.stop()
+        finally:
+            self.close()
+        return False
+
+
+def _make_method(name: str):
+    def method(self, *args):
+        return self.call(name, *args)
+    method.__name__ = name
+    method.__doc__ = f"Remote ``Picarx.{name}``."
+    return method
+
+
+def _make_property(name: str):
+    return property(lambda self: self.call('_getattr', name), doc=f"Remote ``Picarx.{name}``.")
+
+
+for _name in METHODS:
+    if not _name.startswith('_'):
+        setattr(PicarxClient, _name, _make_method(_name))
+for _name in ATTRIBUTES:
+    setattr(PicarxClient, _name, _make_property(_name))
+
+
+def connect(path: Union[str, None] = None):
+    """
+    A :class:`PicarxClient` if a daemon is serving ``path``, otherwise a
+    local :class:`Picarx` that owns the hardware directly.
+    """
+    try:
+        return PicarxClient(path)
+    except OSError:
+        from .picarx import Picarx
+        return Picarx()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the Picar-X hardware on a Unix socket.")
+    parser.add_argument('--socket', default=None, help="socket path (default: $PICARX_SOCKET or $XDG_RUNTIME_DIR/picarx.sock)")
+    parser.add_argument('--sensor-max-age', type=float, default=0.01,
+                        help="seconds a sensor reading is shared between clients")
+    args = parser.parse_args()
+    daemon = PicarxDaemon(path=args.socket, sensor_max_age=args.sensor_max_age)
+    print(f"picarx daemon serving {daemon.path}")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.px.stop()
+        daemon.px.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+import threading
+import time
+from typing import Callable, Dict, List, Union
+
+import numpy as np
+
+from .picarx import constrain
+
+
+class LineEstimate:
+    """
+    Line position in front of the car, fitted as x = c + b*d + a*d**2.
+
+    ``x`` is the lateral position normalised to -1 (left image edge) .. 1
+    (right image edge); ``d`` is the distance ahead normalised to 0 (bottom
+    of the region of interest) .. 1 (top of it).
+
+    :ivar offset: Lateral position at the car, ``c``.
+    :ivar heading: Slope of the line, ``b``.
+    :ivar curvature: Second derivative, ``2a``; 0 for a straight fit.
+    :ivar confidence: Fraction of row bands in which the line was found.
+    :ivar timestamp: ``time.monotonic()`` when the frame was processed.
+    :ivar elapsed: Seconds spent processing the frame.
+    """
+
+    def __init__(self, coeffs: np.ndarray, confidence: float, timestamp: float, elapsed: float) -> None:
+        # numpy order: highest power first
+        coeffs = np.concatenate([np.zeros(3 - len(coeffs)), coeffs])
+        self.curvature = float(2 * coeffs[0])
+        self.heading = float(coeffs[1])
+        self.offset = float(coeffs[2])
+        self.confidence = confidence
+        self.timestamp = timestamp
+        self.elapsed = elapsed
+
+    def x_at(self, distance: float) -> float:
+        """
+        Lateral line position ``distance`` (0..1 of the ROI) ahead.
+        """
+        return self.offset + self.heading * distance + 0.5 * self.curvature * distance ** 2
+
+    def steering_angle(self, max_angle: float = 30, lookahead: float = 0.5, gain: float = 1.0) -> float:
+        """
+        Steering angle for ``Picarx.set_dir_servo_angle`` aiming at the line
+        ``lookahead`` ahead, so the car turns in before it reaches a curve.
+        """
+        return constrain(gain * max_angle * self.x_at(lookahead), -max_angle, max_angle)
+
+    def state(self, deadband: float = 0.15, lookahead: float = 0.0) -> str:
+        """
+        The grayscale-path status ('forward', 'left' or 'right') for code
+        written against ``get_line_status``.  As in the examples'
+        ``get_status()``, 'right' means the line is under the left sensor
+        and 'left' that it is under the right one, i.e. the car has drifted
+        that way and steers back toward the line.
+        """
+        x = self.x_at(lookahead)
+        if x > deadband:
+            return 'left'
+        if x < -deadband:
+            return 'right'
+        return 'forward'
+
+    def __repr__(self) -> str:
+        return (f"LineEstimate(offset={self.offset:.3f}, heading={self.heading:.3f}, "
+                f"curvature={self.curvature:.3f}, confidence={self.confidence:.2f})")
+
+
+class CameraLineTracker:
+    """
+    Line tracking from the camera image.
+
+    The bottom part of the frame (the ground just ahead) is sampled every
+    ``stride`` pixels and reduced to grayscale.  Pixels on the darker (or
+    lighter) side of the midpoint between the darkest and brightest sample
+    are treated as line; the ROI is split into row bands and each band's
+    line centroid is computed in one vectorised pass, then a quadratic is
+    fitted through the centroids.  If a frame takes longer than
+    ``budget`` the sampling stride is increased for the following frames,
+    and lowered again once there is headroom, so processing time stays
+    bounded at camera rate.
+    """
+
+    def __init__(self, source=None,
+                 roi: tuple = (0.5, 1.0),
+                 stride: int = 4,
+                 bands: int = 8,
+                 dark_line: bool = True,
+                 min_contrast: float = 40.0,
+                 min_fraction: float = 0.02,
+                 budget: float = 0.005,
+                 max_stride: int = 16) -> None:
+        """
+        :param source: Object exposing ``img``; defaults to ``vilib.Vilib``.
+                       Not needed when frames are passed to :meth:`process`.
+        :param roi: Top and bottom of the region of interest as fractions
+                    of the frame height.
+        :param stride: Pixel stride of the sampling grid.
+        :param bands: Number of row bands centroids are computed for.
+        :param dark_line: The line is darker than the floor.
+        :param min_contrast: Smallest darkest-to-brightest spread (0-255)
+                             accepted as a line.
+        :param min_fraction: Fraction of a band's pixels that must be line
+                             for the band to count.
+        :param budget: Target processing time per frame in seconds.
+        :param max_stride: Coarsest stride used to stay within budget.
+        """
+        self.source = source
+        self.roi = roi
+        self.base_stride = stride
+        self.stride = stride
+        self.bands = bands
+        self.dark_line = dark_line
+        self.min_contrast = min_contrast
+        self.min_fraction = min_fraction
+        self.budget = budget
+        self.max_stride = max_stride
+        self._grid_key = None
+        self._gray: Union[np.ndarray, None] = None
+        self._xs: Union[np.ndarray, None] = None
+        self._ds: Union[np.ndarray, None] = None
+        self._latest: Union[LineEstimate, None] = None
+        self._callback: Union[Callable[[Union[LineEstimate, None]], None], None] = None
+        self._running = False
+        self._thread: Union[threading.Thread, None] = None
+        self.frames = 0
+        self.lost = 0
+        self.over_budget = 0
+
+    def _grid(self, frame: np.ndarray) -> np.ndarray:
+        h = frame.shape[0]
+        top, bottom = int(h * self.roi[0]), int(h * self.roi[1])
+        view = frame[top:bottom:self.stride, ::self.stride]
+        # trim so the rows split evenly into bands
+        rows = view.shape[0] - view.shape[0] % self.bands
+        view = view[view.shape[0] - rows:]
+        key = (view.shape[:2], self.stride)
+        if key != self._grid_key:
+            self._grid_key = key
+            self._gray = np.empty(view.shape[:2], dtype=np.float32)
+            w = view.shape[1]
+            self._xs = (np.arange(w, dtype=np.float32) - (w - 1) / 2) / ((w - 1) / 2)
+            # distance ahead of each band's centre; band 0 is the top one
+            self._ds = 1.0 - (np.arange(self.bands) + 0.5) / self.bands
+        if view.ndim == 3:
+            np.mean(view, axis=2, out=self._gray)
+        else:
+            self._gray[...] = view
+        return self._gray
+
+    def process(self, frame: np.ndarray) -> Union[LineEstimate, None]:
+        """
+        Estimate the line in one frame.
+
+        :return: The estimate, or None if no line is visible.
+        """
+        start = time.perf_counter()
+        gray = self._grid(frame)
+        self.frames += 1
+        lo, hi = float(gray.min()), float(gray.max())
+        estimate = None
+        if hi - lo >= self.min_contrast:
+            mid = (lo + hi) / 2
+            mask = gray < mid if self.dark_line else gray > mid
+            rows, w = mask.shape
+            banded = mask.reshape(self.bands, rows // self.bands, w)
+            per_column = banded.sum(axis=1, dtype=np.float32)
+            counts = per_column.sum(axis=1)
+            sums = per_column @ self._xs
+            found = counts >= self.min_fraction * (rows // self.bands) * w
+            n = int(found.sum())
+            if n >= 2:
+                xs = sums[found] / counts[found]
+                coeffs = np.polyfit(self._ds[found], xs, 2 if n >= 3 else 1)
+                estimate = LineEstimate(coeffs, n / self.bands, time.monotonic(), 0.0)
+        if estimate is None:
+            self.lost += 1
+
+        elapsed = time.perf_counter() - start
+        if elapsed > self.budget:
+            self.over_budget += 1
+            self.stride = min(self.stride + 1, self.max_stride)
+        elif elapsed < self.budget / 2 and self.stride > self.base_stride:
+            self.stride -= 1
+        if estimate is not None:
+            estimate.elapsed = elapsed
+        self._latest = estimate
+        return estimate
+
+    def latest(self) -> Union[LineEstimate, None]:
+        """
+        The estimate from the most recent frame.
+        """
+        return self._latest
+
+    def benchmark(self, frame: np.ndarray, count: int = 200) -> Dict[str, float]:
+        """
+        Time :meth:`process` on one frame, in seconds per frame.  The stride
+        is held fixed so the numbers describe the configured resolution.
+        """
+        budget, self.budget = self.budget, float('inf')
+        times: List[float] = []
+        try:
+            for _ in range(count):
+                t = time.perf_counter()
+                self.process(frame)
+                times.append(time.perf_counter() - t)
+        finally:
+            self.budget = budget
+        times.sort()
+        return {
+            'mean': sum(times) / len(times),
+            'p95': times[int(len(times) * 0.95) - 1],
+            'max': times[-1],
+            'fps': len(times) / sum(times),
+        }
+
+    def metrics(self) -> Dict[str, float]:
+        return {'frames': self.frames, 'lost': self.lost,
+                'over_budget': self.over_budget, 'stride': self.stride}
+
+    def start(self, callback: Union[Callable[[Union[LineEstimate, None]], None], None] = None) -> None:
+        """
+        Process every new camera frame on a background thread, optionally
+        calling ``callback`` with each estimate.
+        """
+        if self._running:
+            return
+        if self.source is None:
+            from vilib import Vilib
+            self.source = Vilib
+        self._callback = callback
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self) -> None:
+        last = None
+        while self._running:
+            frame = self.source.img
+            if frame is None or frame is last:
+                time.sleep(0.002)
+                continue
+            last = frame
+            estimate = self.process(frame)
+            if self._callback is not None:
+                self._callback(estimate)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+import math
+import os
+import threading
+from typing import Tuple, Union
+
+import numpy as np
+
+Pose = Tuple[float, float, float]
+
+
+class OccupancyGrid:
+    """
+    Log-odds occupancy grid built from ultrasonic range readings.
+
+    World coordinates are in centimetres with the origin at the centre of
+    the grid; headings are in radians, counter-clockwise positive.  Pan
+    angles follow ``Picarx.set_cam_pan_angle`` (positive looks right).
+
+    Each reading traces a small fan of rays across the sonar beam.  Only
+    the cells those rays cross are read and written, so an update costs
+    O(range / resolution) regardless of the grid size.
+    """
+
+    MAX_RANGE: float = 300.0
+    BEAM_WIDTH: float = math.radians(15)
+
+    def __init__(self,
+                 size: Tuple[int, int] = (400, 400),
+                 resolution: float = 2.0,
+                 path: Union[str, None] = None,
+                 l_occ: float = 0.85,
+                 l_free: float = -0.4,
+                 l_min: float = -4.0,
+                 l_max: float = 4.0,
+                 rays: int = 5) -> None:
+        """
+        Create or re-open an occupancy grid.
+
+        :param size: Grid shape as (rows, cols).
+        :param resolution: Cell edge length in centimetres.
+        :param path: Optional ``.npy`` file to memory-map.  An existing file
+                     is re-opened so the map persists across runs and can be
+                     read by other processes with ``np.load(path, mmap_mode='r')``.
+        :param l_occ: Log-odds added to the cell that returned the echo.
+        :param l_free: Log-odds added to cells the beam passed through.
+        :param l_min: Lower clamp for cell log-odds.
+        :param l_max: Upper clamp for cell log-odds.
+        :param rays: Number of rays traced across the beam width.
+        :raises ValueError: If an existing file does not match ``size``.
+        """
+        self.resolution = float(resolution)
+        self.l_occ = l_occ
+        self.l_free = l_free
+        self.l_min = l_min
+        self.l_max = l_max
+        self.path = path
+        self._lock = threading.Lock()
+
+        if path is None:
+            self.grid = np.zeros(size, dtype=np.float32)
+        elif os.path.exists(path):
+            self.grid = np.lib.format.open_memmap(path, mode='r+')
+            if self.grid.shape != tuple(size):
+                raise ValueError(f"Grid file {path} has shape {self.grid.shape}, expected {tuple(size)}.")
+        else:
+            self.grid = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=tuple(size))
+
+        rows, cols = self.grid.shape
+        self._origin = np.array([cols / 2.0, rows / 2.0])
+        self._ray_offsets = np.linspace(-self.BEAM_WIDTH / 2, self.BEAM_WIDTH / 2, max(1, rays))
+        self.updates = 0
+
+    def world_to_cell(self, x: float, y: float) -> Tuple[int, int]:
+        """
+        Convert a world position to a (row, col) grid index.
+        """
+        col = int(math.floor(x / self.resolution + self._origin[0]))
+        row = int(math.floor(y / self.resolution + self._origin[1]))
+        return row, col
+
+    def update(self, pose: Pose, pan_angle: float, distance: float) -> None:
+        """
+        Integrate one range reading.
+
+        :param pose: Car pose (x, y, heading) from odometry.
+        :param pan_angle: Pan angle in degrees the sensor was pointing at.
+        :param distance: Range in centimetres.  Non-positive and non-finite
+                         values (NaN from a missed echo) are treated as
+                         failed pings and ignored; readings at or beyond
+                         ``MAX_RANGE`` only clear free space.
+        """
+        if distance is None or not math.isfinite(distance) or distance <= 0:
+            return
+        x, y, heading = pose
+        hit = distance < self.MAX_RANGE
+        reach = min(distance, self.MAX_RANGE)
+
+        bearings = heading - math.radians(pan_angle) + self._ray_offsets
+        steps = np.arange(0.0, reach, self.resolution * 0.5)
+        ox = x / self.resolution + self._origin[0]
+        oy = y / self.resolution + self._origin[1]
+        dx = np.cos(bearings)[:, None] * (steps / self.resolution)
+        dy = np.sin(bearings)[:, None] * (steps / self.resolution)
+        free = self._flat_indices(ox + dx, oy + dy)
+
+        flat = self.grid.reshape(-1)
+        with self._lock:
+            if hit:
+                ex = ox + np.cos(bearings) * (reach / self.resolution)
+                ey = oy + np.sin(bearings) * (reach / self.resolution)
+                occ = self._flat_indices(ex, ey)
+                free = np.setdiff1d(free, occ, assume_unique=True)
+                flat[occ] = np.clip(flat[occ] + self.l_occ, self.l_min, self.l_max)
+            flat[free] = np.clip(flat[free] + self.l_free, self.l_min, self.l_max)
+            self.updates += 1
+
+    def update_from(self, px, pose: Pose) -> float:
+        """
+        Take a reading from a Picarx at its current pan angle and integrate it.
+
+        :param px: Picarx instance.
+        :param pose: Car pose (x, y, heading) from odometry.
+        :return: The distance that was read.
+        """
+        distance = px.get_distance()
+        self.update(pose, px.cam_pan_current_angle, distance)
+        return distance
+
+    def _flat_indices(self, cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+        rows, cols = self.grid.shape
+        ix = np.floor(cx).astype(np.intp).ravel()
+        iy = np.floor(cy).astype(np.intp).ravel()
+        inside = (ix >= 0) & (ix < cols) & (iy >= 0) & (iy < rows)
+        return np.unique(iy[inside] * cols + ix[inside])
+
+    def probabilities(self) -> np.ndarray:
+        """
+        Return the occupancy probability of every cell.
+        """
+        with self._lock:
+            return 1.0 - 1.0 / (1.0 + np.exp(self.grid))
+
+    def is_occupied(self, x: float, y: float, threshold: float = 0.5) -> bool:
+        """
+        Check whether the cell containing a world position is occupied.
+        """
+        row, col = self.world_to_cell(x, y)
+        rows, cols = self.grid.shape
+        if not (0 <= row < rows and 0 <= col < cols):
+            return False
+        return 1.0 - 1.0 / (1.0 + math.exp(float(self.grid[row, col]))) > threshold
+
+    def clear(self) -> None:
+        """
+        Reset every cell to unknown.
+        """
+        with self._lock:
+            self.grid[...] = 0.0
+
+    def flush(self) -> None:
+        """
+        Write a memory-mapped grid back to disk.
+        """
+        if isinstance(self.grid, np.memmap):
+            self.grid.flush()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, Union
+
+
+class Segment:
+    """
+    One motion primitive: hold a speed and steering angle for a duration,
+    until a condition becomes true, or whichever comes first.
+
+    :ivar speed: Drive speed, -100 to 100; negative drives backward.
+    :ivar steering: Steering servo angle.
+    :ivar duration: Seconds to hold, or None to rely on ``until``.
+    :ivar until: Callable polled on the timing thread; the segment ends
+                 when it returns True.  Keep it fast.
+    :ivar future: Resolves to True when the segment ends normally and to
+                  False if it is preempted while running.  If ``until``
+                  raises, the future carries the exception.
+    """
+
+    def __init__(self, speed: int, steering: float = 0,
+                 duration: Union[float, None] = None,
+                 until: Union[Callable[[], bool], None] = None) -> None:
+        if duration is None and until is None:
+            raise ValueError("A motion segment needs a duration, an until condition, or both.")
+        self.speed = speed
+        self.steering = steering
+        self.duration = duration
+        self.until = until
+        self.future: Future = Future()
+        self.started: Union[float, None] = None
+        self.deadline: Union[float, None] = None
+
+    def __repr__(self) -> str:
+        return f"Segment(speed={self.speed}, steering={self.steering}, duration={self.duration})"
+
+
+class MotionQueue:
+    """
+    Segments executed back to back by the driver's ramp thread.
+
+    The ramp thread calls :meth:`poll` on every wake-up and sleeps until
+    the earlier of its next ramp tick and the current segment's deadline,
+    so segment boundaries land within scheduler jitter of the requested
+    time rather than on a 10 ms tick.  Each segment's start is chained to
+    the previous segment's planned end, so long sequences do not drift.
+    When the queue runs dry the car is stopped.  If a segment's ``until``
+    condition raises, that segment fails, the queued ones are cancelled
+    and the car is stopped.
+    """
+
+    def __init__(self, px, wake: threading.Event) -> None:
+        self.px = px
+        self._wake = wake
+        self._lock = threading.Lock()
+        self._pending: Deque[Segment] = deque()
+        self._current: Union[Segment, None] = None
+        # futures are resolved outside the lock so their callbacks may
+        # queue further segments
+        self._done: Deque[tuple] = deque()
+        self._metrics: Dict[str, float] = {
+            'completed': 0, 'preempted': 0, 'cancelled': 0, 'failed': 0,
+            'boundary_error_last': 0.0, 'boundary_error_max': 0.0,
+        }
+
+    def add(self, segment: Segment, preempt: bool = False) -> Future:
+        """
+        Queue a segment, optionally cancelling everything before it.
+        """
+        with self._lock:
+            if preempt:
+                self._cancel_locked()
+            self._pending.append(segment)
+        self._resolve()
+        self._wake.set()
+        return segment.future
+
+    def cancel(self) -> None:
+        """
+        Abort the running segment, drop queued ones and stop the car.
+        """
+        with self._lock:
+            if self._cancel_locked():
+                self.px.stop()
+        self._resolve()
+        self._wake.set()
+
+    @property
+    def busy(self) -> bool:
+        with self._lock:
+            return self._current is not None or bool(self._pending)
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        Segment counters and the error between planned and actual segment
+        boundaries (seconds).
+        """
+        with self._lock:
+            return dict(self._metrics)
+
+    def _cancel_locked(self) -> bool:
+        had_work = self._current is not None or bool(self._pending)
+        if self._current is not None:
+            self._done.append((self._current.future, False))
+            self._current = None
+            self._metrics['preempted'] += 1
+        while self._pending:
+            self._done.append((self._pending.popleft().future, None))
+            self._metrics['cancelled'] += 1
+        return had_work
+
+    def _resolve(self) -> None:
+        # runs on the caller's thread and the ramp thread at once; popleft()
+        # is atomic, a separate emptiness check is not
+        while True:
+            try:
+                future, result = self._done.popleft()
+            except IndexError:
+                return
+            if result is None:
+                future.cancel()
+            elif isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def poll(self) -> Union[float, None]:
+        """
+        Advance the queue.  Called from the ramp thread.
+
+        :return: The monotonic time at which the queue next needs
+                 attention, or None if nothing is scheduled.
+        """
+        now = time.monotonic()
+        start_at = now
+        with self._lock:
+            seg = self._current
+            finished = False
+            if seg is not None:
+                timed_out = seg.deadline is not None and now >= seg.deadline
+                try:
+                    ended = timed_out or (seg.until is not None and seg.until())
+                except Exception as e:
+                    ended = e
+                if isinstance(ended, Exception):
+                    # a broken condition must not take the ramp thread down:
+                    # fail the segment, drop the rest of the plan and stop
+                    self._current = None
+                    self._cancel_locked()
+                    self._done.append((seg.future, ended))
+                    self._metrics['failed'] += 1
+                    self.px.stop()
+                    seg = None
+                elif not ended:
+                    return seg.deadline
+                else:
+                    if timed_out:
+                        # chain the next segment to the planned boundary
+                        start_at = seg.deadline
+                        error = now - seg.deadline
+                        m = self._metrics
+                        m['boundary_error_last'] = error
+                        m['boundary_error_max'] = max(m['boundary_error_max'], error)
+                    self._done.append((seg.future, True))
+                    self._metrics['completed'] += 1
+                    self._current = seg = None
+                    finished = True
+
+            while self._pending:
+                nxt = self._pending.popleft()
+                if nxt.future.set_running_or_notify_cancel():
+                    seg = nxt
+                    break
+
+            px = self.px
+            if seg is None:
+                if finished:
+                    px.stop()
+            else:
+                seg.started = start_at
+                seg.deadline = None if seg.duration is None else start_at + seg.duration
+                self._current = seg
+                px.set_dir_servo_angle(seg.steering)
+                if seg.speed > 0:
+                    px.forward(seg.speed)
+                elif seg.speed < 0:
+                    px.backward(-seg.speed)
+                else:
+                    px.stop()
+        self._resolve()
+        return None if seg is None else seg.deadline
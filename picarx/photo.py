@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Union
+
+import numpy as np
+
+
+def opencv_encode(path: str, frame: np.ndarray, quality: int = 95) -> None:
+    """
+    Encode and write a JPEG with OpenCV, imported only when first used.
+    """
+    import cv2
+    if not cv2.imwrite(path, frame, [cv2.IMWRITE_JPEG_QUALITY, quality]):
+        raise OSError(f"Could not write {path}")
+
+
+class PhotoCapture:
+    """
+    Photos off the control thread.
+
+    :meth:`take` keeps a reference to the current camera frame (Vilib
+    replaces ``img`` on every capture rather than writing into it, so no
+    copy is needed) and hands encoding and writing to a thread pool,
+    returning a future for the file path.  :meth:`burst` grabs N
+    consecutive frames as fast as the camera delivers them into a
+    preallocated ring of buffers; a slot is reused only once its previous
+    photo has been written.
+    """
+
+    def __init__(self, source=None, workers: int = 2, ring: int = 8,
+                 encode: Callable[[str, np.ndarray], None] = opencv_encode) -> None:
+        """
+        :param source: Object exposing ``img``; defaults to ``vilib.Vilib``.
+        :param workers: Encoder/writer threads.
+        :param ring: Frame buffers available to bursts.
+        :param encode: Writes one frame as ``encode(path, frame)``.
+        """
+        if source is None:
+            from vilib import Vilib
+            source = Vilib
+        self.source = source
+        self.encode = encode
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._ring_size = ring
+        self._ring: List[Union[np.ndarray, None]] = [None] * ring
+        self._ring_busy: List[Union[Future, None]] = [None] * ring
+        self._ring_pos = 0
+        self._lock = threading.Lock()
+        # throughput is measured over the time the writers had work
+        self._in_flight = 0
+        self._busy_since = 0.0
+        self._busy_time = 0.0
+        self.taken = 0
+        self.written = 0
+        self.failed = 0
+        self.burst_fps = 0.0
+
+    def snapshot(self) -> Union[np.ndarray, None]:
+        """
+        The current frame, without copying.
+        """
+        return self.source.img
+
+    def take(self, path: Union[str, Path]) -> Future:
+        """
+        Save the current frame to ``path`` in the background.
+
+        :return: Future resolving to the path once it is written.
+        :raises RuntimeError: If the camera has not produced a frame yet.
+        """
+        frame = self.snapshot()
+        if frame is None:
+            raise RuntimeError("No camera frame available.")
+        Path(path).expanduser().parent.mkdir(parents=True, exist_ok=True)
+        return self._submit(str(path), frame)
+
+    def burst(self, count: int, directory: Union[str, Path], name: str,
+              timeout: float = 1.0) -> List[Future]:
+        """
+        Capture ``count`` consecutive frames as fast as they arrive and save
+        them as ``<name>_<n>.jpg``.  Returns once the frames are captured;
+        writing continues in the background.
+
+        :param timeout: Longest wait for a new frame.
+        :return: One future per captured photo.
+        """
+        directory = Path(directory).expanduser()
+        directory.mkdir(parents=True, exist_ok=True)
+        futures = []
+        last = None
+        start = time.monotonic()
+        for n in range(count):
+            deadline = time.monotonic() + timeout
+            frame = self.source.img
+            while frame is None or frame is last:
+                if time.monotonic() > deadline:
+                    return futures
+                time.sleep(0.001)
+                frame = self.source.img
+            last = frame
+            buf = self._ring_slot(frame)
+            futures.append(self._submit(str(directory / f"{name}_{n + 1:03d}.jpg"), buf, self._ring_pos))
+            self._ring_pos = (self._ring_pos + 1) % self._ring_size
+        elapsed = time.monotonic() - start
+        if len(futures) > 1 and elapsed > 0:
+            self.burst_fps = len(futures) / elapsed
+        return futures
+
+    def _ring_slot(self, frame: np.ndarray) -> np.ndarray:
+        i = self._ring_pos
+        pending = self._ring_busy[i]
+        if pending is not None:
+            # the writer is a full ring behind; wait for it to free the slot
+            pending.exception()
+        buf = self._ring[i]
+        if buf is None or buf.shape != frame.shape or buf.dtype != frame.dtype:
+            buf = self._ring[i] = np.empty_like(frame)
+        np.copyto(buf, frame)
+        return buf
+
+    def _submit(self, path: str, frame: np.ndarray, slot: Union[int, None] = None) -> Future:
+        with self._lock:
+            self.taken += 1
+            if self._in_flight == 0:
+                self._busy_since = time.monotonic()
+            self._in_flight += 1
+        future = self._pool.submit(self._write, path, frame)
+        if slot is not None:
+            self._ring_busy[slot] = future
+        return future
+
+    def _write(self, path: str, frame: np.ndarray) -> str:
+        tmp = f"{path}.tmp{os.path.splitext(path)[1]}"
+        try:
+            self.encode(tmp, frame)
+            os.replace(tmp, path)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        else:
+            with self._lock:
+                self.written += 1
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                if self._in_flight == 0:
+                    self._busy_time += time.monotonic() - self._busy_since
+        return path
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        Photos taken and written, and write throughput in photos per second.
+        """
+        with self._lock:
+            span = self._busy_time
+            if self._in_flight:
+                span += time.monotonic() - self._busy_since
+            return {
+                'taken': self.taken,
+                'written': self.written,
+                'failed': self.failed,
+                'photos_per_second': self.written / span if span > 0 else 0.0,
+                'burst_fps': self.burst_fps,
+            }
+
+    def close(self) -> None:
+        """
+        Wait for pending photos and stop the writer threads.
+        """
+        self._pool.shutdown(wait=True)
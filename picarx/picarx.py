@@ -2,16 +2,24 @@
 from pathlib import Path
 from platformdirs import user_config_dir
 import os, getpass
+import atexit
 
 import time
-from typing import List, Union
+from typing import Callable, List, Union
+from concurrent.futures import Future
+from contextlib import contextmanager
 import threading
 
-from robot_hat import Pin, ADC, PWM, Servo, fileDB
+from robot_hat import Pin, ADC, PWM, Servo
 from robot_hat import Grayscale_Module, Ultrasonic, utils
 
 import RPi.GPIO as GPIO  # for global cleanup
 
+from .motion import MotionQueue, Segment
+from .config import Config, FileDBCompat, SCHEMA
+from .realtime import RealtimeSettings, TickHistogram
+from .profiler import SamplingProfiler
+
 
 def constrain(x: Union[int, float], min_val: Union[int, float], max_val: Union[int, float]) -> Union[int, float]:
     """
@@ -22,8 +30,12 @@ def constrain(x: Union[int, float], min_val: Union[int, float], max_val: Union[i
 
 class Picarx:
 
-    DEFAULT_LINE_REF: List[float] = [1000, 1000, 1000]
-    DEFAULT_CLIFF_REF: List[float] = [500, 500, 500]
+    DEFAULT_LINE_REF: List[float] = SCHEMA['line_reference'].default
+    DEFAULT_CLIFF_REF: List[float] = SCHEMA['cliff_reference'].default
+
+    # sign of a set_motor_speed() speed that drives each motor forward;
+    # the right motor is mirrored
+    FORWARD_SIGN = (1, -1)
 
     DIR_MIN: int = -30
     DIR_MAX: int = 30
@@ -79,14 +91,20 @@ class Picarx:
             if env_path:
                 cfg_path = Path(env_path).expanduser()
             else:
-                # 3) per-user XDG location
-                cfg_path = Path(user_config_dir("picarx")) / "picarx.conf"
+                # 3) per-user XDG location; an old fileDB picarx.conf there
+                #    is migrated into picarx.json on first use
+                cfg_dir = Path(user_config_dir("picarx"))
+                cfg_path = cfg_dir / "picarx.json"
+                if not cfg_path.exists() and (cfg_dir / "picarx.conf").exists():
+                    cfg_path = cfg_dir / "picarx.conf"
 
         # ensure directory exists
         cfg_path.parent.mkdir(parents=True, exist_ok=True)
 
-        # init your fileDB
-        self.config_file = fileDB(str(cfg_path), 600, login)
+        # parsed and validated once; old fileDB files are migrated
+        self.config = Config(cfg_path, owner=login)
+        # string get()/set() for code written against the old fileDB
+        self.config_file = FileDBCompat(self.config)
 
 
         # --------- Servos Initialization ---------
@@ -95,9 +113,9 @@ class Picarx:
         self.dir_servo: Servo = Servo(servo_pins[2])
 
         # Get calibration values from configuration
-        self.dir_cali_val: float = float(self.config_file.get("picarx_dir_servo", default_value="0"))
-        self.cam_pan_cali_val: float = float(self.config_file.get("picarx_cam_pan_servo", default_value="0"))
-        self.cam_tilt_cali_val: float = float(self.config_file.get("picarx_cam_tilt_servo", default_value="0"))
+        self.dir_cali_val: float = self.config.get("picarx_dir_servo")
+        self.cam_pan_cali_val: float = self.config.get("picarx_cam_pan_servo")
+        self.cam_tilt_cali_val: float = self.config.get("picarx_cam_tilt_servo")
 
         # Set servos to initial (calibrated) angles
         self.dir_servo.angle(self.dir_cali_val)
@@ -113,10 +131,11 @@ class Picarx:
         self.motor_speed_pins: List[PWM] = [self.left_rear_pwm, self.right_rear_pwm]
 
         # Motor calibration values
-        cali_dir_str = self.config_file.get("picarx_dir_motor", default_value="[1, 1]")
-        self.cali_dir_value: List[int] = [int(i.strip()) for i in cali_dir_str.strip("[]").split(",")]
+        self.cali_dir_value: List[int] = self.config.get("picarx_dir_motor")
         self.cali_speed_value: List[int] = [0, 0]
         self.dir_current_angle: int = 0
+        self.cam_pan_current_angle: float = 0
+        self.cam_tilt_current_angle: float = 0
 
         # Initialize PWM settings for motor speed pins
         for pwm_pin in self.motor_speed_pins:
@@ -126,10 +145,8 @@ class Picarx:
         # --------- Grayscale Module Initialization ---------
         adc0, adc1, adc2 = [ADC(pin) for pin in grayscale_pins]
         self.grayscale: Grayscale_Module = Grayscale_Module(adc0, adc1, adc2, reference=None)
-        line_ref_str = self.config_file.get("line_reference", default_value=str(self.DEFAULT_LINE_REF))
-        self.line_reference: List[float] = [float(i) for i in line_ref_str.strip("[]").split(",")]
-        cliff_ref_str = self.config_file.get("cliff_reference", default_value=str(self.DEFAULT_CLIFF_REF))
-        self.cliff_reference: List[float] = [float(i) for i in cliff_ref_str.strip("[]").split(",")]
+        self.line_reference: List[float] = self.config.get("line_reference")
+        self.cliff_reference: List[float] = self.config.get("cliff_reference")
         self.grayscale.reference(self.line_reference)
 
         # --------- Ultrasonic Sensor Initialization ---------
@@ -143,55 +160,324 @@ class Picarx:
         self._target_dir = [1, 1]       # desired direction
         self._ramp_step = 5
         self._ramp_delay = 0.01
+        self._motor_ids = (0, 1)
+        self._tick_hist = TickHistogram()
+        self._rt: Union[RealtimeSettings, None] = None
+        self._rt_pending: Union[RealtimeSettings, bool, None] = None
+        self._rt_done = threading.Event()
         self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
         self._running = True
 
+        # --- MOTION QUEUE (run by the ramp thread) ---
+        self._wake = threading.Event()
+        self.motion = MotionQueue(self, self._wake)
+
+        # --- CLIFF GUARD STATE ---
+        self._cliff_guard_thread: Union[threading.Thread, None] = None
+        self._cliff_guard_period = 0.005
+        self._cliff_latched = False
+        # the guard and user code both read the grayscale ADCs; each read is
+        # an I2C write-then-read per channel, so they must not interleave
+        self._adc_lock = threading.Lock()
+        # trip decision and guard counters, updated from both threads
+        self._cliff_lock = threading.Lock()
+        self._cliff_metrics = {
+            'samples': 0, 'trips': 0,
+            'brake_latency_last': 0.0, 'brake_latency_max': 0.0,
+            'sample_period_max': 0.0,
+        }
+
         # start background ramp thread
-        threading.Thread(target=self._ramp_loop, daemon=True).start()
+        self._ramp_thread = threading.Thread(target=self._ramp_loop, name='picarx-ramp', daemon=True)
+        self._ramp_thread.start()
 
+        # PICARX_PROFILE=<file> profiles the whole run and writes folded stacks at exit
+        profile_path = os.getenv("PICARX_PROFILE")
+        if profile_path:
+            profiler = SamplingProfiler()
+            profiler.start()
+            atexit.register(self._write_profile, profiler, profile_path)
 
-    def _ramp_loop(self) -> None:
-        while self._running:
-            with self._lock:
-                targets = list(zip(self._target_dir, self._target_pwm))
 
-            for i, (dir_t, pwm_t) in enumerate(targets):
-                last_pwm = self._last_pwm[i]
-                last_dir = self._last_dir[i]
+    def _ramp_loop(self) -> None:
+        next_ramp = time.monotonic()
+        last_tick = next_ramp - self._ramp_delay
+        hist = self._tick_hist
+        last_pwm = self._last_pwm
+        try:
+            while self._running:
+                if self._rt_pending is not None:
+                    self._switch_realtime()
+                now = time.monotonic()
+                if now >= next_ramp:
+                    with self._lock:
+                        self._ramp_tick()
+                    hist.record(now - last_tick)
+                    last_tick = now
+                    next_ramp = now + self._ramp_delay
+                    if self._rt is not None:
+                        self._rt.moving(last_pwm[0] > 0 or last_pwm[1] > 0)
+                # wake for the next ramp step or motion segment boundary,
+                # whichever comes first
+                deadline = self.motion.poll()
+                wake_at = next_ramp if deadline is None else min(next_ramp, deadline)
+                self._wake.wait(max(0.0, wake_at - time.monotonic()))
+                self._wake.clear()
+        finally:
+            # nothing ramps the motors once this thread is gone
+            self.brake()
+
+    def _ramp_tick(self) -> None:
+        """
+        Move each motor one ramp step toward its target. Caller holds the lock.
+        """
+        for i in self._motor_ids:
+            dir_t = self._target_dir[i]
+            pwm_t = self._target_pwm[i]
+            last_pwm = self._last_pwm[i]
+            last_dir = self._last_dir[i]
+
+            # if direction flip pending, brake to zero
+            if dir_t != last_dir and last_pwm > 0:
+                new_pwm = max(0, last_pwm - self._ramp_step)
+            else:
+                # ramp toward target
+                if last_pwm < pwm_t:
+                    new_pwm = min(last_pwm + self._ramp_step, pwm_t)
+                elif last_pwm > pwm_t:
+                    new_pwm = max(last_pwm - self._ramp_step, pwm_t)
+                else:
+                    new_pwm = last_pwm
 
-                # if direction flip pending, brake to zero
-                if dir_t != last_dir and last_pwm > 0:
-                    new_pwm = max(0, last_pwm - self._ramp_step)
+            # once we've fully braked (new_pwm==0) and dir changed, flip pin
+            if new_pwm == 0 and last_dir != dir_t:
+                if dir_t < 0:
+                    self.motor_direction_pins[i].high()
                 else:
-                    # ramp toward target
-                    if last_pwm < pwm_t:
-                        new_pwm = min(last_pwm + self._ramp_step, pwm_t)
-                    elif last_pwm > pwm_t:
-                        new_pwm = max(last_pwm - self._ramp_step, pwm_t)
-                    else:
-                        new_pwm = last_pwm
+                    self.motor_direction_pins[i].low()
+                last_dir = dir_t
+
+            # apply new PWM if it changed
+            if new_pwm != last_pwm:
+                self.motor_speed_pins[i].pulse_width_percent(new_pwm)
+                self._last_pwm[i] = new_pwm
+
+            self._last_dir[i] = last_dir
+
+
+    def _switch_realtime(self) -> None:
+        # runs on the ramp thread: scheduling settings apply per thread
+        pending, self._rt_pending = self._rt_pending, None
+        if self._rt is not None:
+            self._rt.revert()
+            self._rt = None
+        if isinstance(pending, RealtimeSettings):
+            pending.apply()
+            self._rt = pending
+        self._tick_hist.reset()
+        self._rt_done.set()
+
+    def enable_realtime(self, priority: Union[int, None] = 50,
+                        cpus: Union[List[int], None] = None,
+                        gc_mode: Union[str, None] = 'freeze') -> dict:
+        """
+        Run the ramp thread in real-time mode: SCHED_FIFO at ``priority``,
+        pinned to ``cpus``, with the garbage collector frozen or deferred
+        while the car moves (see :class:`RealtimeSettings`).  Settings the
+        OS does not permit are skipped.  The tick-period histogram is reset
+        so :meth:`ramp_metrics` shows the effect.
+
+        :return: What was applied.
+        """
+        settings = RealtimeSettings(priority, cpus, gc_mode)
+        self._rt_done.clear()
+        self._rt_pending = settings
+        self._wake.set()
+        self._rt_done.wait(1.0)
+        return dict(settings.applied)
+
+    def disable_realtime(self) -> None:
+        """
+        Return the ramp thread to normal scheduling.
+        """
+        self._rt_done.clear()
+        self._rt_pending = True
+        self._wake.set()
+        self._rt_done.wait(1.0)
+
+    def ramp_metrics(self) -> dict:
+        """
+        Ramp tick-period statistics (seconds) since the last real-time
+        switch, and the real-time settings in effect.
+        """
+        m = self._tick_hist.summary()
+        m['nominal'] = self._ramp_delay
+        m['realtime'] = dict(self._rt.applied) if self._rt is not None else {}
+        return m
+
+    @staticmethod
+    def _write_profile(profiler: SamplingProfiler, path: str) -> None:
+        profiler.stop()
+        try:
+            profiler.write(path)
+        except OSError as e:
+            print(f'\033[31mprofile write error: {e}\033[m')
+
+    @contextmanager
+    def profile(self, path: Union[str, None] = None, interval: float = 0.01):
+        """
+        Sample the stacks of all threads (ramp, cliff guard, camera and user
+        threads) while the ``with`` block runs::
 
-                # once we've fully braked (new_pwm==0) and dir changed, flip pin
-                if new_pwm == 0 and last_dir != dir_t:
-                    if dir_t < 0:
-                        self.motor_direction_pins[i].high()
-                    else:
-                        self.motor_direction_pins[i].low()
-                    last_dir = dir_t
+            with px.profile('run.folded') as prof:
+                ...
+            print(prof.attribution('MainThread'))
 
-                # apply new PWM if it changed
-                if new_pwm != last_pwm:
-                    self.motor_speed_pins[i].pulse_width_percent(new_pwm)
-                    self._last_pwm[i] = new_pwm
+        :param path: Write folded stacks here on exit (for flamegraph.pl or
+                     speedscope).
+        :param interval: Seconds between samples.
+        :return: The :class:`SamplingProfiler`.
+        """
+        profiler = SamplingProfiler(interval)
+        profiler.start()
+        try:
+            yield profiler
+        finally:
+            if path is not None:
+                self._write_profile(profiler, path)
+            else:
+                profiler.stop()
 
-                self._last_dir[i] = last_dir
+    def queue_motion(self, speed: int, steering: float = 0,
+                     duration: Union[float, None] = None,
+                     until: Union[Callable[[], bool], None] = None,
+                     preempt: bool = False) -> Future:
+        """
+        Non-blocking: queue a timed motion segment for the ramp thread.
 
-            time.sleep(self._ramp_delay)
+        Segments run back to back; the car stops when the queue runs dry.
+
+        :param speed: Drive speed, -100 to 100; negative drives backward.
+        :param steering: Steering servo angle for the segment.
+        :param duration: Seconds to hold the segment.
+        :param until: Callable polled on the ramp thread; the segment ends
+                      when it returns True (or ``duration`` elapses).
+        :param preempt: Cancel the running and queued segments first.
+        :return: Future resolving to True when the segment completes, or
+                 False if it is preempted while running.
+        """
+        return self.motion.add(Segment(speed, steering, duration, until), preempt)
+
+    def cancel_motion(self) -> None:
+        """
+        Abort queued motion segments and stop the car.
+        """
+        self.motion.cancel()
+
+    def brake(self) -> None:
+        """
+        Cut both motors to zero immediately, bypassing the ramp.
+        """
+        with self._lock:
+            self._target_pwm[0] = self._target_pwm[1] = 0
+            for i in range(2):
+                self.motor_speed_pins[i].pulse_width_percent(0)
+                self._last_pwm[i] = 0
+
+
+    def enable_cliff_guard(self, rate: float = 200) -> None:
+        """
+        Start watching for cliffs on a dedicated thread.
+
+        Every grayscale sample (the guard's own, taken at ``rate`` Hz, and
+        any read through :meth:`get_grayscale_data`) is checked with
+        :meth:`get_cliff_status`. On a cliff the motors are braked at once
+        and forward motion is refused until :meth:`clear_cliff` is called;
+        backing away is still allowed.
+
+        :param rate: Guard sampling rate in Hz.
+        """
+        self._cliff_guard_period = 1.0 / rate
+        if self._cliff_guard_thread is not None:
+            return
+        self._cliff_guard_thread = threading.Thread(target=self._cliff_guard_loop, name='picarx-cliff-guard',
+                                                   daemon=True)
+        self._cliff_guard_thread.start()
+
+    def disable_cliff_guard(self) -> None:
+        """
+        Stop the cliff guard thread. A latched cliff stays latched.
+        """
+        thread = self._cliff_guard_thread
+        self._cliff_guard_thread = None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    @property
+    def cliff_detected(self) -> bool:
+        """True while the cliff guard has forward motion latched out."""
+        return self._cliff_latched
+
+    def clear_cliff(self) -> None:
+        """
+        Release the cliff latch so forward motion is accepted again.
+        """
+        self._cliff_latched = False
+
+    def cliff_guard_metrics(self) -> dict:
+        """
+        Guard counters: samples checked, trips, detection-to-brake latency
+        (last and worst, seconds) and the longest gap between guard samples.
+        """
+        with self._cliff_lock:
+            return dict(self._cliff_metrics)
+
+    def _read_grayscale(self) -> List[float]:
+        with self._adc_lock:
+            return self.grayscale.read()
+
+    def _cliff_check(self, values: List[float]) -> None:
+        detected_at = time.monotonic()
+        with self._cliff_lock:
+            self._cliff_metrics['samples'] += 1
+            # once latched, forward drive is refused; leave the motors alone so
+            # the caller can back away from the edge
+            if self._cliff_latched or not self.get_cliff_status(values):
+                return
+            self._cliff_latched = True
+        self.brake()
+        latency = time.monotonic() - detected_at
+        with self._cliff_lock:
+            m = self._cliff_metrics
+            m['trips'] += 1
+            m['brake_latency_last'] = latency
+            m['brake_latency_max'] = max(m['brake_latency_max'], latency)
+
+    def _cliff_guard_loop(self) -> None:
+        next_tick = time.monotonic()
+        last_sample = next_tick
+        while self._running and self._cliff_guard_thread is threading.current_thread():
+            self._cliff_check(self._read_grayscale())
+            now = time.monotonic()
+            with self._cliff_lock:
+                m = self._cliff_metrics
+                m['sample_period_max'] = max(m['sample_period_max'], now - last_sample)
+            last_sample = now
+            next_tick += self._cliff_guard_period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()
 
 
     def set_motor_speed(self, motor: int, speed: int) -> None:
         """
         Non‑blocking: just update target PWM+direction.
+
+        While the cliff guard is latched, a speed that would drive the
+        motor forward is replaced by zero.
         """
         idx = motor - 1
         spd = int(constrain(speed, -100, 100))
@@ -200,9 +486,21 @@ class Picarx:
         pwm = max(0, pwm - self.cali_speed_value[idx])
 
         with self._lock:
+            # checked under the lock: a trip either sees this target and
+            # brakes it, or this call sees the latch
+            if self._cliff_latched and spd * self.FORWARD_SIGN[idx] > 0:
+                pwm = 0
             self._target_dir[idx] = direction
             self._target_pwm[idx] = pwm
 
+    def get_motor_pwm(self) -> List[int]:
+        """
+        Duty cycles the motors are actually driven at right now (after
+        ramping), signed by the direction pin, as [left, right].
+        """
+        with self._lock:
+            return [pwm * d for pwm, d in zip(self._last_pwm, self._last_dir)]
+
     def motor_speed_calibration(self, value: int) -> None:
         """
         Calibrate motor speed.
@@ -221,7 +519,7 @@ class Picarx:
         motor_index = motor - 1
         if value in (1, -1):
             self.cali_dir_value[motor_index] = value
-        self.config_file.set("picarx_dir_motor", f"{self.cali_dir_value}")
+        self.config.set("picarx_dir_motor", self.cali_dir_value)
 
     def dir_servo_calibrate(self, value: float) -> None:
         """
@@ -229,8 +527,8 @@ class Picarx:
 
         :param value: Calibration angle.
         """
+        self.config.set("picarx_dir_servo", value)
         self.dir_cali_val = value
-        self.config_file.set("picarx_dir_servo", f"{value}")
         self.dir_servo.angle(value)
 
     def set_dir_servo_angle(self, value: float) -> None:
@@ -249,8 +547,8 @@ class Picarx:
 
         :param value: Calibration angle.
         """
+        self.config.set("picarx_cam_pan_servo", value)
         self.cam_pan_cali_val = value
-        self.config_file.set("picarx_cam_pan_servo", f"{value}")
         self.cam_pan.angle(value)
 
     def cam_tilt_servo_calibrate(self, value: float) -> None:
@@ -259,8 +557,8 @@ class Picarx:
 
         :param value: Calibration angle.
         """
+        self.config.set("picarx_cam_tilt_servo", value)
         self.cam_tilt_cali_val = value
-        self.config_file.set("picarx_cam_tilt_servo", f"{value}")
         self.cam_tilt.angle(value)
 
     def set_cam_pan_angle(self, value: float) -> None:
@@ -270,6 +568,7 @@ class Picarx:
         :param value: Desired pan angle.
         """
         value = constrain(value, self.CAM_PAN_MIN, self.CAM_PAN_MAX)
+        self.cam_pan_current_angle = value
         self.cam_pan.angle(-1 * (value - self.cam_pan_cali_val))
 
     def set_cam_tilt_angle(self, value: float) -> None:
@@ -279,6 +578,7 @@ class Picarx:
         :param value: Desired tilt angle.
         """
         value = constrain(value, self.CAM_TILT_MIN, self.CAM_TILT_MAX)
+        self.cam_tilt_current_angle = value
         self.cam_tilt.angle(-1 * (value - self.cam_tilt_cali_val))
 
     def set_power(self, speed: int) -> None:
@@ -324,6 +624,8 @@ class Picarx:
     def shutdown(self) -> None:
         """Call this if you ever want to cleanly stop the ramp thread."""
         self._running = False
+        self._cliff_guard_thread = None
+        self._wake.set()
 
     def get_distance(self) -> Union[float, int]:
         """
@@ -339,9 +641,9 @@ class Picarx:
         :raises ValueError: If the provided list is not of length 3.
         """
         if isinstance(value, list) and len(value) == 3:
-            self.line_reference = value
+            self.config.set("line_reference", value)
+            self.line_reference = self.config.get("line_reference")
             self.grayscale.reference(self.line_reference)
-            self.config_file.set("line_reference", f"{self.line_reference}")
         else:
             raise ValueError("Grayscale reference must be a 1x3 list.")
 
@@ -349,7 +651,10 @@ class Picarx:
         """
         Retrieve grayscale sensor data.
         """
-        return self.grayscale.read()
+        values = self._read_grayscale()
+        if self._cliff_guard_thread is not None:
+            self._cliff_check(values)
+        return values
 
     def get_line_status(self, gm_val_list: List[float]) -> List[int]:
         """
@@ -383,11 +688,46 @@ class Picarx:
         :raises ValueError: If the provided list is not of length 3.
         """
         if isinstance(value, list) and len(value) == 3:
-            self.cliff_reference = value
-            self.config_file.set("cliff_reference", f"{self.cliff_reference}")
+            self.config.set("cliff_reference", value)
+            self.cliff_reference = self.config.get("cliff_reference")
         else:
             raise ValueError("Cliff reference must be a 1x3 list.")
 
+    def save_profile(self, name: str) -> None:
+        """
+        Store the current references and servo trims as a named
+        calibration profile.
+        """
+        self.config.save_profile(name)
+
+    def use_profile(self, name: str, persist: bool = True) -> None:
+        """
+        Switch to a named calibration profile without re-initialising the
+        car: references and servo trims are swapped in memory and the
+        servos are re-driven at their current angles with the new trims.
+
+        :param persist: Remember the profile in the configuration file.
+        :raises ConfigError: If there is no such profile.
+        """
+        with self._profile_lock:
+            values = self.config.activate(name, persist=persist)
+            # each reference is replaced by a new list in one assignment, so
+            # readers such as the cliff guard never see a half-updated one
+            if 'line_reference' in values:
+                self.line_reference = values['line_reference']
+                self.grayscale.reference(self.line_reference)
+            if 'cliff_reference' in values:
+                self.cliff_reference = values['cliff_reference']
+            if 'picarx_dir_servo' in values:
+                self.dir_cali_val = values['picarx_dir_servo']
+                self.set_dir_servo_angle(self.dir_current_angle)
+            if 'picarx_cam_pan_servo' in values:
+                self.cam_pan_cali_val = values['picarx_cam_pan_servo']
+                self.set_cam_pan_angle(self.cam_pan_current_angle)
+            if 'picarx_cam_tilt_servo' in values:
+                self.cam_tilt_cali_val = values['picarx_cam_tilt_servo']
+                self.set_cam_tilt_angle(self.cam_tilt_current_angle)
+
     def reset(self) -> None:
         """
         Reset the robot by stopping motors and centering servos.
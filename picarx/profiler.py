@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+import os
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Union
+
+PACKAGE_DIR = str(Path(__file__).resolve().parent)
+_LIBRARY_DIRS = tuple({sysconfig.get_paths()[k] for k in ('stdlib', 'platstdlib', 'purelib', 'platlib')})
+
+
+class SamplingProfiler:
+    """
+    Low-overhead statistical profiler for every thread of the process.
+
+    A background thread wakes every ``interval`` seconds, grabs the current
+    stack of each other thread with ``sys._current_frames()`` and counts it.
+    Nothing is hooked into the profiled code, so timing is left intact.
+
+    :meth:`folded` returns the counts in folded-stack format (one
+    ``thread;outer;...;inner count`` line per stack), ready for
+    flamegraph.pl or speedscope.  :meth:`attribution` splits the samples
+    into time inside the picarx API (keyed by the entry point called from
+    outside the package, e.g. ``Picarx.get_distance`` or the ramp thread's
+    ``Picarx._ramp_loop``) and time in user code.  Samples whose innermost
+    frames are library code count towards whoever called the library.
+    """
+
+    def __init__(self, interval: float = 0.01, max_depth: int = 64) -> None:
+        """
+        :param interval: Seconds between samples.
+        :param max_depth: Frames kept per stack, innermost first.
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.categories: Counter = Counter()
+        self.samples = 0
+        self.elapsed = 0.0
+        self._labels: Dict[object, str] = {}
+        self._running = False
+        self._thread: Union[threading.Thread, None] = None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            name = getattr(code, 'co_qualname', code.co_name)
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            label = self._labels[code] = f"{module}.{name}"
+        return label
+
+    @staticmethod
+    def _kind(filename: str) -> str:
+        if filename.startswith(PACKAGE_DIR):
+            return 'picarx'
+        if filename.startswith(_LIBRARY_DIRS) or filename.startswith('<'):
+            return 'library'
+        return 'user'
+
+    def sample(self) -> None:
+        """
+        Take one sample of every thread except the profiler's own.
+        """
+        names = {t.ident: t.name for t in threading.enumerate()}
+        me = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            thread = names.get(ident, str(ident))
+            labels: List[str] = []
+            category = None
+            entry = None
+            closed = False
+            depth = 0
+            while frame is not None and depth < self.max_depth:
+                code = frame.f_code
+                label = self._label(code)
+                kind = self._kind(code.co_filename)
+                if category is None:
+                    if kind == 'user':
+                        category = 'user'
+                    elif kind == 'picarx':
+                        category = 'picarx'
+                if category == 'picarx' and not closed:
+                    # the outermost frame of the innermost picarx run is the API entry point
+                    if kind == 'picarx':
+                        entry = label
+                    elif kind == 'user':
+                        closed = True
+                labels.append(label)
+                frame = frame.f_back
+                depth += 1
+            labels.append(thread)
+            labels.reverse()
+            self.stacks[';'.join(labels)] += 1
+            if category == 'picarx':
+                category = 'picarx:' + entry.split('.', 1)[1]
+            self.categories[(thread, category or 'other')] += 1
+        self.samples += 1
+
+    def folded(self) -> str:
+        """
+        Aggregated stacks in folded format.
+        """
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def write(self, path: Union[str, Path]) -> None:
+        Path(path).expanduser().write_text(self.folded())
+
+    def attribution(self, thread: Union[str, None] = None) -> Dict[str, float]:
+        """
+        Share of samples spent in each picarx entry point (``picarx:<name>``),
+        in user code (``user``) and only in library code (``other``).
+
+        :param thread: Restrict to one thread by name, e.g. ``'MainThread'``
+                       or ``'picarx-ramp'``; all threads by default.
+        """
+        counts: Counter = Counter()
+        for (name, category), n in self.categories.items():
+            if thread is None or name == thread:
+                counts[category] += n
+        total = sum(counts.values())
+        return {k: n / total for k, n in counts.most_common()} if total else {}
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        Samples taken, achieved sampling rate and distinct stacks.
+        """
+        return {
+            'samples': self.samples,
+            'rate': self.samples / self.elapsed if self.elapsed else 0.0,
+            'stacks': len(self.stacks),
+            'threads': len({name for name, _ in self.categories}),
+        }
+
+    def reset(self) -> None:
+        self.stacks.clear()
+        self.categories.clear()
+        self.samples = 0
+        self.elapsed = 0.0
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name='picarx-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
+        self.stop()
+        return False
+
+    def _loop(self) -> None:
+        last = next_tick = time.monotonic()
+        while self._running:
+            self.sample()
+            next_tick += self.interval
+            now = time.monotonic()
+            self.elapsed += now - last
+            last = now
+            if next_tick > now:
+                time.sleep(next_tick - now)
+            else:
+                next_tick = now
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+import gc
+import os
+from array import array
+from typing import Dict, Iterable, Set, Tuple, Union
+
+
+class TickHistogram:
+    """
+    Fixed-bucket histogram of loop periods.
+
+    The buckets are allocated once; :meth:`record` only indexes and adds,
+    so it can run on every control tick.  The last bucket collects
+    everything at or beyond its lower edge.
+    """
+
+    def __init__(self, bucket: float = 0.0001, buckets: int = 400) -> None:
+        """
+        :param bucket: Bucket width in seconds.
+        :param buckets: Number of buckets.
+        """
+        self.bucket = bucket
+        self.counts = array('Q', bytes(8 * buckets))
+        self._scale = 1.0 / bucket
+        self._last = len(self.counts) - 1
+        self.total = 0
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        self.max = 0.0
+
+    def record(self, period: float) -> None:
+        i = int(period * self._scale)
+        self.counts[i if i < self._last else self._last] += 1
+        self.total += 1
+        self.sum += period
+        self.sum_sq += period * period
+        if period > self.max:
+            self.max = period
+
+    def reset(self) -> None:
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.total = 0
+        self.sum = self.sum_sq = self.max = 0.0
+
+    def percentile(self, q: float) -> float:
+        """
+        Upper edge of the bucket containing the ``q``-th percentile.
+        """
+        if not self.total:
+            return 0.0
+        target = self.total * q / 100.0
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return (i + 1) * self.bucket
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Tick count, mean, standard deviation (jitter), percentiles and
+        maximum of the recorded periods, in seconds.
+        """
+        n = self.total
+        mean = self.sum / n if n else 0.0
+        var = max(0.0, self.sum_sq / n - mean * mean) if n else 0.0
+        return {
+            'ticks': n,
+            'mean': mean,
+            'jitter': var ** 0.5,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'p999': self.percentile(99.9),
+            'max': self.max,
+        }
+
+
+class RealtimeSettings:
+    """
+    Real-time options for a control thread, applied from that thread.
+
+    :ivar priority: SCHED_FIFO priority (1-99), or None to leave the policy.
+    :ivar cpus: CPUs to pin the thread to, or None.
+    :ivar gc_mode: None, 'freeze' (move existing objects out of the
+                   collector's reach once) or 'defer' (disable the cyclic
+                   collector while the car moves and collect when it stops).
+    :ivar applied: What could actually be applied, filled in by :meth:`apply`.
+    """
+
+    GC_MODES = (None, 'freeze', 'defer')
+
+    def __init__(self, priority: Union[int, None] = 50, cpus: Union[Iterable[int], None] = None,
+                 gc_mode: Union[str, None] = 'freeze') -> None:
+        if gc_mode not in self.GC_MODES:
+            raise ValueError(f"gc_mode must be one of {self.GC_MODES}.")
+        if priority is not None and not 1 <= priority <= 99:
+            raise ValueError("SCHED_FIFO priority must be between 1 and 99.")
+        self.priority = priority
+        self.cpus = None if cpus is None else set(cpus)
+        self.gc_mode = gc_mode
+        self.applied: Dict[str, Union[bool, str]] = {}
+        self._gc_deferred = False
+        # the thread's settings before apply(), restored by revert()
+        self._saved_sched: Union[Tuple[int, int], None] = None
+        self._saved_affinity: Union[Set[int], None] = None
+
+    def apply(self) -> Dict[str, Union[bool, str]]:
+        """
+        Apply the settings to the calling thread.  Anything the OS refuses
+        (e.g. without CAP_SYS_NICE) is reported rather than raised.
+        """
+        applied: Dict[str, Union[bool, str]] = {}
+        if self.priority is not None:
+            try:
+                self._saved_sched = (os.sched_getscheduler(0), os.sched_getparam(0).sched_priority)
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self.priority))
+                applied['sched_fifo'] = True
+            except (AttributeError, OSError) as e:
+                applied['sched_fifo'] = f"not permitted: {e}"
+        if self.cpus is not None:
+            try:
+                self._saved_affinity = os.sched_getaffinity(0)
+                os.sched_setaffinity(0, self.cpus)
+                applied['affinity'] = True
+            except (AttributeError, OSError) as e:
+                applied['affinity'] = f"not permitted: {e}"
+        if self.gc_mode == 'freeze':
+            if hasattr(gc, 'freeze'):
+                gc.collect()
+                gc.freeze()
+                applied['gc'] = 'frozen'
+            else:
+                applied['gc'] = "gc.freeze() needs Python 3.7"
+        elif self.gc_mode == 'defer':
+            applied['gc'] = 'deferred while moving'
+        self.applied = applied
+        return applied
+
+    def revert(self) -> None:
+        """
+        Undo :meth:`apply` on the calling thread as far as possible.
+        """
+        if self.applied.get('sched_fifo') is True and self._saved_sched is not None:
+            policy, priority = self._saved_sched
+            try:
+                os.sched_setscheduler(0, policy, os.sched_param(priority))
+            except OSError:
+                pass
+        if self.applied.get('affinity') is True and self._saved_affinity is not None:
+            try:
+                os.sched_setaffinity(0, self._saved_affinity)
+            except OSError:
+                pass
+        self._saved_sched = self._saved_affinity = None
+        if self.applied.get('gc') == 'frozen':
+            gc.unfreeze()
+        self.moving(False)
+        self.applied = {}
+
+    def moving(self, moving: bool) -> None:
+        """
+        Tell the GC policy whether the motors are running.
+        """
+        if self.gc_mode != 'defer' or moving == self._gc_deferred:
+            return
+        self._gc_deferred = moving
+        if moving:
+            gc.disable()
+        else:
+            gc.enable()
+            gc.collect(0)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Tuple, Union
+
+
+def opencv_writer(path: str, fps: float, size: Tuple[int, int], fourcc: str = 'MJPG'):
+    """
+    Open a ``cv2.VideoWriter``; OpenCV is imported only when recording.
+    """
+    import cv2
+    return cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+
+
+class VideoRecorder:
+    """
+    Segmented video recording that never blocks the camera.
+
+    A capture thread picks up each new frame (``Vilib.img`` is replaced on
+    every capture, so frames are queued without copying) into a bounded
+    queue.  When the encoder falls behind, e.g. while the SD card stalls,
+    the queue applies its drop policy instead of growing.  An encode worker
+    writes the frames and starts a new file every ``segment_seconds`` or
+    ``segment_mb``, whichever comes first.  Next to each segment a
+    ``.idx`` file lists ``frame,timestamp`` pairs so a position in a long
+    recording can be found without decoding it.
+    """
+
+    def __init__(self, directory: Union[str, Path],
+                 source=None,
+                 fps: float = 30.0,
+                 segment_seconds: float = 60.0,
+                 segment_mb: float = 100.0,
+                 max_queue: int = 30,
+                 policy: str = 'drop_oldest',
+                 extension: str = 'avi',
+                 writer: Callable = opencv_writer) -> None:
+        """
+        :param directory: Where segments are written.
+        :param source: Object exposing ``img``; defaults to ``vilib.Vilib``.
+        :param fps: Frame rate stored in the files.
+        :param segment_seconds: Maximum duration of one segment.
+        :param segment_mb: Maximum size of one segment in megabytes.
+        :param max_queue: Frames that may wait for the encoder.
+        :param policy: 'drop_oldest' or 'drop_new' when the queue is full.
+        :param extension: File extension of the segments.
+        :param writer: Opens a segment as ``writer(path, fps, (w, h))``,
+                       returning an object with ``write`` and ``release``.
+        """
+        if policy not in ('drop_oldest', 'drop_new'):
+            raise ValueError("policy must be 'drop_oldest' or 'drop_new'.")
+        if source is None:
+            from vilib import Vilib
+            source = Vilib
+        self.directory = Path(directory).expanduser()
+        self.source = source
+        self.fps = fps
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = int(segment_mb * 1024 * 1024)
+        self.max_queue = max_queue
+        self.policy = policy
+        self.extension = extension
+        self.writer = writer
+
+        self.segments: List[Path] = []
+        self.paused = False
+        self._queue: Deque[Tuple[float, object]] = deque()
+        self._cond = threading.Condition()
+        self._name = ''
+        self._running = False
+        self._threads: List[threading.Thread] = []
+        self._counters: Dict[str, int] = {
+            'captured': 0, 'dropped': 0, 'encoded': 0, 'queue_max': 0,
+        }
+
+    def start(self, name: Union[str, None] = None) -> None:
+        """
+        Start a recording; segments are named ``<name>-<n>.<extension>``.
+        """
+        if self._running:
+            return
+        self._name = name or time.strftime("%Y-%m-%d-%H.%M.%S")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segments = []
+        self.paused = False
+        self._running = True
+        self._threads = [threading.Thread(target=self._capture_loop, daemon=True),
+                         threading.Thread(target=self._encode_loop, daemon=True)]
+        for t in self._threads:
+            t.start()
+
+    def pause(self) -> None:
+        self.paused = True
+
+    def resume(self) -> None:
+        self.paused = False
+
+    def stop(self) -> List[Path]:
+        """
+        Stop capturing, let the encoder drain the queue and close the last
+        segment.
+
+        :return: The segment files written.
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        return list(self.segments)
+
+    def add_frame(self, frame, timestamp: Union[float, None] = None) -> bool:
+        """
+        Queue one frame for encoding.  Used by the capture thread; other
+        frame sources may call it directly.
+
+        :return: False if the frame itself was dropped.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        with self._cond:
+            self._counters['captured'] += 1
+            if len(self._queue) >= self.max_queue:
+                self._counters['dropped'] += 1
+                if self.policy == 'drop_new':
+                    return False
+                self._queue.popleft()
+            self._queue.append((timestamp, frame))
+            self._counters['queue_max'] = max(self._counters['queue_max'], len(self._queue))
+            self._cond.notify()
+        return True
+
+    def metrics(self) -> Dict[str, int]:
+        """
+        Frames captured, dropped and encoded, the deepest the queue got and
+        the number of segments.
+        """
+        with self._cond:
+            m = dict(self._counters)
+            m['queued'] = len(self._queue)
+        m['segments'] = len(self.segments)
+        return m
+
+    def _capture_loop(self) -> None:
+        last = None
+        interval = 0.25 / self.fps
+        while self._running:
+            frame = self.source.img
+            if frame is None or frame is last or self.paused:
+                time.sleep(interval)
+                continue
+            last = frame
+            self.add_frame(frame)
+
+    @staticmethod
+    def _file_size(path: Path) -> int:
+        # writers may buffer and create the file only on their first flush
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _encode_loop(self) -> None:
+        video = None
+        index = None
+        opened = 0.0
+        frames = 0
+        path = None
+        try:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._queue or not self._running)
+                    if not self._queue:
+                        return
+                    timestamp, frame = self._queue.popleft()
+
+                # size checks stat the file, so only do them once a second
+                if video is not None and (
+                        timestamp - opened >= self.segment_seconds
+                        or (frames % max(1, int(self.fps)) == 0
+                            and self._file_size(path) >= self.segment_bytes)):
+                    video.release()
+                    index.close()
+                    video = None
+
+                if video is None:
+                    path = self.directory / f"{self._name}-{len(self.segments) + 1:03d}.{self.extension}"
+                    height, width = frame.shape[:2]
+                    video = self.writer(str(path), self.fps, (width, height))
+                    index = open(path.with_suffix('.idx'), 'w')
+                    index.write("frame,timestamp\n")
+                    self.segments.append(path)
+                    opened = timestamp
+                    frames = 0
+
+                video.write(frame)
+                index.write(f"{frames},{timestamp:.6f}\n")
+                frames += 1
+                self._counters['encoded'] += 1
+        except Exception as e:
+            print(f'\033[31mrecorder error: {e}\033[m')
+        finally:
+            if video is not None:
+                video.release()
+                index.close()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Union
+
+import numpy as np
+
+
+class Sweep:
+    """
+    One pan sweep: distances by angle, in the order they were measured.
+
+    :ivar angles: Pan angles in degrees.
+    :ivar distances: Ranges in centimetres, NaN where the ping failed.
+    :ivar timestamps: ``time.monotonic()`` at which each ping was issued.
+    :ivar direction: 1 for a left-to-right sweep, -1 for right-to-left.
+    """
+
+    def __init__(self, angles: np.ndarray, distances: np.ndarray,
+                 timestamps: np.ndarray, direction: int) -> None:
+        self.angles = angles
+        self.distances = distances
+        self.timestamps = timestamps
+        self.direction = direction
+
+    @property
+    def duration(self) -> float:
+        return float(self.timestamps[-1] - self.timestamps[0]) if len(self.timestamps) > 1 else 0.0
+
+    def sorted(self) -> "Sweep":
+        """
+        Return a copy ordered by increasing angle.
+        """
+        order = np.argsort(self.angles)
+        return Sweep(self.angles[order], self.distances[order], self.timestamps[order], self.direction)
+
+
+class PanScanner:
+    """
+    Pipelined ultrasonic sweep across the camera pan range.
+
+    A naive sweep waits for the servo to settle, pings, and only then moves
+    on, so every step costs settle time plus flight time.  Here the next pan
+    step is commanded as soon as the current ping has been issued, so the
+    servo travels while the echo is in flight and each step costs roughly
+    the larger of the two.  Consecutive sweeps alternate direction so there
+    is no flyback to the start angle.
+    """
+
+    SETTLE_BASE: float = 0.005
+    SETTLE_PER_DEGREE: float = 0.0017
+
+    def __init__(self, px,
+                 start: float = -90,
+                 end: float = 90,
+                 step: float = 10,
+                 settle_base: Union[float, None] = None,
+                 settle_per_degree: Union[float, None] = None) -> None:
+        """
+        :param px: Picarx instance providing ``set_cam_pan_angle`` and ``get_distance``.
+        :param start: First pan angle of a left-to-right sweep.
+        :param end: Last pan angle of a left-to-right sweep.
+        :param step: Pan increment in degrees.
+        :param settle_base: Fixed servo settle time per move in seconds.
+        :param settle_per_degree: Additional settle time per degree travelled.
+        """
+        if step <= 0:
+            raise ValueError("Scan step must be positive.")
+        self.px = px
+        lo, hi = min(start, end), max(start, end)
+        count = int(math.floor((hi - lo) / step)) + 1
+        self.angles = np.array([lo + i * step for i in range(count)], dtype=float)
+        self.settle_base = self.SETTLE_BASE if settle_base is None else settle_base
+        self.settle_per_degree = self.SETTLE_PER_DEGREE if settle_per_degree is None else settle_per_degree
+
+        self._direction = 1
+        self._pinger = ThreadPoolExecutor(max_workers=1)
+        self._lock = threading.Lock()
+        self._latest: Union[Sweep, None] = None
+        self._durations: List[float] = []
+        self._running = False
+        self._thread: Union[threading.Thread, None] = None
+        self.sweeps = 0
+
+    def settle_time(self, delta: float) -> float:
+        """
+        Modelled time for the pan servo to settle after moving ``delta`` degrees.
+        """
+        return self.settle_base + self.settle_per_degree * abs(delta)
+
+    def sweep(self) -> Sweep:
+        """
+        Perform one sweep, blocking until it completes.  Each call reverses
+        the direction of the previous one.
+        """
+        angles = self.angles if self._direction > 0 else self.angles[::-1]
+        n = len(angles)
+        distances = np.empty(n)
+        timestamps = np.empty(n)
+
+        current = self.px.cam_pan_current_angle
+        self.px.set_cam_pan_angle(angles[0])
+        ready_at = time.monotonic() + self.settle_time(angles[0] - current)
+        started = time.monotonic()
+
+        for i in range(n):
+            delay = ready_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            timestamps[i] = time.monotonic()
+            ping = self._pinger.submit(self.px.get_distance)
+            if i + 1 < n:
+                self.px.set_cam_pan_angle(angles[i + 1])
+                ready_at = time.monotonic() + self.settle_time(angles[i + 1] - angles[i])
+            distance = ping.result()
+            distances[i] = distance if distance is not None and distance > 0 else np.nan
+
+        result = Sweep(angles.copy(), distances, timestamps, self._direction)
+        with self._lock:
+            self._latest = result
+            self._durations.append(time.monotonic() - started)
+            del self._durations[:-10]
+            self.sweeps += 1
+        self._direction = -self._direction
+        return result
+
+    @property
+    def sweeps_per_second(self) -> float:
+        """
+        Sweep rate averaged over the last few sweeps.
+        """
+        with self._lock:
+            total = sum(self._durations)
+            return len(self._durations) / total if total > 0 else 0.0
+
+    def latest(self) -> Union[Sweep, None]:
+        """
+        Return the most recently completed sweep.
+        """
+        with self._lock:
+            return self._latest
+
+    def start(self, callback: Union[Callable[[Sweep], None], None] = None) -> None:
+        """
+        Sweep continuously on a background thread.
+
+        :param callback: Called with each completed sweep from the scan thread.
+        """
+        if self._running:
+            return
+        self._running = True
+
+        def loop() -> None:
+            while self._running:
+                result = self.sweep()
+                if callback is not None:
+                    callback(result)
+
+        self._thread = threading.Thread(target=loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop continuous sweeping after the current sweep completes.
+        """
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def close(self) -> None:
+        self.stop()
+        self._pinger.shutdown(wait=True)
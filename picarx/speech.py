@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+import hashlib
+import heapq
+import subprocess
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Tuple, Union
+
+from platformdirs import user_cache_dir
+
+
+def pico2wave(text: str, lang: str, path: str) -> None:
+    """
+    Synthesize ``text`` into a WAV file with pico2wave.
+    """
+    subprocess.run(['pico2wave', '-l', lang, '-w', path, text],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class Speech:
+    """
+    Non-blocking text-to-speech with a pre-rendered phrase cache.
+
+    ``say()`` only enqueues the phrase; a worker thread synthesizes it (once
+    per text and language, cached in memory and on disk) and plays it.  The
+    queue is ordered by priority and bounded: when it is full the oldest of
+    the lowest-priority phrases is dropped, or the new phrase is refused
+    with ``policy='drop_new'``.
+    """
+
+    def __init__(self,
+                 lang: str = "en-US",
+                 cache_dir: Union[str, None] = None,
+                 max_queue: int = 8,
+                 policy: str = 'drop_oldest',
+                 synthesize: Callable[[str, str, str], None] = pico2wave,
+                 player: Union[List[str], None] = None) -> None:
+        """
+        :param lang: Default language.
+        :param cache_dir: Where rendered WAV files are kept between runs.
+        :param max_queue: Maximum number of phrases waiting to be spoken.
+        :param policy: 'drop_oldest' or 'drop_new' when the queue is full.
+        :param synthesize: Function rendering (text, lang, wav_path).
+        :param player: Command that plays a WAV file from stdin.
+        """
+        if policy not in ('drop_oldest', 'drop_new'):
+            raise ValueError("policy must be 'drop_oldest' or 'drop_new'.")
+        self._lang = lang
+        self.cache_dir = Path(cache_dir or Path(user_cache_dir("picarx")) / "speech").expanduser()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_queue = max_queue
+        self.policy = policy
+        self.synthesize = synthesize
+        self.player = player or ['aplay', '-q', '-']
+
+        self._cache: Dict[Tuple[str, str], bytes] = {}
+        self._queue: List[Tuple[int, int, str, str]] = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._playing: Union[subprocess.Popen, None] = None
+        self._busy = False
+        self._running = True
+        self._counters: Dict[str, int] = {
+            'queued': 0, 'played': 0, 'dropped': 0, 'synthesized': 0, 'cache_hits': 0,
+        }
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def metrics(self) -> Dict[str, int]:
+        """
+        Counters for queued, played, dropped, synthesized and cached phrases.
+        """
+        return dict(self._counters)
+
+    def lang(self, value: str) -> None:
+        """
+        Set the default language, mirroring ``robot_hat.TTS.lang``.
+        """
+        self._lang = value
+
+    def _path(self, text: str, lang: str) -> Path:
+        digest = hashlib.sha1(f"{lang}\0{text}".encode()).hexdigest()
+        return self.cache_dir / f"{digest}.wav"
+
+    def render(self, text: str, lang: Union[str, None] = None) -> bytes:
+        """
+        Return the WAV data for a phrase, synthesizing it only if it is in
+        neither the memory nor the disk cache.
+        """
+        key = (lang or self._lang, text)
+        data = self._cache.get(key)
+        if data is not None:
+            self._counters['cache_hits'] += 1
+            return data
+        path = self._path(text, key[0])
+        if path.exists():
+            self._counters['cache_hits'] += 1
+        else:
+            tmp = path.with_suffix('.tmp.wav')
+            self.synthesize(text, key[0], str(tmp))
+            tmp.replace(path)
+            self._counters['synthesized'] += 1
+        data = path.read_bytes()
+        self._cache[key] = data
+        return data
+
+    def preload(self, phrases: Iterable[str], lang: Union[str, None] = None) -> None:
+        """
+        Render phrases ahead of time so the first ``say()`` plays at once.
+        """
+        for text in phrases:
+            self.render(text, lang)
+
+    def say(self, text: str, priority: int = 0, lang: Union[str, None] = None,
+            interrupt: bool = False) -> bool:
+        """
+        Queue a phrase and return immediately.
+
+        :param priority: Higher priorities are spoken first.
+        :param interrupt: Cut off whatever is playing now.
+        :return: False if the phrase was dropped because the queue is full.
+        """
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self._counters['dropped'] += 1
+                if self.policy == 'drop_new':
+                    return False
+                # lowest priority, then oldest
+                victim = max(self._queue, key=lambda e: (e[0], -e[1]))
+                self._queue.remove(victim)
+                heapq.heapify(self._queue)
+            self._seq += 1
+            heapq.heappush(self._queue, (-priority, self._seq, text, lang or self._lang))
+            self._counters['queued'] += 1
+            if interrupt:
+                self._stop_playback()
+            self._cond.notify()
+        return True
+
+    def clear(self) -> None:
+        """
+        Drop every queued phrase and stop the one being spoken.
+        """
+        with self._cond:
+            self._counters['dropped'] += len(self._queue)
+            self._queue.clear()
+            self._stop_playback()
+
+    def wait(self, timeout: Union[float, None] = None) -> bool:
+        """
+        Block until the queue is empty and nothing is playing.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def close(self) -> None:
+        with self._cond:
+            self._running = False
+            self._stop_playback()
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _stop_playback(self) -> None:
+        if self._playing is not None and self._playing.poll() is None:
+            self._playing.terminate()
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+                self._cond.wait_for(lambda: self._queue or not self._running)
+                if not self._running:
+                    return
+                _, _, text, lang = heapq.heappop(self._queue)
+                self._busy = True
+            try:
+                data = self.render(text, lang)
+                with self._cond:
+                    self._playing = subprocess.Popen(self.player, stdin=subprocess.PIPE,
+                                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                try:
+                    self._playing.communicate(data)
+                except (BrokenPipeError, OSError):
+                    pass
+                self._counters['played'] += 1
+            except Exception as e:
+                print(f'\033[31mspeech error: {e}\033[m')
+            finally:
+                with self._cond:
+                    self._playing = None
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Union
+
+
+class Telemetry:
+    """
+    Periodic state snapshots for push streaming (Server-Sent Events).
+
+    A sampler thread builds one compact snapshot per tick (steering, camera
+    angles, actual motor duty, and optionally grayscale and distance),
+    serializes it once into an SSE frame, and wakes every viewer.  Each
+    viewer's :meth:`stream` generator just yields the shared bytes, so the
+    cost per tick does not grow with the number of open pages, and a slow
+    viewer skips to the newest snapshot instead of queueing old ones.
+    """
+
+    def __init__(self, px, rate: float = 10.0, sensors: bool = True,
+                 extra: Union[Callable[[], Dict[str, Any]], None] = None) -> None:
+        """
+        :param px: Picarx instance.
+        :param rate: Snapshots per second.
+        :param sensors: Also read grayscale and ultrasonic each tick.
+        :param extra: Returns additional fields merged into every snapshot.
+        """
+        self.px = px
+        self.period = 1.0 / rate
+        self.sensors = sensors
+        self.extra = extra
+        self._cond = threading.Condition()
+        self._frame = b''
+        self._seq = 0
+        self._running = False
+        self._thread: Union[threading.Thread, None] = None
+        self.viewers = 0
+        self.serialized = 0
+        self.bytes_sent = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Read the current state once.
+        """
+        px = self.px
+        snap: Dict[str, Any] = {
+            't': round(time.time(), 3),
+            'steer': px.dir_current_angle,
+            'pan': px.cam_pan_current_angle,
+            'tilt': px.cam_tilt_current_angle,
+            'pwm': px.get_motor_pwm(),
+        }
+        if self.sensors:
+            snap['gray'] = [round(v) for v in px.get_grayscale_data()]
+            snap['dist'] = round(px.get_distance(), 1)
+        if self.extra is not None:
+            snap.update(self.extra())
+        return snap
+
+    def publish(self, snap: Dict[str, Any]) -> None:
+        """
+        Serialize a snapshot once and hand it to every viewer.
+        """
+        frame = f"data: {json.dumps(snap, separators=(',', ':'))}\n\n".encode()
+        with self._cond:
+            self._frame = frame
+            self._seq += 1
+            self.serialized += 1
+            self._cond.notify_all()
+
+    def stream(self, heartbeat: float = 15.0) -> Iterator[bytes]:
+        """
+        Generator of SSE frames for one viewer, suitable as a Flask
+        ``Response`` body with mimetype ``text/event-stream``.  A comment
+        line is sent every ``heartbeat`` seconds without data so proxies
+        keep the connection open.
+        """
+        with self._cond:
+            self.viewers += 1
+            seen = 0
+        try:
+            while True:
+                with self._cond:
+                    if not self._cond.wait_for(lambda: self._seq != seen, heartbeat):
+                        frame = b': keepalive\n\n'
+                    else:
+                        frame, seen = self._frame, self._seq
+                self.bytes_sent += len(frame)
+                yield frame
+        finally:
+            with self._cond:
+                self.viewers -= 1
+
+    def metrics(self) -> Dict[str, int]:
+        return {'viewers': self.viewers, 'serialized': self.serialized, 'bytes_sent': self.bytes_sent}
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self) -> None:
+        next_tick = time.monotonic()
+        while self._running:
+            try:
+                self.publish(self.snapshot())
+            except Exception as e:
+                print(f'\033[31mtelemetry error: {e}\033[m')
+            next_tick += self.period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()
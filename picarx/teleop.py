@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+import os
+import select
+import sys
+import termios
+import threading
+import time
+import tty
+from typing import Dict, List, Union
+
+
+class KeyState:
+    """
+    Press/repeat bookkeeping for one key.
+    """
+
+    def __init__(self, now: float) -> None:
+        self.pressed = now
+        self.last = now
+        self.repeats = 0
+        self.interval: Union[float, None] = None
+
+
+class KeyboardTeleop:
+    """
+    Key-hold aware keyboard driving.
+
+    Terminals only report key presses and their autorepeats, never
+    releases.  A reader thread puts the terminal in cbreak mode and reads
+    without blocking; a key counts as held while its repeats keep arriving.
+    Until the first repeat is seen the terminal's initial repeat delay is
+    allowed, after that the measured repeat interval (with some margin).
+    An emitter thread turns the held keys into drive intents at a fixed
+    rate, and is woken immediately on a new key press, so nothing in the
+    input path sleeps.  Terminals only autorepeat the most recent key, so
+    holding a second key releases the first one after the repeat window.
+
+    Because of that, a/d steer *and* drive forward (backward while s is
+    still held), as in the original key-per-command controls.
+
+    Keys: w/s forward/backward, a/d turn left/right, i/k tilt, j/l pan,
+    Ctrl+C quit.
+    """
+
+    def __init__(self, px, channel=None,
+                 speed: int = 80,
+                 steer: float = 30,
+                 head_step: float = 5,
+                 head_limit: float = 30,
+                 rate: float = 50.0,
+                 initial_delay: float = 0.7,
+                 repeat_margin: float = 2.5) -> None:
+        """
+        :param px: Picarx instance.
+        :param channel: Optional :class:`picarx.arbiter.Channel` to drive
+                        through instead of calling the car directly.
+        :param speed: Drive speed while w/s is held.
+        :param steer: Steering angle while a/d is held.
+        :param head_step: Degrees the camera moves per head-key event.
+        :param head_limit: Camera pan/tilt limit in degrees.
+        :param rate: Intent emission rate in Hz.
+        :param initial_delay: Longest expected autorepeat delay; X11's
+                              default is 660 ms.
+        :param repeat_margin: Repeat intervals allowed to pass before a key
+                              is considered released.
+        """
+        self.px = px
+        self.channel = channel
+        self.speed = speed
+        self.steer = steer
+        self.head_step = head_step
+        self.head_limit = head_limit
+        self.period = 1.0 / rate
+        self.initial_delay = initial_delay
+        self.repeat_margin = repeat_margin
+
+        self.pan = 0.0
+        self.tilt = 0.0
+        self.quit = threading.Event()
+        self._keys: Dict[str, KeyState] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending_press: Union[float, None] = None
+        self._applied: Union[tuple, None] = None
+        self._latencies: List[float] = []
+        self._running = False
+        self._threads: List[threading.Thread] = []
+        self._fd: Union[int, None] = None
+        self._saved_attrs = None
+
+    # ---- input ----
+
+    def feed(self, key: str, now: Union[float, None] = None) -> None:
+        """
+        Record one key event (press or autorepeat).
+        """
+        if now is None:
+            now = time.monotonic()
+        if key == '\x03':
+            self.quit.set()
+            self._wake.set()
+            return
+        key = key.lower()
+        with self._lock:
+            state = self._keys.get(key)
+            if state is None or not self._is_held(state, now):
+                self._keys[key] = KeyState(now)
+                self._pending_press = now
+                if key in 'ikjl':
+                    self._nudge_head(key)
+            else:
+                # the first gap is the autorepeat delay, not the repeat rate
+                if state.repeats:
+                    gap = now - state.last
+                    state.interval = gap if state.interval is None else 0.7 * state.interval + 0.3 * gap
+                state.repeats += 1
+                state.last = now
+                if key in 'ikjl':
+                    self._nudge_head(key)
+        self._wake.set()
+
+    def _nudge_head(self, key: str) -> None:
+        lim, step = self.head_limit, self.head_step
+        if key == 'i':
+            self.tilt = min(self.tilt + step, lim)
+        elif key == 'k':
+            self.tilt = max(self.tilt - step, -lim)
+        elif key == 'l':
+            self.pan = min(self.pan + step, lim)
+        elif key == 'j':
+            self.pan = max(self.pan - step, -lim)
+
+    def _is_held(self, state: KeyState, now: float) -> bool:
+        if state.interval is None:
+            window = self.initial_delay
+        else:
+            window = state.interval * self.repeat_margin
+        return now - state.last <= window
+
+    def held(self, now: Union[float, None] = None) -> List[str]:
+        """
+        Keys currently considered held down.
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            return [k for k, s in self._keys.items() if self._is_held(s, now)]
+
+    # ---- output ----
+
+    def intent(self, now: Union[float, None] = None) -> tuple:
+        """
+        Current (speed, steering, pan, tilt) derived from the held keys.
+        """
+        keys = self.held(now)
+        speed = 0
+        if 'w' in keys and 's' not in keys:
+            speed = self.speed
+        elif 's' in keys and 'w' not in keys:
+            speed = -self.speed
+        steering = 0
+        if 'a' in keys and 'd' not in keys:
+            steering = -self.steer
+        elif 'd' in keys and 'a' not in keys:
+            steering = self.steer
+        if steering and speed == 0:
+            # a held turn key repeats on its own and releases w, so it drives too
+            speed = -self.speed if 's' in keys else self.speed
+        return (speed, steering, self.pan, self.tilt)
+
+    def emit(self) -> None:
+        """
+        Send the current intent to the car if it changed.
+        """
+        now = time.monotonic()
+        intent = self.intent(now)
+        with self._lock:
+            pressed, self._pending_press = self._pending_press, None
+        if intent != self._applied:
+            speed, steering, pan, tilt = intent
+            if self.channel is not None:
+                self.channel.set(speed=speed, steering=steering, pan=pan, tilt=tilt)
+            else:
+                px = self.px
+                px.set_dir_servo_angle(steering)
+                if speed > 0:
+                    px.forward(speed)
+                elif speed < 0:
+                    px.backward(-speed)
+                else:
+                    px.stop()
+                px.set_cam_pan_angle(pan)
+                px.set_cam_tilt_angle(tilt)
+            self._applied = intent
+        if pressed is not None:
+            self._latencies.append(time.monotonic() - pressed)
+            del self._latencies[:-100]
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        Keypress-to-command latency (seconds) over the last 100 presses.
+        """
+        lat = list(self._latencies)
+        return {
+            'presses': len(lat),
+            'latency_mean': sum(lat) / len(lat) if lat else 0.0,
+            'latency_max': max(lat) if lat else 0.0,
+        }
+
+    # ---- threads ----
+
+    def start(self) -> None:
+        """
+        Switch the terminal to cbreak mode and start reading and emitting.
+        """
+        if self._running:
+            return
+        self._fd = sys.stdin.fileno()
+        self._saved_attrs = termios.tcgetattr(self._fd)
+        tty.setcbreak(self._fd)
+        self._running = True
+        self._threads = [threading.Thread(target=self._read_loop, daemon=True),
+                         threading.Thread(target=self._emit_loop, daemon=True)]
+        for t in self._threads:
+            t.start()
+
+    def stop(self) -> None:
+        """
+        Stop the threads, restore the terminal and stop the car.
+        """
+        self._running = False
+        self._wake.set()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        if self._saved_attrs is not None:
+            termios.tcsetattr(self._fd, termios.TCSADRAIN, self._saved_attrs)
+            self._saved_attrs = None
+        if self.channel is not None:
+            self.channel.release()
+        else:
+            self.px.stop()
+
+    def _read_loop(self) -> None:
+        while self._running:
+            ready, _, _ = select.select([self._fd], [], [], 0.05)
+            if not ready:
+                continue
+            data = os.read(self._fd, 32).decode(errors='ignore')
+            now = time.monotonic()
+            for ch in data:
+                self.feed(ch, now)
+
+    def _emit_loop(self) -> None:
+        while self._running and not self.quit.is_set():
+            self.emit()
+            self._wake.wait(self.period)
+            self._wake.clear()
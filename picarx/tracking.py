@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+import bisect
+import threading
+import time
+from collections import deque
+from typing import Tuple, Union
+
+from .picarx import constrain
+
+
+class ConstantVelocityFilter:
+    """
+    One-axis Kalman filter with state [position, velocity].
+
+    The state is only advanced when a measurement arrives; ``predict``
+    extrapolates from the last update without changing the filter.
+    """
+
+    def __init__(self, process_noise: float = 400.0, measurement_noise: float = 4.0) -> None:
+        """
+        :param process_noise: White-acceleration spectral density (deg²/s³).
+        :param measurement_noise: Measurement variance (deg²).
+        """
+        self.q = process_noise
+        self.r = measurement_noise
+        self.x = 0.0
+        self.v = 0.0
+        self.P = [[1e3, 0.0], [0.0, 1e3]]
+        self.t: Union[float, None] = None
+
+    def update(self, z: float, t: float) -> None:
+        if self.t is None:
+            self.x, self.v, self.t = z, 0.0, t
+            self.P = [[self.r, 0.0], [0.0, 1e3]]
+            return
+        dt = max(t - self.t, 0.0)
+        # predict
+        x = self.x + self.v * dt
+        (p00, p01), (p10, p11) = self.P
+        q = self.q
+        p00 = p00 + dt * (p10 + p01) + dt * dt * p11 + q * dt ** 3 / 3.0
+        p01 = p01 + dt * p11 + q * dt ** 2 / 2.0
+        p10 = p10 + dt * p11 + q * dt ** 2 / 2.0
+        p11 = p11 + q * dt
+        # correct
+        s = p00 + self.r
+        k0, k1 = p00 / s, p10 / s
+        y = z - x
+        self.x = x + k0 * y
+        self.v = self.v + k1 * y
+        self.P = [[(1 - k0) * p00, (1 - k0) * p01],
+                  [p10 - k1 * p00, p11 - k1 * p01]]
+        self.t = t
+
+    def predict(self, t: float, horizon: float) -> float:
+        """
+        Position at time ``t``, extrapolating at most ``horizon`` seconds.
+        """
+        if self.t is None:
+            return 0.0
+        return self.x + self.v * min(max(t - self.t, 0.0), horizon)
+
+    def reset(self) -> None:
+        self.t = None
+        self.v = 0.0
+
+
+class TargetTracker:
+    """
+    Pan/tilt target tracking with latency compensation.
+
+    Detections are converted to absolute pan/tilt bearings using the servo
+    angles that were commanded when the frame was captured (detection time
+    minus ``latency``), filtered with a constant-velocity Kalman filter per
+    axis, and extrapolated to the present.  A control thread commands the
+    servos at ``rate`` Hz from that prediction, so the camera keeps moving
+    smoothly between detections even when detection runs at a few fps.
+    """
+
+    def __init__(self, px,
+                 frame_size: Tuple[int, int] = (640, 480),
+                 fov: Tuple[float, float] = (62.2, 48.8),
+                 latency: float = 0.15,
+                 rate: float = 50.0,
+                 pan_range: Tuple[float, float] = (-35, 35),
+                 tilt_range: Tuple[float, float] = (-35, 35),
+                 lost_after: float = 0.5) -> None:
+        """
+        :param px: Picarx instance.
+        :param frame_size: Detection frame (width, height) in pixels.
+        :param fov: Camera field of view (horizontal, vertical) in degrees.
+        :param latency: Capture-to-detection delay in seconds; see
+                        :meth:`measure_latency`.
+        :param rate: Servo command rate in Hz.
+        :param pan_range: Allowed pan angles.
+        :param tilt_range: Allowed tilt angles.
+        :param lost_after: Stop extrapolating this long after the last detection.
+        """
+        self.px = px
+        self.frame_size = frame_size
+        self.fov = fov
+        self.latency = latency
+        self.period = 1.0 / rate
+        self.pan_range = pan_range
+        self.tilt_range = tilt_range
+        self.lost_after = lost_after
+        self.pan_filter = ConstantVelocityFilter()
+        self.tilt_filter = ConstantVelocityFilter()
+        self._history: deque = deque(maxlen=max(16, int(rate * 2)))
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread: Union[threading.Thread, None] = None
+        self.measurements = 0
+        self.commands = 0
+        self.last_update = 0.0
+
+    # ---- measurements ----
+
+    def _angles_at(self, t: float) -> Tuple[float, float]:
+        with self._lock:
+            history = list(self._history)
+        if not history:
+            return self.px.cam_pan_current_angle, self.px.cam_tilt_current_angle
+        i = bisect.bisect_right([h[0] for h in history], t) - 1
+        _, pan, tilt = history[max(i, 0)]
+        return pan, tilt
+
+    def update(self, x: float, y: float, timestamp: Union[float, None] = None) -> None:
+        """
+        Feed one detection centre in pixels.
+
+        :param timestamp: ``time.monotonic()`` when the detection was
+                          reported; defaults to now.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        captured = timestamp - self.latency
+        pan, tilt = self._angles_at(captured)
+        w, h = self.frame_size
+        pan_target = pan + (x - w / 2.0) / w * self.fov[0]
+        tilt_target = tilt - (y - h / 2.0) / h * self.fov[1]
+        with self._lock:
+            self.pan_filter.update(pan_target, captured)
+            self.tilt_filter.update(tilt_target, captured)
+            self.measurements += 1
+            self.last_update = timestamp
+
+    def on_detection(self, det) -> None:
+        """
+        Callback for :class:`picarx.vision.VisionEvents`.
+
+        Stale (replayed) detections only keep the target from being
+        reported lost: their pixel position belongs to an earlier frame and
+        camera pose, so it is not fed to the filters.
+        """
+        if det.stale:
+            with self._lock:
+                self.last_update = det.timestamp
+            return
+        self.update(det.x, det.y, det.timestamp)
+
+    # ---- control ----
+
+    def predict(self, t: Union[float, None] = None) -> Union[Tuple[float, float], None]:
+        """
+        Predicted (pan, tilt) of the target at time ``t``, or None if no
+        target has been seen yet.
+        """
+        if t is None:
+            t = time.monotonic()
+        with self._lock:
+            if self.pan_filter.t is None:
+                return None
+            pan = self.pan_filter.predict(t, self.lost_after)
+            tilt = self.tilt_filter.predict(t, self.lost_after)
+        return (constrain(pan, *self.pan_range), constrain(tilt, *self.tilt_range))
+
+    def step(self) -> None:
+        """
+        Command the servos toward the current prediction once.
+        """
+        now = time.monotonic()
+        target = self.predict(now)
+        if target is not None:
+            pan, tilt = target
+            self.px.set_cam_pan_angle(pan)
+            self.px.set_cam_tilt_angle(tilt)
+            self.commands += 1
+        with self._lock:
+            self._history.append((now, self.px.cam_pan_current_angle, self.px.cam_tilt_current_angle))
+
+    def start(self) -> None:
+        """
+        Start commanding the servos at the fixed rate.
+        """
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._control_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def reset(self) -> None:
+        """
+        Forget the current target.
+        """
+        with self._lock:
+            self.pan_filter.reset()
+            self.tilt_filter.reset()
+
+    def _control_loop(self) -> None:
+        next_tick = time.monotonic()
+        while self._running:
+            self.step()
+            next_tick += self.period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()
+
+    def measure_latency(self, vision, kind: str = 'face', step: float = 10.0,
+                        timeout: float = 2.0) -> Union[float, None]:
+        """
+        Measure the capture-to-detection latency against a stationary target.
+
+        Steps the pan servo by ``step`` degrees and times how long it takes
+        for the detection to shift by at least half the expected amount.
+        The tracker's control thread must not be running.
+
+        :param vision: A started :class:`picarx.vision.VisionEvents`.
+        :param kind: Detection kind to watch.
+        :return: The measured latency (also stored on the tracker), or None
+                 if the target did not move in time.
+        """
+        w = self.frame_size[0]
+        expected = step / self.fov[0] * w
+        shifted = threading.Event()
+        state = {'x0': None, 't0': None, 't1': None}
+
+        def watch(det) -> None:
+            if state['t0'] is None:
+                state['x0'] = det.x
+            elif det.timestamp >= state['t0'] and abs(det.x - state['x0']) >= expected / 2:
+                state['t1'] = det.timestamp
+                shifted.set()
+
+        vision.subscribe(kind, watch)
+        try:
+            deadline = time.monotonic() + timeout
+            while state['x0'] is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+            if state['x0'] is None:
+                return None
+            pan = self.px.cam_pan_current_angle
+            state['t0'] = time.monotonic()
+            self.px.set_cam_pan_angle(pan + step)
+            if not shifted.wait(timeout):
+                return None
+        finally:
+            vision.unsubscribe(kind, watch)
+        self.latency = state['t1'] - state['t0']
+        return self.latency
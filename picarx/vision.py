@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+import asyncio
+import copy
+import threading
+import time
+from typing import Callable, Dict, List, Tuple, Union
+
+import numpy as np
+
+
+class Detection:
+    """
+    A detection reported by Vilib for one camera frame.
+
+    :ivar seq: Frame sequence number assigned by the watcher.
+    :ivar timestamp: ``time.monotonic()`` when the frame was observed.
+    :ivar x: Centre x in pixels.
+    :ivar y: Centre y in pixels.
+    :ivar w: Width in pixels.
+    :ivar h: Height in pixels.
+    :ivar stale: True if the detectors did not run on this frame and the
+                 event repeats an earlier frame's result; the position is
+                 where the target was then, not where it is in this frame.
+    """
+
+    kind: str = ''
+    PREFIX: str = ''
+
+    def __init__(self, seq: int, timestamp: float, x: int, y: int, w: int, h: int) -> None:
+        self.seq = seq
+        self.timestamp = timestamp
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+        self.stale = False
+
+    @classmethod
+    def from_params(cls, seq: int, timestamp: float, params: Dict) -> Union["Detection", None]:
+        p = cls.PREFIX
+        if not params.get(f'{p}_n'):
+            return None
+        return cls(seq, timestamp, params[f'{p}_x'], params[f'{p}_y'], params[f'{p}_w'], params[f'{p}_h'])
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(seq={self.seq}, x={self.x}, y={self.y}, w={self.w}, h={self.h})"
+
+
+class FaceDetection(Detection):
+    kind = 'face'
+    PREFIX = 'human'
+
+
+class ColorDetection(Detection):
+    kind = 'color'
+    PREFIX = 'color'
+
+
+class QRDetection(Detection):
+    kind = 'qr'
+    PREFIX = 'qr'
+
+    def __init__(self, seq: int, timestamp: float, x: int, y: int, w: int, h: int, data: str) -> None:
+        super().__init__(seq, timestamp, x, y, w, h)
+        self.data = data
+
+    @classmethod
+    def from_params(cls, seq: int, timestamp: float, params: Dict) -> Union["QRDetection", None]:
+        data = params.get('qr_data', 'None')
+        if data in (None, 'None'):
+            return None
+        return cls(seq, timestamp, params.get('qr_x', 0), params.get('qr_y', 0),
+                   params.get('qr_w', 0), params.get('qr_h', 0), data)
+
+    def __repr__(self) -> str:
+        return f"QRDetection(seq={self.seq}, data={self.data!r})"
+
+
+DETECTION_TYPES = (FaceDetection, ColorDetection, QRDetection)
+
+
+class VisionEvents:
+    """
+    Single watcher over ``Vilib.detect_obj_parameter`` that turns detection
+    results into events.
+
+    One thread notices each new camera frame (``Vilib.img`` is replaced on
+    every capture), numbers it, snapshots the detection results once and
+    dispatches one event per detector that saw something.  Consumers
+    register callbacks or asyncio queues and never touch the Vilib dict, so
+    a frame is never processed twice and short-lived detections are not
+    missed between polls.
+    """
+
+    def __init__(self, source=None, interval: float = 0.002) -> None:
+        """
+        :param source: Object exposing ``img`` and ``detect_obj_parameter``;
+                       defaults to ``vilib.Vilib``.
+        :param interval: How often the watcher checks for a new frame.
+        """
+        if source is None:
+            from vilib import Vilib
+            source = Vilib
+        self.source = source
+        self.interval = interval
+        self.seq = 0
+        self.events = 0
+        self.gate: Union["ChangeGate", None] = None
+        self._last: List[Detection] = []
+        self._callbacks: Dict[str, List[Callable[[Detection], None]]] = {t.kind: [] for t in DETECTION_TYPES}
+        self._queues: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {t.kind: [] for t in DETECTION_TYPES}
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread: Union[threading.Thread, None] = None
+
+    def subscribe(self, kind: str, callback: Callable[[Detection], None]) -> None:
+        """
+        Call ``callback`` from the watcher thread for every ``kind`` event
+        ('face', 'color' or 'qr').  Callbacks should return quickly.
+        """
+        with self._lock:
+            self._callbacks[kind].append(callback)
+
+    def unsubscribe(self, kind: str, callback: Callable[[Detection], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks[kind]:
+                self._callbacks[kind].remove(callback)
+
+    def queue(self, kind: str, maxsize: int = 16,
+              loop: Union[asyncio.AbstractEventLoop, None] = None) -> asyncio.Queue:
+        """
+        Return an asyncio queue that receives every ``kind`` event.
+
+        Must be called from the event loop that will consume the queue
+        unless ``loop`` is given.  When the queue is full the oldest event
+        is discarded so consumers always see the most recent frames.
+        """
+        if loop is None:
+            loop = asyncio.get_running_loop()
+        q: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        with self._lock:
+            self._queues[kind].append((loop, q))
+        return q
+
+    def start(self) -> None:
+        """
+        Start the watcher thread.
+        """
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._watch_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch_loop(self) -> None:
+        last_frame = None
+        while self._running:
+            frame = self.source.img
+            if frame is None or frame is last_frame:
+                time.sleep(self.interval)
+                continue
+            last_frame = frame
+            if self.gate is not None and not self.gate.observe(frame):
+                self.replay()
+                continue
+            self.process(dict(self.source.detect_obj_parameter))
+
+    def process(self, params: Dict) -> List[Detection]:
+        """
+        Number one frame's detection results and dispatch its events.
+
+        Called by the watcher thread; exposed so other frame sources can
+        feed results directly.
+        """
+        self.seq += 1
+        now = time.monotonic()
+        detections = []
+        for cls in DETECTION_TYPES:
+            det = cls.from_params(self.seq, now, params)
+            if det is not None:
+                detections.append(det)
+                self._dispatch(det)
+        self._last = detections
+        return detections
+
+    def replay(self) -> List[Detection]:
+        """
+        Re-dispatch the previous frame's detections for a new frame whose
+        detectors were skipped, marked :attr:`Detection.stale` so consumers
+        that steer by position can tell them from fresh results.
+        """
+        self.seq += 1
+        now = time.monotonic()
+        detections = []
+        for prev in self._last:
+            det = copy.copy(prev)
+            det.seq = self.seq
+            det.timestamp = now
+            det.stale = True
+            detections.append(det)
+            self._dispatch(det)
+        self._last = detections
+        return detections
+
+    def _dispatch(self, det: Detection) -> None:
+        with self._lock:
+            callbacks = list(self._callbacks[det.kind])
+            queues = list(self._queues[det.kind])
+        self.events += 1
+        for callback in callbacks:
+            callback(det)
+        for loop, q in queues:
+            loop.call_soon_threadsafe(self._put_latest, q, det)
+
+    @staticmethod
+    def _put_latest(q: asyncio.Queue, det: Detection) -> None:
+        if q.full():
+            q.get_nowait()
+        q.put_nowait(det)
+
+
+class VisionControl:
+    """
+    Idempotent front end for Vilib's detector switches.
+
+    The desired state of every detector is cached and only real transitions
+    reach Vilib, so a control loop may state what it wants on every
+    iteration without re-configuring the pipeline.  For each detector it
+    also records how long it has been enabled and how much process CPU time
+    was spent while it was enabled, next to the baseline load with no
+    detector running.  Overlapping detectors are each charged the full
+    load of the interval, so compare loads against the baseline rather
+    than summing them.
+    """
+
+    DETECTORS = ('color', 'face', 'object', 'qr')
+
+    def __init__(self, source=None) -> None:
+        """
+        :param source: Object exposing Vilib's detector switches; defaults
+                       to ``vilib.Vilib``.  All detectors are assumed off.
+        """
+        if source is None:
+            from vilib import Vilib
+            source = Vilib
+        self.source = source
+        self._lock = threading.Lock()
+        self._state: Dict[str, Union[bool, str]] = {d: False for d in self.DETECTORS}
+        self._enabled_at: Dict[str, Union[float, None]] = {d: None for d in self.DETECTORS}
+        self._stats: Dict[str, Dict[str, float]] = {
+            d: {'transitions': 0, 'enabled_time': 0.0, 'cpu_time': 0.0}
+            for d in self.DETECTORS + ('baseline',)
+        }
+        self._checkpoint = (time.monotonic(), time.process_time())
+        self._suspended = False
+        self.forwarded = 0
+        self.suppressed = 0
+
+    def set(self, detector: str, value: Union[bool, str, None]) -> bool:
+        """
+        Request a detector state.  ``value`` is True/False, or for 'color'
+        a colour name, with None or False meaning off.
+
+        :return: True if Vilib was actually called.
+        :raises ValueError: For an unknown detector.
+        """
+        if detector not in self._state:
+            raise ValueError(f"Unknown detector {detector!r}, expected one of {self.DETECTORS}.")
+        value = value or False
+        with self._lock:
+            if self._state[detector] == value:
+                self.suppressed += 1
+                return False
+            self._account()
+            now = time.monotonic()
+            was_on = bool(self._state[detector])
+            self._state[detector] = value
+            if self._suspended:
+                # applied on resume()
+                return False
+            self._forward(detector, value)
+            if value and not was_on:
+                self._enabled_at[detector] = now
+            elif not value and was_on:
+                self._stats[detector]['enabled_time'] += now - self._enabled_at[detector]
+                self._enabled_at[detector] = None
+            self._stats[detector]['transitions'] += 1
+            self.forwarded += 1
+            return True
+
+    def color(self, color: Union[str, None]) -> bool:
+        return self.set('color', color)
+
+    def face(self, on: bool) -> bool:
+        return self.set('face', on)
+
+    def object(self, on: bool) -> bool:
+        return self.set('object', on)
+
+    def qr(self, on: bool) -> bool:
+        return self.set('qr', on)
+
+    def state(self, detector: str) -> Union[bool, str]:
+        return self._state[detector]
+
+    def close(self) -> None:
+        """
+        Switch every detector off.
+        """
+        self.resume()
+        for detector in self.DETECTORS:
+            self.set(detector, False)
+
+    @property
+    def suspended(self) -> bool:
+        return self._suspended
+
+    def suspend(self) -> None:
+        """
+        Switch the enabled detectors off in Vilib while remembering them;
+        requests made meanwhile are applied by :meth:`resume`.
+        """
+        with self._lock:
+            if self._suspended:
+                return
+            self._account()
+            now = time.monotonic()
+            for d in self.DETECTORS:
+                if self._state[d]:
+                    self._forward(d, False)
+                    self._stats[d]['enabled_time'] += now - self._enabled_at[d]
+                    self._enabled_at[d] = None
+                    self.forwarded += 1
+            self._suspended = True
+
+    def resume(self) -> None:
+        """
+        Restore the requested detector states after :meth:`suspend`.
+        """
+        with self._lock:
+            if not self._suspended:
+                return
+            self._account()
+            now = time.monotonic()
+            for d in self.DETECTORS:
+                if self._state[d]:
+                    self._forward(d, self._state[d])
+                    self._enabled_at[d] = now
+                    self.forwarded += 1
+            self._suspended = False
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per-detector transitions, seconds enabled, CPU seconds spent while
+        enabled and the resulting load (CPU seconds per second), plus the
+        same for the 'baseline' with every detector off.
+        """
+        with self._lock:
+            self._account()
+            now = time.monotonic()
+            result = {}
+            for name, stats in self._stats.items():
+                m = dict(stats)
+                if name != 'baseline' and self._enabled_at[name] is not None:
+                    m['enabled_time'] += now - self._enabled_at[name]
+                m['load'] = m['cpu_time'] / m['enabled_time'] if m['enabled_time'] > 0 else 0.0
+                result[name] = m
+            result['calls'] = {'forwarded': self.forwarded, 'suppressed': self.suppressed}
+            return result
+
+    def _account(self) -> None:
+        # charge the CPU time since the last checkpoint to whatever was on
+        wall, cpu = time.monotonic(), time.process_time()
+        d_wall, d_cpu = wall - self._checkpoint[0], cpu - self._checkpoint[1]
+        self._checkpoint = (wall, cpu)
+        active = [] if self._suspended else [d for d in self.DETECTORS if self._state[d]]
+        if not active:
+            self._stats['baseline']['enabled_time'] += d_wall
+            active = ['baseline']
+        for d in active:
+            self._stats[d]['cpu_time'] += d_cpu
+
+    def _forward(self, detector: str, value: Union[bool, str]) -> None:
+        src = self.source
+        if detector == 'color':
+            src.color_detect(value if value else 'close')
+        elif detector == 'face':
+            src.face_detect_switch(bool(value))
+        elif detector == 'object':
+            src.object_detect_switch(bool(value))
+        elif detector == 'qr':
+            src.qrcode_detect_switch(bool(value))
+
+
+class ChangeGate:
+    """
+    Skips the full detectors while the camera image is not changing.
+
+    Each frame is reduced to a coarse grayscale grid (every ``scale``-th
+    pixel) and compared with the last frame that counted as a change.  Once
+    the mean absolute difference has stayed below ``threshold`` for
+    ``settle`` frames the detectors are suspended through
+    :class:`VisionControl` and :class:`VisionEvents` re-dispatches the
+    previous detections instead.  Every ``probe_interval`` seconds the
+    detectors run again for ``settle`` frames, so slow changes such as a
+    face entering a static frame from afar are still picked up, and any
+    change above the threshold resumes them at once.
+
+    Attach with ``events.gate = ChangeGate(control)``.
+    """
+
+    def __init__(self, control: VisionControl, threshold: float = 4.0, scale: int = 8,
+                 settle: int = 5, probe_interval: float = 1.0) -> None:
+        """
+        :param control: Detector switches to suspend and resume.
+        :param threshold: Mean absolute difference (0-255) counted as change.
+        :param scale: Pixel stride of the downscaled comparison grid.
+        :param settle: Static frames before the detectors are suspended.
+        :param probe_interval: Seconds between detector runs while static.
+        """
+        self.control = control
+        self.threshold = threshold
+        self.scale = scale
+        self.settle = settle
+        self.probe_interval = probe_interval
+        self._ref: Union[np.ndarray, None] = None
+        self._small: Union[np.ndarray, None] = None
+        self._still = 0
+        self._last_run = 0.0
+        self.last_change = 0.0
+        self.frames = 0
+        self.skipped = 0
+        self.gate_cpu = 0.0
+        self._suspended_since: Union[float, None] = None
+        self.suspended_time = 0.0
+
+    def observe(self, frame: np.ndarray) -> bool:
+        """
+        Feed one frame.
+
+        :return: True if the detectors ran on this frame, False if it was
+                 skipped.
+        """
+        cpu = time.process_time()
+        now = time.monotonic()
+        view = frame[::self.scale, ::self.scale]
+        if self._small is None or self._small.shape != view.shape[:2]:
+            self._small = np.empty(view.shape[:2], dtype=np.float32)
+            self._ref = None
+        if view.ndim == 3:
+            np.mean(view, axis=2, out=self._small)
+        else:
+            self._small[...] = view
+        if self._ref is None:
+            self.last_change = float('inf')
+        else:
+            self.last_change = float(np.abs(self._small - self._ref).mean())
+        self.frames += 1
+
+        if self.last_change > self.threshold:
+            self._ref = self._small.copy()
+            self._still = 0
+            self._resume(now)
+        else:
+            self._still += 1
+            if self.control.suspended and now - self._last_run >= self.probe_interval:
+                # periodic probe: run the detectors for another settle period
+                self._still = 0
+                self._resume(now)
+            elif not self.control.suspended and self._still >= self.settle:
+                self.control.suspend()
+                self._suspended_since = now
+
+        ran = not self.control.suspended
+        if ran:
+            self._last_run = now
+        else:
+            self.skipped += 1
+        self.gate_cpu += time.process_time() - cpu
+        return ran
+
+    def _resume(self, now: float) -> None:
+        if self.control.suspended:
+            self.control.resume()
+            # the detectors may have been suspended by someone else
+            if self._suspended_since is not None:
+                self.suspended_time += now - self._suspended_since
+                self._suspended_since = None
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        Frames seen and skipped, the skip ratio, the gate's own CPU time
+        and an estimate of the detector CPU time saved: the time spent
+        suspended multiplied by the highest measured load of the requested
+        detectors above the baseline.
+        """
+        suspended = self.suspended_time
+        if self._suspended_since is not None:
+            suspended += time.monotonic() - self._suspended_since
+        costs = self.control.metrics()
+        baseline = costs['baseline']['load']
+        loads = [costs[d]['load'] - baseline for d in VisionControl.DETECTORS if self.control.state(d)]
+        return {
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'skip_ratio': self.skipped / self.frames if self.frames else 0.0,
+            'suspended_time': suspended,
+            'gate_cpu': self.gate_cpu,
+            'cpu_saved': max([0.0] + loads) * suspended,
+        }
@@ -0,0 +1,2 @@
+from .world import Polygon, Track, Car, World
+from .simulator import Simulator, SimPicarx, SimClock, SimulationEnd
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+import argparse
+import contextlib
+import json
+import math
+import os
+import runpy
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple, Union
+
+import numpy as np
+
+from .simulator import SimPicarx, Simulator
+from .world import Car, Polygon, Track, World
+
+EXAMPLES = Path(__file__).resolve().parent.parent / 'examples'
+BASELINES = Path(__file__).resolve().parent / 'baselines.json'
+
+# metric: (which way is better, relative tolerance, absolute tolerance)
+TOLERANCES: Dict[str, Tuple[str, float, float]] = {
+    'laps': ('higher', 0.0, 0),
+    'lap_time': ('lower', 0.05, 0.1),
+    'cross_track_rms': ('lower', 0.1, 0.001),
+    'cross_track_max': ('lower', 0.1, 0.002),
+    'collisions': ('lower', 0.0, 0),
+    'falls': ('lower', 0.0, 0),
+    'distance': ('higher', 0.1, 0.05),
+    'max_overhang': ('lower', 0.1, 0.005),
+}
+
+# CPU cost depends on the host, so it is only compared with --perf against
+# baselines recorded on the same machine, and with a wide margin for noise
+PERF_TOLERANCES: Dict[str, Tuple[str, float, float]] = {
+    'cpu_per_sim_second': ('lower', 0.5, 0.002),
+}
+
+
+class SilentSpeech:
+    """
+    Stand-in for :class:`picarx.speech.Speech` that records phrases
+    instead of synthesizing and playing them.
+    """
+
+    def __init__(self, lang: str = "en-US", *args, **kwargs) -> None:
+        self._lang = lang
+        self.said: List[str] = []
+
+    def lang(self, value: str) -> None:
+        self._lang = value
+
+    def preload(self, phrases, lang: Union[str, None] = None) -> None:
+        pass
+
+    def say(self, text: str, priority: int = 0, lang: Union[str, None] = None,
+            interrupt: bool = False) -> bool:
+        self.said.append(text)
+        return True
+
+    def clear(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def metrics(self) -> Dict[str, int]:
+        return {'queued': len(self.said)}
+
+
+@contextlib.contextmanager
+def example_environment(sim: Simulator):
+    """
+    Make an example script see the simulation: ``Picarx`` is a
+    :class:`SimPicarx`, ``time`` is the virtual clock, speech is silent and
+    printing is discarded.
+    """
+    import picarx
+    import picarx.speech
+    saved = (picarx.Picarx, picarx.speech.Speech, sys.modules['time'])
+    picarx.Picarx = SimPicarx
+    picarx.speech.Speech = SilentSpeech
+    sys.modules['time'] = sim.clock
+    try:
+        with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+            yield
+    finally:
+        picarx.Picarx, picarx.speech.Speech, sys.modules['time'] = saved
+
+
+def run_example(sim: Simulator, name: str, duration: float) -> float:
+    """
+    Run ``examples/<name>`` as ``__main__`` for ``duration`` simulated
+    seconds.
+
+    :return: CPU seconds used per simulated second.
+    """
+    path = EXAMPLES / name
+    start, cpu = sim.now, time.process_time()
+    with example_environment(sim):
+        sim.run(lambda: runpy.run_path(str(path), run_name='__main__'), duration)
+    return (time.process_time() - cpu) / max(sim.now - start, 1e-9)
+
+
+class PathProgress:
+    """
+    Distance travelled along a closed path and cross-track error of a
+    point following it.
+    """
+
+    def __init__(self, path: List[Tuple[float, float]]) -> None:
+        pts = np.array(path, dtype=float)
+        self.a = pts[:-1]
+        self.e = pts[1:] - pts[:-1]
+        self.length_sq = np.maximum((self.e ** 2).sum(axis=1), 1e-12)
+        lengths = np.sqrt(self.length_sq)
+        self.offset = np.concatenate([[0.0], np.cumsum(lengths)[:-1]])
+        self.total = float(lengths.sum())
+        self.travelled = 0.0
+        self._last: Union[float, None] = None
+
+    def update(self, x: float, y: float) -> float:
+        """
+        Record the point's position; returns its distance from the path.
+        """
+        t = np.clip(((x - self.a[:, 0]) * self.e[:, 0] + (y - self.a[:, 1]) * self.e[:, 1]) / self.length_sq, 0, 1)
+        d = np.hypot(x - self.a[:, 0] - t * self.e[:, 0], y - self.a[:, 1] - t * self.e[:, 1])
+        i = int(d.argmin())
+        s = float(self.offset[i] + t[i] * math.sqrt(self.length_sq[i]))
+        if self._last is not None:
+            delta = (s - self._last + self.total / 2) % self.total - self.total / 2
+            self.travelled += delta
+        self._last = s
+        return float(d[i])
+
+
+def stadium(cx: float, cy: float, straight: float, radius: float, n: int = 24) -> List[Tuple[float, float]]:
+    """
+    Closed counter-clockwise stadium loop starting at the middle of the
+    bottom straight.
+    """
+    half = straight / 2
+    pts = [(cx, cy - radius), (cx + half, cy - radius)]
+    pts += [(cx + half + radius * math.sin(math.pi * i / n), cy - radius * math.cos(math.pi * i / n))
+            for i in range(1, n)]
+    pts += [(cx + half, cy + radius), (cx - half, cy + radius)]
+    pts += [(cx - half - radius * math.sin(math.pi * i / n), cy + radius * math.cos(math.pi * i / n))
+            for i in range(1, n)]
+    pts += [(cx - half, cy - radius), (cx, cy - radius)]
+    return pts
+
+
+def line_follow(duration: float = 60.0) -> Dict[str, float]:
+    """
+    ``5.minecart_plus.py`` on a 1 m x 0.8 m stadium loop of black tape.
+    """
+    loop = stadium(1.1, 0.8, 1.0, 0.4)
+    track = Track.blank(2.2, 1.6).line(loop)
+    start = loop[0]
+    car = Car(start[0] - Car.GRAYSCALE_AHEAD, start[1])
+    sim = Simulator(World(track), car)
+    progress = PathProgress(loop)
+    errors: List[float] = []
+    laps: List[float] = []
+
+    def sample() -> None:
+        x, y = car.grayscale_points()[1]
+        errors.append(progress.update(x, y))
+        if progress.travelled >= (len(laps) + 1) * progress.total:
+            laps.append(sim.now)
+
+    with sim:
+        sim.every(0.01, sample)
+        cpu = run_example(sim, '5.minecart_plus.py', duration)
+    err = np.array(errors)
+    times = np.diff([0.0] + laps) if laps else None
+    return {
+        'laps': len(laps),
+        'lap_time': float(times.mean()) if times is not None else None,
+        'cross_track_rms': float(np.sqrt((err ** 2).mean())),
+        'cross_track_max': float(err.max()),
+        'cpu_per_sim_second': cpu,
+    }
+
+
+def _avoid(world: World, car: Car, duration: float) -> Dict[str, float]:
+    sim = Simulator(world, car)
+    with sim:
+        cpu = run_example(sim, '4.avoiding_obstacles.py', duration)
+    return {
+        'collisions': sim.collisions,
+        'distance': sim.distance,
+        'cpu_per_sim_second': cpu,
+    }
+
+
+def obstacle_avoid(duration: float = 60.0) -> Dict[str, float]:
+    """
+    ``4.avoiding_obstacles.py`` in a walled 2.5 m x 2.5 m room with a box
+    in the middle and a post near one corner, with room to reverse
+    around both; any collision is a regression.
+    """
+    world = World(obstacles=[Polygon.rect(1.1, 1.1, 1.4, 1.4),
+                             Polygon.circle(0.6, 1.9, 0.1)]).add_walls(0, 0, 2.5, 2.5)
+    return _avoid(world, Car(0.4, 1.25), duration)
+
+
+def obstacle_corner(duration: float = 60.0) -> Dict[str, float]:
+    """
+    ``4.avoiding_obstacles.py`` in a tight 2 m x 2 m room whose post is
+    only 0.4 m from a wall.  The example reverses without looking and
+    backs into the post; the baseline records those collisions so the
+    limitation stays visible and must not get worse.
+    """
+    world = World(obstacles=[Polygon.rect(0.9, 0.9, 1.2, 1.2),
+                             Polygon.circle(0.5, 1.5, 0.1)]).add_walls(0, 0, 2, 2)
+    return _avoid(world, Car(0.4, 1.0), duration)
+
+
+def cliff_detect(duration: float = 20.0, push: float = 0.1) -> Dict[str, float]:
+    """
+    ``6.cliff_detection.py`` on a 1.2 m x 1 m table while the car is
+    pushed towards the edge at ``push`` m/s.
+    """
+    edge = 1.2
+    world = World(cliffs=[Polygon.rect(edge, -1, edge + 1, 2), Polygon.rect(-1, -1, 0, 2),
+                          Polygon.rect(0, -1, edge, 0), Polygon.rect(0, 1, edge, 2)])
+    car = Car(0.6, 0.5)
+    sim = Simulator(world, car)
+    overhang = [0.0]
+
+    def nudge() -> None:
+        sim.push(push * sim.step, 0.0)
+        front = max(p[0] for p in car.footprint().points)
+        overhang[0] = max(overhang[0], front - edge)
+
+    with sim:
+        sim.every(sim.step, nudge)
+        cpu = run_example(sim, '6.cliff_detection.py', duration)
+    return {
+        'falls': sim.falls,
+        'max_overhang': overhang[0],
+        'cpu_per_sim_second': cpu,
+    }
+
+
+SCENARIOS: Dict[str, Callable[[], Dict[str, float]]] = {
+    'line_follow': line_follow,
+    'obstacle_avoid': obstacle_avoid,
+    'obstacle_corner': obstacle_corner,
+    'cliff_detect': cliff_detect,
+}
+
+
+def compare(results: Dict[str, Dict[str, float]], baselines: Dict[str, Dict[str, float]],
+            tolerances: Union[Dict[str, Tuple[str, float, float]], None] = None) -> List[str]:
+    """
+    Regressions of ``results`` against ``baselines``, one message each.
+
+    :param tolerances: Metrics to compare; :data:`TOLERANCES` by default.
+    """
+    if tolerances is None:
+        tolerances = TOLERANCES
+    problems = []
+    for scenario, metrics in results.items():
+        base = baselines.get(scenario)
+        if base is None:
+            problems.append(f"{scenario}: no baseline")
+            continue
+        for metric, value in metrics.items():
+            if metric not in base or metric not in tolerances:
+                continue
+            better, rel, abs_tol = tolerances[metric]
+            expected = base[metric]
+            if expected is None:
+                continue
+            if value is None:
+                problems.append(f"{scenario}.{metric}: no value, baseline {expected:.4g}")
+                continue
+            margin = abs(expected) * rel + abs_tol
+            if (better == 'lower' and value > expected + margin) or \
+                    (better == 'higher' and value < expected - margin):
+                problems.append(f"{scenario}.{metric}: {value:.4g}, baseline {expected:.4g}")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the example behaviors in the simulator and compare "
+                                                 "their metrics with the baselines.")
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help=f"Scenarios to run, from {', '.join(SCENARIOS)} (default: all).")
+    parser.add_argument('--baselines', default=str(BASELINES), help="Baseline metrics file.")
+    parser.add_argument('--output', help="Also write the metrics as JSON to this file.")
+    parser.add_argument('--update', action='store_true', help="Store the results as the new baselines.")
+    parser.add_argument('--perf', action='store_true',
+                        help="Also fail if CPU per simulated second is worse than the baseline; "
+                             "only meaningful with baselines recorded on this machine.")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = {name: SCENARIOS[name]() for name in (args.scenarios or SCENARIOS)}
+    text = json.dumps(results, indent=2, sort_keys=True)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+
+    path = Path(args.baselines)
+    baselines = json.loads(path.read_text()) if path.exists() else {}
+    if args.update:
+        baselines.update(results)
+        path.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        return
+    problems = compare(results, baselines, {**TOLERANCES, **PERF_TOLERANCES} if args.perf else TOLERANCES)
+    for problem in problems:
+        print(f'\033[31mregression: {problem}\033[m', file=sys.stderr)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+import math
+import random
+import sys
+import tempfile
+import threading
+import time as _time
+import types
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+from .world import Car, World
+
+
+class SimulationEnd(BaseException):
+    """
+    Raised by the virtual clock once the time given to :meth:`Simulator.run`
+    is used up.  Derived from BaseException so ``except Exception`` in the
+    code under test does not swallow it.
+    """
+
+
+def _active() -> 'Simulator':
+    sim = Simulator.active
+    if sim is None:
+        raise RuntimeError("No active Simulator; create the car inside 'with Simulator(world):'.")
+    return sim
+
+
+# --------- simulated robot_hat ---------
+
+class Pin:
+    OUT = 0x01
+    IN = 0x02
+    PULL_UP = 0x11
+    PULL_DOWN = 0x12
+    PULL_NONE = None
+
+    def __init__(self, pin: str, mode=None, pull=None, *args, **kwargs) -> None:
+        self.name = pin
+        self._value = 0
+        _active().pins[pin] = self
+
+    def value(self, value: Union[int, None] = None) -> int:
+        if value is not None:
+            self._value = 1 if value else 0
+        return self._value
+
+    def high(self) -> None:
+        self._value = 1
+
+    def low(self) -> None:
+        self._value = 0
+
+    on = high
+    off = low
+
+
+class PWM:
+    def __init__(self, channel: str, *args, **kwargs) -> None:
+        self.channel = channel
+        self.duty = 0.0
+        _active().pwms[channel] = self
+
+    def period(self, value: Union[int, None] = None) -> None:
+        pass
+
+    def prescaler(self, value: Union[int, None] = None) -> None:
+        pass
+
+    def freq(self, value: Union[float, None] = None) -> None:
+        pass
+
+    def pulse_width_percent(self, value: Union[float, None] = None) -> float:
+        if value is not None:
+            self.duty = float(value)
+        return self.duty
+
+
+class Servo:
+    def __init__(self, channel: str, *args, **kwargs) -> None:
+        self.channel = channel
+        self.current = 0.0
+        _active().servos[channel] = self
+
+    def angle(self, value: float) -> None:
+        self.current = float(value)
+
+
+class ADC:
+    def __init__(self, channel: str, *args, **kwargs) -> None:
+        self.channel = channel
+        self._sim = _active()
+
+    def read(self) -> int:
+        return self._sim.read_adc(self.channel)
+
+    def read_voltage(self) -> float:
+        return self.read() * 3.3 / 4095
+
+
+class Grayscale_Module:
+    def __init__(self, pin0: ADC, pin1: ADC, pin2: ADC, reference: Union[List[float], None] = None) -> None:
+        self.pins = (pin0, pin1, pin2)
+        self._reference = reference
+        self._sim = _active()
+
+    def reference(self, ref: Union[List[float], None] = None) -> Union[List[float], None]:
+        if ref is not None:
+            self._reference = list(ref)
+        return self._reference
+
+    def read(self, channel: Union[int, None] = None) -> Union[List[int], int]:
+        values = self._sim.read_grayscale()
+        return values if channel is None else values[channel]
+
+    def read_status(self, datas: Union[List[float], None] = None) -> List[int]:
+        if datas is None:
+            datas = self.read()
+        return [0 if d > r else 1 for d, r in zip(datas, self._reference)]
+
+
+class Ultrasonic:
+    def __init__(self, trig: Pin, echo: Pin, timeout: float = 0.02) -> None:
+        self.timeout = timeout
+        self._sim = _active()
+
+    def read(self, times: int = 10) -> float:
+        return self._sim.read_ultrasonic(self.timeout)
+
+
+robot_hat = types.ModuleType('robot_hat')
+for _cls in (Pin, PWM, Servo, ADC, Grayscale_Module, Ultrasonic):
+    setattr(robot_hat, _cls.__name__, _cls)
+robot_hat.utils = types.SimpleNamespace(reset_mcu=lambda: None)
+GPIO = types.ModuleType('RPi.GPIO')
+GPIO.cleanup = lambda *args: None
+RPi = types.ModuleType('RPi')
+RPi.GPIO = GPIO
+
+# the simulated HAT replaces the real one for this process; names already
+# bound by an earlier ``import picarx`` are swapped as well
+sys.modules.update({'robot_hat': robot_hat, 'RPi': RPi, 'RPi.GPIO': GPIO})
+from picarx import motion as _motion  # noqa: E402
+from picarx import picarx as _driver  # noqa: E402
+for _name in ('Pin', 'PWM', 'Servo', 'ADC', 'Grayscale_Module', 'Ultrasonic', 'utils'):
+    setattr(_driver, _name, getattr(robot_hat, _name))
+_driver.GPIO = GPIO
+
+
+class SimClock:
+    """
+    Stand-in for the ``time`` module on simulated time.  ``sleep`` advances
+    the simulation; functions it does not cover come from ``time``.
+    """
+
+    def __init__(self, simulator: 'Simulator') -> None:
+        self._sim = simulator
+        self.now = 0.0
+        self.epoch = _time.time()
+
+    def monotonic(self) -> float:
+        return self.now
+
+    perf_counter = monotonic
+
+    def time(self) -> float:
+        return self.epoch + self.now
+
+    def sleep(self, seconds: float) -> None:
+        self._sim.advance(seconds)
+
+    def __getattr__(self, name: str):
+        return getattr(_time, name)
+
+
+class SimPicarx(_driver.Picarx):
+    """
+    :class:`Picarx` on the active simulator's hardware.
+
+    The ramp thread is stopped right after start-up; the simulator runs
+    ramp ticks, the motion queue and the cliff guard on its own clock.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        sim = _active()
+        kwargs.setdefault('config', str(sim.config_path))
+        super().__init__(*args, **kwargs)
+        self._running = False
+        self._wake.set()
+        self._ramp_thread.join()
+        self._running = True
+        sim.attach(self)
+
+    def enable_cliff_guard(self, rate: float = 200) -> None:
+        self._cliff_guard_period = 1.0 / rate
+        # marks the guard as on for get_grayscale_data(); the simulator samples it
+        self._cliff_guard_thread = threading.current_thread()
+
+    def disable_cliff_guard(self) -> None:
+        self._cliff_guard_thread = None
+
+
+class Simulator:
+    """
+    Headless world for one Picar-X, run on a virtual clock.
+
+    Inside ``with Simulator(world) as sim:`` a :class:`SimPicarx` drives a
+    kinematic :class:`Car`:
+
+    * the rear motors' PWM duty and direction pins set the wheel speeds and
+      the steering servo sets the front wheel angle;
+    * each grayscale channel reads the track brightness under its sensor,
+      mapped linearly between ``adc_black`` and ``adc_white``, or
+      ``adc_cliff`` over a drop-off;
+    * the ultrasonic sensor ranges against the obstacle polygons in the
+      direction the camera pan servo points, over a ``sonar_beam`` wide
+      cone, and returns -1 past its timeout like the real one;
+    * running into an obstacle stops the car and counts a collision (once
+      until the car has moved ``CONTACT_GAP`` metres clear of it), and
+      the car falls (and stays put) once its centre is over a drop-off.
+
+    Simulated time only moves when the code under test sleeps or reads a
+    sensor (each read costs as long as the real one), so behaviors run as
+    fast as the CPU allows.  Motion is integrated in ``step`` increments,
+    with ramp ticks, the motion queue and the cliff guard run on the same
+    clock.  Code under test must drive the car from a single thread.
+    """
+
+    active: Union['Simulator', None] = None
+    SOUND_SPEED = 343.3
+    CONTACT_GAP = 0.02
+
+    def __init__(self, world: World, car: Union[Car, None] = None,
+                 step: float = 0.001,
+                 adc_white: float = 1700, adc_black: float = 250, adc_cliff: float = 20,
+                 adc_noise: float = 0.0, adc_time: float = 0.0005,
+                 sonar_beam: float = 15.0, seed: int = 0,
+                 servo_pins: Sequence[str] = ('P0', 'P1', 'P2'),
+                 motor_pins: Sequence[str] = ('D4', 'D5', 'P13', 'P12'),
+                 grayscale_pins: Sequence[str] = ('A0', 'A1', 'A2')) -> None:
+        """
+        :param world: Track, obstacles and drop-offs.
+        :param car: Car model with its start pose; a car at the origin
+                    facing +x by default.
+        :param step: Integration step in seconds.
+        :param adc_noise: Standard deviation of grayscale noise in ADC counts.
+        :param adc_time: Simulated duration of one ADC conversion.
+        :param sonar_beam: Ultrasonic cone width in degrees.
+        :param seed: Seed for the sensor noise.
+        :param servo_pins: Pins the car's servos use (pan, tilt, steering).
+        :param motor_pins: Pins the motors use (left dir, right dir,
+                           left PWM, right PWM).
+        :param grayscale_pins: ADC channels of the left, middle and right
+                               grayscale sensors.
+        """
+        self.world = world
+        self.car = car or Car()
+        self.step = step
+        self.adc_white = adc_white
+        self.adc_black = adc_black
+        self.adc_cliff = adc_cliff
+        self.adc_noise = adc_noise
+        self.adc_time = adc_time
+        self.sonar_beam = sonar_beam
+        self.servo_pins = tuple(servo_pins)
+        self.motor_pins = tuple(motor_pins)
+        self.grayscale_pins = tuple(grayscale_pins)
+        self.clock = SimClock(self)
+        self.pins: Dict[str, Pin] = {}
+        self.pwms: Dict[str, PWM] = {}
+        self.servos: Dict[str, Servo] = {}
+        self.px: Union[SimPicarx, None] = None
+        self.deadline: Union[float, None] = None
+        self.distance = 0.0
+        self.collisions = 0
+        self.falls = 0
+        self.fallen = False
+        self.steps = 0
+        self._rng = random.Random(seed)
+        self._since_contact = math.inf
+        self._tasks: List[list] = []
+        self._next_ramp = 0.0
+        self._next_guard = 0.0
+        self._stepping = False
+        self._lock = threading.RLock()
+        self._patched: Dict[types.ModuleType, object] = {}
+        self._config_dir = tempfile.TemporaryDirectory(prefix='picarx-sim-')
+        self.config_path = Path(self._config_dir.name) / 'picarx.conf'
+
+    def __enter__(self) -> 'Simulator':
+        if Simulator.active is not None:
+            raise RuntimeError("Another Simulator is already active.")
+        Simulator.active = self
+        for module in (_driver, _motion):
+            self._patched[module] = module.time
+            module.time = self.clock
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
+        if self.px is not None:
+            self.px._running = False
+        for module, original in self._patched.items():
+            module.time = original
+        self._patched.clear()
+        Simulator.active = None
+        self._config_dir.cleanup()
+        return False
+
+    def attach(self, px: _driver.Picarx) -> None:
+        """
+        Step ``px``'s ramp, motion queue and cliff guard from now on.
+        Done by :class:`SimPicarx` itself.
+        """
+        self.px = px
+        self._next_ramp = self._next_guard = self.clock.now
+
+    def every(self, period: float, callback: Callable[[], None]) -> list:
+        """
+        Call ``callback`` every ``period`` simulated seconds, e.g. to record
+        metrics.
+
+        :return: Handle for :meth:`cancel`.
+        """
+        task = [self.clock.now + period, period, callback]
+        self._tasks.append(task)
+        return task
+
+    def cancel(self, task: list) -> None:
+        if task in self._tasks:
+            self._tasks.remove(task)
+
+    @property
+    def now(self) -> float:
+        return self.clock.now
+
+    def run(self, behavior: Callable[[], None], duration: float) -> Dict[str, float]:
+        """
+        Call ``behavior`` until it returns or ``duration`` simulated seconds
+        have passed, whichever is first.
+
+        :return: :meth:`metrics` at the end.
+        """
+        self.deadline = self.clock.now + duration
+        try:
+            behavior()
+        except SimulationEnd:
+            pass
+        finally:
+            self.deadline = None
+        return self.metrics()
+
+    def advance(self, seconds: float) -> None:
+        """
+        Move simulated time forward.  Sensor reads made while the
+        simulator itself is stepping (motion queue conditions, the cliff
+        guard) take no time.
+
+        :raises SimulationEnd: Past the deadline set by :meth:`run`.
+        """
+        if seconds > 0 and not self._stepping:
+            with self._lock:
+                self._stepping = True
+                try:
+                    now = self.clock.now
+                    end = now + seconds
+                    while now < end:
+                        now = min(now + self.step, end)
+                        self._tick(now)
+                finally:
+                    self._stepping = False
+        if self.deadline is not None and self.clock.now >= self.deadline and not self._stepping:
+            raise SimulationEnd()
+
+    def _tick(self, now: float) -> None:
+        self._move(now - self.clock.now)
+        self.clock.now = now
+        self.steps += 1
+        px = self.px
+        if px is not None and px._running:
+            if now >= self._next_ramp:
+                with px._lock:
+                    px._ramp_tick()
+                self._next_ramp += px._ramp_delay
+                if self._next_ramp <= now:
+                    self._next_ramp = now + px._ramp_delay
+            px.motion.poll()
+            if px._cliff_guard_thread is not None and now >= self._next_guard:
+                px._cliff_check(self._grayscale())
+                self._next_guard = now + px._cliff_guard_period
+        for task in list(self._tasks):
+            if now >= task[0]:
+                task[2]()
+                task[0] = max(task[0] + task[1], now)
+
+    def _wheel(self, dir_pin: str, pwm: str, forward_level: int) -> float:
+        p, d = self.pwms.get(pwm), self.pins.get(dir_pin)
+        if p is None or d is None:
+            return 0.0
+        return p.duty if d._value == forward_level else -p.duty
+
+    def wheel_duty(self) -> List[float]:
+        """
+        Signed PWM duty of the left and right wheel, positive forward.  The
+        right motor is mounted mirrored, so it drives forward with its
+        direction pin high.
+        """
+        return [self._wheel(self.motor_pins[0], self.motor_pins[2], 0),
+                self._wheel(self.motor_pins[1], self.motor_pins[3], 1)]
+
+    def steering(self) -> float:
+        servo = self.servos.get(self.servo_pins[2])
+        return 0.0 if servo is None else servo.current
+
+    def pan(self) -> float:
+        servo = self.servos.get(self.servo_pins[0])
+        # Picarx drives the pan servo inverted
+        return 0.0 if servo is None else -servo.current
+
+    def _move(self, dt: float) -> None:
+        car = self.car
+        if self.fallen or dt <= 0:
+            return
+        left, right = self.wheel_duty()
+        if left == 0 and right == 0:
+            car.speed = 0.0
+            return
+        step = self._place(car.advance(dt, left, right, self.steering()))
+        self.distance += step
+        car.speed = 0.0 if self.fallen else step / dt
+
+    def push(self, dx: float, dy: float) -> None:
+        """
+        Move the car by an outside force, such as a hand nudging it towards
+        an edge.  Obstacles and drop-offs apply as when it drives.
+        """
+        car = self.car
+        if not self.fallen:
+            self._place((car.x + dx, car.y + dy, car.theta))
+
+    def _place(self, pose: Tuple[float, float, float]) -> float:
+        car = self.car
+        if self.world.obstacles and self.world.collides(car.footprint(pose)):
+            # grinding against the same obstacle counts once
+            if self._since_contact >= self.CONTACT_GAP:
+                self.collisions += 1
+            self._since_contact = 0.0
+            return 0.0
+        step = math.hypot(pose[0] - car.x, pose[1] - car.y)
+        self._since_contact += step
+        car.x, car.y, car.theta = pose
+        if self.world.cliffs and self.world.over_cliff(*car.centre()):
+            self.fallen = True
+            self.falls += 1
+        return step
+
+    def _grayscale(self) -> List[int]:
+        values = []
+        span = self.adc_white - self.adc_black
+        for x, y in self.car.grayscale_points():
+            b = self.world.floor(x, y)
+            v = self.adc_cliff if b is None else self.adc_black + span * b / 255.0
+            if self.adc_noise:
+                v += self._rng.gauss(0.0, self.adc_noise)
+            values.append(int(min(4095, max(0, v))))
+        return values
+
+    def read_grayscale(self) -> List[int]:
+        self.advance(3 * self.adc_time)
+        return self._grayscale()
+
+    def read_adc(self, channel: str) -> int:
+        self.advance(self.adc_time)
+        if channel in self.grayscale_pins:
+            return self._grayscale()[self.grayscale_pins.index(channel)]
+        return 0
+
+    def range(self) -> float:
+        """
+        True distance in metres the ultrasonic sensor sees right now.
+        """
+        car = self.car
+        x, y = car.point(car.SONAR_AHEAD)
+        centre = car.theta - math.radians(self.pan())
+        half = math.radians(self.sonar_beam) / 2
+        return min(self.world.ray(x, y, centre + half * k / 2) for k in (-2, -1, 0, 1, 2))
+
+    def read_ultrasonic(self, timeout: float) -> float:
+        distance = self.range()
+        flight = 2 * distance / self.SOUND_SPEED
+        if flight > timeout:
+            self.advance(timeout)
+            return -1
+        self.advance(flight)
+        return round(distance * 100, 2)
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        Simulated time, distance driven (m), collisions and falls so far.
+        """
+        return {
+            'time': self.clock.now,
+            'distance': self.distance,
+            'collisions': self.collisions,
+            'falls': self.falls,
+            'steps': self.steps,
+        }
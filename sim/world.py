@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+import math
+from pathlib import Path
+from typing import Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
+
+Point = Tuple[float, float]
+
+
+class Polygon:
+    """
+    Closed polygon in world coordinates (metres).
+
+    :ivar points: Vertices in order; the last one connects to the first.
+    """
+
+    def __init__(self, points: Iterable[Point]) -> None:
+        self.points: List[Point] = [(float(x), float(y)) for x, y in points]
+        if len(self.points) < 3:
+            raise ValueError("A polygon needs at least 3 points.")
+        self.edges = list(zip(self.points, self.points[1:] + self.points[:1]))
+        xs = [p[0] for p in self.points]
+        ys = [p[1] for p in self.points]
+        self.bounds = (min(xs), min(ys), max(xs), max(ys))
+
+    @classmethod
+    def rect(cls, x0: float, y0: float, x1: float, y1: float) -> 'Polygon':
+        return cls([(x0, y0), (x1, y0), (x1, y1), (x0, y1)])
+
+    @classmethod
+    def circle(cls, cx: float, cy: float, r: float, sides: int = 16) -> 'Polygon':
+        return cls([(cx + r * math.cos(2 * math.pi * i / sides), cy + r * math.sin(2 * math.pi * i / sides))
+                    for i in range(sides)])
+
+    def contains(self, x: float, y: float) -> bool:
+        x0, y0, x1, y1 = self.bounds
+        if not (x0 <= x <= x1 and y0 <= y <= y1):
+            return False
+        inside = False
+        for (ax, ay), (bx, by) in self.edges:
+            if (ay > y) != (by > y) and x < ax + (y - ay) * (bx - ax) / (by - ay):
+                inside = not inside
+        return inside
+
+    def ray(self, x: float, y: float, dx: float, dy: float) -> float:
+        """
+        Distance along the unit direction (dx, dy) to the nearest edge, or
+        ``inf`` if the ray misses.
+        """
+        best = math.inf
+        for (ax, ay), (bx, by) in self.edges:
+            ex, ey = bx - ax, by - ay
+            denom = dx * ey - dy * ex
+            if abs(denom) < 1e-12:
+                continue
+            wx, wy = ax - x, ay - y
+            t = (wx * ey - wy * ex) / denom
+            u = (wx * dy - wy * dx) / denom
+            if t >= 0 and 0 <= u <= 1 and t < best:
+                best = t
+        return best
+
+    def intersects(self, other: 'Polygon') -> bool:
+        a, b = self.bounds, other.bounds
+        if a[2] < b[0] or b[2] < a[0] or a[3] < b[1] or b[3] < a[1]:
+            return False
+        for p, q in self.edges:
+            for r, s in other.edges:
+                if _segments_cross(p, q, r, s):
+                    return True
+        return other.contains(*self.points[0]) or self.contains(*other.points[0])
+
+
+def _segments_cross(p: Point, q: Point, r: Point, s: Point) -> bool:
+    def orient(a, b, c):
+        return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+    d1, d2 = orient(r, s, p), orient(r, s, q)
+    d3, d4 = orient(p, q, r), orient(p, q, s)
+    return (d1 > 0) != (d2 > 0) and (d3 > 0) != (d4 > 0)
+
+
+def _segment_distance(px: np.ndarray, py: np.ndarray, a: Point, b: Point) -> np.ndarray:
+    ax, ay = a
+    ex, ey = b[0] - ax, b[1] - ay
+    length_sq = ex * ex + ey * ey
+    if length_sq == 0:
+        return np.hypot(px - ax, py - ay)
+    t = np.clip(((px - ax) * ex + (py - ay) * ey) / length_sq, 0.0, 1.0)
+    return np.hypot(px - (ax + t * ex), py - (ay + t * ey))
+
+
+class Track:
+    """
+    Floor brightness as a raster image, 0 (black) to 255 (white).
+
+    Row 0 of the image is the far (+y) edge of the floor; the image's
+    bottom-left corner sits at ``origin``.  Points outside the image read
+    as ``outside``.  Lines drawn with :meth:`line` are also kept as
+    polylines in :attr:`paths` so scenarios can measure cross-track error.
+    """
+
+    def __init__(self, image: np.ndarray, resolution: float = 0.005,
+                 origin: Point = (0.0, 0.0), outside: float = 255) -> None:
+        """
+        :param image: 2D array of brightness values.
+        :param resolution: Metres per pixel.
+        :param origin: World position of the image's bottom-left corner.
+        :param outside: Brightness off the image.
+        """
+        self.image = np.asarray(image, dtype=np.uint8)
+        self.resolution = resolution
+        self.origin = origin
+        self.outside = outside
+        self.paths: List[List[Point]] = []
+        self._segments: Union[np.ndarray, None] = None
+
+    @classmethod
+    def blank(cls, width: float, height: float, resolution: float = 0.005,
+              value: int = 255, origin: Point = (0.0, 0.0)) -> 'Track':
+        """
+        A uniform floor ``width`` x ``height`` metres.
+        """
+        shape = (int(round(height / resolution)), int(round(width / resolution)))
+        return cls(np.full(shape, value, dtype=np.uint8), resolution, origin)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], resolution: float = 0.005,
+             origin: Point = (0.0, 0.0)) -> 'Track':
+        """
+        Load a grayscale image: ``.npy`` directly, anything else via OpenCV.
+        """
+        path = Path(path)
+        if path.suffix == '.npy':
+            image = np.load(path)
+        else:
+            import cv2
+            image = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+            if image is None:
+                raise FileNotFoundError(path)
+        return cls(image, resolution, origin)
+
+    def line(self, points: Sequence[Point], width: float = 0.019, value: int = 0,
+             closed: bool = False) -> 'Track':
+        """
+        Paint a polyline of tape ``width`` metres wide.
+        """
+        points = [(float(x), float(y)) for x, y in points]
+        if closed:
+            points = points + points[:1]
+        h, w = self.image.shape
+        ox, oy = self.origin
+        res = self.resolution
+        half = width / 2
+        for a, b in zip(points, points[1:]):
+            # only the pixels in the segment's bounding box
+            c0 = max(0, int((min(a[0], b[0]) - half - ox) / res))
+            c1 = min(w, int((max(a[0], b[0]) + half - ox) / res) + 2)
+            r0 = max(0, int((min(a[1], b[1]) - half - oy) / res))
+            r1 = min(h, int((max(a[1], b[1]) + half - oy) / res) + 2)
+            if c0 >= c1 or r0 >= r1:
+                continue
+            xs = ox + (np.arange(c0, c1) + 0.5) * res
+            ys = oy + (np.arange(r0, r1) + 0.5) * res
+            px, py = np.meshgrid(xs, ys)
+            hit = _segment_distance(px, py, a, b) <= half
+            # image rows run from +y down
+            self.image[h - r1:h - r0, c0:c1][hit[::-1]] = value
+        self.paths.append(points)
+        self._segments = None
+        return self
+
+    def brightness(self, x: float, y: float) -> float:
+        col = int((x - self.origin[0]) / self.resolution)
+        row = self.image.shape[0] - 1 - int((y - self.origin[1]) / self.resolution)
+        if 0 <= row < self.image.shape[0] and 0 <= col < self.image.shape[1] \
+                and x >= self.origin[0] and y >= self.origin[1]:
+            return float(self.image[row, col])
+        return float(self.outside)
+
+    def path_distance(self, x: float, y: float) -> float:
+        """
+        Distance from (x, y) to the nearest painted line's centre.
+        """
+        if self._segments is None:
+            self._segments = np.array([a + b for path in self.paths for a, b in zip(path, path[1:])],
+                                      dtype=float).reshape(-1, 4)
+        seg = self._segments
+        if not len(seg):
+            return math.inf
+        ex, ey = seg[:, 2] - seg[:, 0], seg[:, 3] - seg[:, 1]
+        length_sq = np.maximum(ex * ex + ey * ey, 1e-12)
+        t = np.clip(((x - seg[:, 0]) * ex + (y - seg[:, 1]) * ey) / length_sq, 0.0, 1.0)
+        return float(np.hypot(x - seg[:, 0] - t * ex, y - seg[:, 1] - t * ey).min())
+
+
+class Car:
+    """
+    Kinematic model of the Picar-X: a bicycle model steered by the front
+    wheels and driven by the mean speed of the two rear wheels.
+
+    The pose is the centre of the rear axle; ``theta`` is the heading in
+    radians counter-clockwise from +x.  Positive steering servo angles turn
+    right, as on the car.  Sensor positions are measured forward from the
+    rear axle.
+    """
+
+    WHEELBASE = 0.11
+    LENGTH = 0.25
+    WIDTH = 0.14
+    REAR_OVERHANG = 0.05
+    GRAYSCALE_AHEAD = 0.16
+    GRAYSCALE_SPACING = 0.02
+    SONAR_AHEAD = 0.19
+
+    def __init__(self, x: float = 0.0, y: float = 0.0, theta: float = 0.0,
+                 max_speed: float = 0.6) -> None:
+        """
+        :param max_speed: Wheel speed in m/s at 100 % PWM duty.
+        """
+        self.x = x
+        self.y = y
+        self.theta = theta
+        self.max_speed = max_speed
+        self.speed = 0.0
+
+    def pose(self) -> Tuple[float, float, float]:
+        return self.x, self.y, self.theta
+
+    def advance(self, dt: float, left: float, right: float, steering: float) -> Tuple[float, float, float]:
+        """
+        Pose after ``dt`` seconds with wheel duties ``left`` and ``right``
+        (signed percent, positive forward) and the steering angle in degrees.
+        The car itself is not moved.
+        """
+        v = self.max_speed * (left + right) / 200.0
+        yaw_rate = v * math.tan(math.radians(-steering)) / self.WHEELBASE
+        mid = self.theta + 0.5 * yaw_rate * dt
+        return (self.x + v * math.cos(mid) * dt,
+                self.y + v * math.sin(mid) * dt,
+                self.theta + yaw_rate * dt)
+
+    def point(self, ahead: float, left: float = 0.0,
+              pose: Union[Tuple[float, float, float], None] = None) -> Point:
+        x, y, theta = pose or self.pose()
+        c, s = math.cos(theta), math.sin(theta)
+        return x + ahead * c - left * s, y + ahead * s + left * c
+
+    def grayscale_points(self) -> List[Point]:
+        """
+        Floor positions of the left, middle and right grayscale sensors.
+        """
+        d = self.GRAYSCALE_SPACING
+        return [self.point(self.GRAYSCALE_AHEAD, d), self.point(self.GRAYSCALE_AHEAD),
+                self.point(self.GRAYSCALE_AHEAD, -d)]
+
+    def centre(self, pose: Union[Tuple[float, float, float], None] = None) -> Point:
+        return self.point(self.LENGTH / 2 - self.REAR_OVERHANG, 0.0, pose)
+
+    def footprint(self, pose: Union[Tuple[float, float, float], None] = None) -> Polygon:
+        back, front = -self.REAR_OVERHANG, self.LENGTH - self.REAR_OVERHANG
+        half = self.WIDTH / 2
+        return Polygon([self.point(back, half, pose), self.point(front, half, pose),
+                        self.point(front, -half, pose), self.point(back, -half, pose)])
+
+
+class World:
+    """
+    Everything the car's sensors can see: the floor, obstacles for the
+    ultrasonic sensor and drop-offs.
+
+    :ivar track: Floor image, or None for a plain white floor.
+    :ivar obstacles: Polygons the car collides with and the ultrasonic
+                     sensor ranges against.
+    :ivar cliffs: Polygons where the floor drops away.
+    """
+
+    def __init__(self, track: Union[Track, None] = None,
+                 obstacles: Iterable[Polygon] = (),
+                 cliffs: Iterable[Polygon] = ()) -> None:
+        self.track = track
+        self.obstacles: List[Polygon] = list(obstacles)
+        self.cliffs: List[Polygon] = list(cliffs)
+
+    def add_walls(self, x0: float, y0: float, x1: float, y1: float, thickness: float = 0.05) -> 'World':
+        """
+        Enclose the rectangle (x0, y0)-(x1, y1) with walls.
+        """
+        t = thickness
+        self.obstacles += [Polygon.rect(x0 - t, y0 - t, x1 + t, y0), Polygon.rect(x0 - t, y1, x1 + t, y1 + t),
+                           Polygon.rect(x0 - t, y0, x0, y1), Polygon.rect(x1, y0, x1 + t, y1)]
+        return self
+
+    def over_cliff(self, x: float, y: float) -> bool:
+        return any(c.contains(x, y) for c in self.cliffs)
+
+    def floor(self, x: float, y: float) -> Union[float, None]:
+        """
+        Floor brightness at (x, y), or None over a drop-off.
+        """
+        if self.over_cliff(x, y):
+            return None
+        return 255.0 if self.track is None else self.track.brightness(x, y)
+
+    def ray(self, x: float, y: float, angle: float) -> float:
+        """
+        Distance from (x, y) to the nearest obstacle in direction ``angle``
+        (radians), or ``inf``.
+        """
+        dx, dy = math.cos(angle), math.sin(angle)
+        return min((o.ray(x, y, dx, dy) for o in self.obstacles), default=math.inf)
+
+    def collides(self, shape: Polygon) -> bool:
+        return any(shape.intersects(o) for o in self.obstacles)
@@ -0,0 +1,8 @@
+#!/usr/bin/env python3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# the simulator's robot_hat stand-in lets picarx import without the HAT
+import sim.simulator  # noqa: E402,F401
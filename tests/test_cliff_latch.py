@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+import threading
+
+import pytest
+
+from sim.simulator import SimPicarx, Simulator
+from sim.world import Car, World
+
+
+@pytest.fixture
+def latched():
+    with Simulator(World(), Car(1.0, 1.0)) as sim:
+        px = SimPicarx()
+        px._cliff_latched = True
+        yield sim, px
+
+
+def _forward_pwm(px):
+    # target duty of each motor that is driving it forward
+    return [pwm if (d * px.cali_dir_value[i]) * px.FORWARD_SIGN[i] > 0 else 0
+            for i, (pwm, d) in enumerate(zip(px._target_pwm, px._target_dir))]
+
+
+@pytest.mark.parametrize('drive', [
+    lambda px: px.forward(50),
+    lambda px: px.backward(-50),
+    lambda px: px.set_power(50),
+    lambda px: px.set_power(-50),
+    lambda px: px.set_motor_speed(1, 80),
+    lambda px: px.set_motor_speed(2, -80),
+])
+def test_latch_blocks_forward_drive(latched, drive):
+    sim, px = latched
+    drive(px)
+    assert _forward_pwm(px) == [0, 0]
+
+
+def test_latch_blocks_queued_segments(latched):
+    sim, px = latched
+    px.queue_motion(60, duration=0.5)
+    sim.advance(0.2)
+    assert _forward_pwm(px) == [0, 0]
+    assert px.get_motor_pwm() == [0, 0]
+
+
+def test_latch_allows_backing_away(latched):
+    sim, px = latched
+    px.backward(50)
+    assert px._target_pwm[0] > 0 and px._target_pwm[1] > 0
+    px.clear_cliff()
+    px.forward(50)
+    assert _forward_pwm(px) == px._target_pwm
+
+
+class OverlapGrayscale:
+    """Grayscale stand-in that notices two reads in flight at once."""
+
+    def __init__(self) -> None:
+        self.busy = False
+        self.overlaps = 0
+
+    def read(self):
+        if self.busy:
+            self.overlaps += 1
+        self.busy = True
+        threading.Event().wait(0.0005)
+        self.busy = False
+        return [1000, 1000, 1000]
+
+
+def test_grayscale_reads_do_not_interleave(latched):
+    sim, px = latched
+    px.grayscale = OverlapGrayscale()
+    px._cliff_guard_thread = threading.current_thread()
+
+    def reader():
+        for _ in range(100):
+            px.get_grayscale_data()
+
+    threads = [threading.Thread(target=reader) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert px.grayscale.overlaps == 0
+    assert px.cliff_guard_metrics()['samples'] == 300
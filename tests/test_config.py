@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+import json
+
+import pytest
+
+from picarx.config import Config, ConfigError, FileDBCompat
+
+LEGACY = """# robot-hat config and calibration value of robots
+
+picarx_dir_servo = -4.0
+picarx_dir_motor = [1, -1]
+line_reference = [1200, 1210, 1190]
+speak_volume = 80
+"""
+
+
+def test_migration_leaves_filedb_file_untouched(tmp_path):
+    legacy = tmp_path / 'picarx.conf'
+    legacy.write_text(LEGACY)
+    config = Config(legacy)
+    assert config.migrated
+    assert config.legacy_path == legacy
+    assert config.path == tmp_path / 'picarx.json'
+    assert legacy.read_text() == LEGACY
+    data = json.loads(config.path.read_text())
+    assert data['values']['picarx_dir_motor'] == [1, -1]
+    assert data['values']['speak_volume'] == '80'
+
+    config.set('picarx_dir_servo', 2)
+    assert legacy.read_text() == LEGACY
+    reopened = Config(legacy)
+    assert not reopened.migrated
+    assert reopened.path == config.path
+    assert reopened.get('picarx_dir_servo') == 2
+
+
+def test_filedb_compat_reads_and_writes_strings(tmp_path):
+    legacy = tmp_path / 'picarx.conf'
+    legacy.write_text(LEGACY)
+    db = FileDBCompat(Config(legacy))
+    assert db.get('picarx_dir_motor', default_value='[1, 1]') == '[1, -1]'
+    assert db.get('picarx_cam_pan_servo', default_value='0') == '0.0'
+    assert db.get('speak_volume') == '80'
+    assert db.get('missing', default_value='x') == 'x'
+
+    db.set('picarx_dir_servo', '3')
+    db.set('custom', 5)
+    assert db.config.get('picarx_dir_servo') == 3.0
+    assert Config(db.config.path).as_dict()['picarx_dir_servo'] == 3.0
+    assert json.loads(db.config.path.read_text())['values']['custom'] == '5'
+    with pytest.raises(ConfigError):
+        db.set('picarx_dir_motor', '[1, 2]')
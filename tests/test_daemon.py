@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+import threading
+import time
+
+import pytest
+
+from picarx.daemon import PicarxClient, PicarxDaemon
+
+
+class RecordingCar:
+    def __init__(self) -> None:
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name,) + args)
+
+    def get_distance(self) -> float:
+        return 42.0
+
+    def get_grayscale_data(self) -> list:
+        return [0, 0, 0]
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    d = PicarxDaemon(px=RecordingCar(), path=str(tmp_path / 'picarx.sock'))
+    thread = threading.Thread(target=d.serve_forever, daemon=True)
+    thread.start()
+    while d._server is None:
+        time.sleep(0.01)
+    yield d
+    d.shutdown()
+    thread.join()
+
+
+def _wait(condition):
+    deadline = time.monotonic() + 2
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_disconnect_stops_driving_client(daemon):
+    client = PicarxClient(daemon.path)
+    client.forward(30)
+    client.close()
+    _wait(lambda: daemon.px.calls[-1] == ('stop',))
+    assert daemon.px.calls[-1] == ('stop',)
+
+
+def test_disconnect_leaves_other_driver_alone(daemon):
+    watcher, driver = PicarxClient(daemon.path), PicarxClient(daemon.path)
+    watcher.forward(30)
+    driver.backward(20)
+    watcher.get_distance()
+    watcher.close()
+    _wait(lambda: daemon.clients == 1)
+    assert daemon.clients == 1
+    assert ('stop',) not in daemon.px.calls
+    driver.close()
+    _wait(lambda: daemon.px.calls[-1] == ('stop',))
+    assert daemon.px.calls[-1] == ('stop',)
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+import numpy as np
+import pytest
+
+from picarx.linetrack import CameraLineTracker
+
+
+def _stripe(cols):
+    frame = np.full((480, 640, 3), 220, dtype=np.uint8)
+    frame[:, cols[0]:cols[1]] = 20
+    return frame
+
+
+@pytest.mark.parametrize('cols, state, sign', [
+    ((500, 540), 'left', 1),    # line to the right: steer right, like get_status() 'left'
+    ((100, 140), 'right', -1),  # line to the left: steer left, like get_status() 'right'
+    ((300, 340), 'forward', 0),
+])
+def test_state_and_steering_match_grayscale_path(cols, state, sign):
+    estimate = CameraLineTracker().process(_stripe(cols))
+    assert estimate is not None
+    assert estimate.state() == state
+    angle = estimate.steering_angle()
+    if sign:
+        assert np.sign(angle) == sign and abs(angle) > 10
+    else:
+        assert abs(angle) < 5
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+import math
+
+import numpy as np
+
+from picarx.mapping import OccupancyGrid
+
+
+def test_update_ignores_failed_pings():
+    grid = OccupancyGrid(size=(50, 50))
+    for distance in (None, 0, -1, float('nan'), math.inf):
+        grid.update((0.0, 0.0, 0.0), 0, distance)
+    assert not np.any(grid.grid)
+
+
+def test_update_marks_hit():
+    grid = OccupancyGrid(size=(50, 50))
+    grid.update((0.0, 0.0, 0.0), 0, 20.0)
+    assert grid.is_occupied(20.0, 0.0)
+    assert not grid.is_occupied(10.0, 0.0)
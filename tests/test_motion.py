@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+from picarx.motion import MotionQueue
+
+
+class RacedDeque(deque):
+    """Looks non-empty once more after another thread took the last item."""
+
+    def __bool__(self) -> bool:
+        return True
+
+
+class StubCar:
+    def stop(self) -> None:
+        pass
+
+
+def test_resolve_survives_a_concurrent_drain():
+    queue = MotionQueue(StubCar(), threading.Event())
+    queue._done = RacedDeque()
+    queue._resolve()
+
+
+def test_resolve_from_two_threads_resolves_each_future_once():
+    queue = MotionQueue(StubCar(), threading.Event())
+    futures = [Future() for _ in range(2000)]
+    queue._done.extend((f, True) for f in futures)
+    threads = [threading.Thread(target=queue._resolve) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(f.result() is True for f in futures)
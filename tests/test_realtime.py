@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+import os
+
+from picarx.realtime import RealtimeSettings
+
+
+def test_revert_restores_original_affinity(monkeypatch):
+    # a thread that was already restricted to a subset of the CPUs
+    affinity = {'cpus': {2, 3}}
+    monkeypatch.setattr(os, 'sched_getaffinity', lambda pid: set(affinity['cpus']))
+    monkeypatch.setattr(os, 'sched_setaffinity', lambda pid, cpus: affinity.update(cpus=set(cpus)))
+    monkeypatch.setattr(os, 'cpu_count', lambda: 4)
+
+    rt = RealtimeSettings(priority=None, cpus={3}, gc_mode=None)
+    assert rt.apply() == {'affinity': True}
+    assert affinity['cpus'] == {3}
+    rt.revert()
+    assert affinity['cpus'] == {2, 3}
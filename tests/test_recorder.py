@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+import numpy as np
+
+from picarx.recorder import VideoRecorder
+
+
+class NoSource:
+    img = None
+
+
+class LazyWriter:
+    """Buffers everything and never creates the file."""
+
+    def __init__(self, path, fps, size) -> None:
+        self.frames = 0
+
+    def write(self, frame) -> None:
+        self.frames += 1
+
+    def release(self) -> None:
+        pass
+
+
+def test_encoding_continues_before_the_file_exists(tmp_path):
+    # fps=1 checks the segment size on every frame
+    recorder = VideoRecorder(tmp_path, source=NoSource(), fps=1, writer=LazyWriter)
+    recorder.start('t')
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    with recorder._cond:
+        recorder._queue.extend((float(i), frame) for i in range(5))
+        recorder._cond.notify_all()
+    recorder.stop()
+    assert recorder.metrics()['encoded'] == 5
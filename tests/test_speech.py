@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+import threading
+from pathlib import Path
+
+from picarx.speech import Speech
+
+
+def _held_speech(tmp_path, **kwargs):
+    started, release = threading.Event(), threading.Event()
+
+    def synthesize(text, lang, path):
+        started.set()
+        release.wait(5)
+        Path(path).write_bytes(b'')
+
+    tts = Speech(cache_dir=str(tmp_path), synthesize=synthesize, player=['true'], **kwargs)
+    # the worker picks this up and blocks, so later phrases stay queued
+    tts.say('busy')
+    assert started.wait(5)
+    return tts, release
+
+
+def _queued(tts):
+    with tts._cond:
+        return [e[2] for e in sorted(tts._queue, key=lambda e: e[1])]
+
+
+def test_drop_oldest_evicts_oldest_lowest_priority(tmp_path):
+    tts, release = _held_speech(tmp_path, max_queue=3)
+    try:
+        for text in ('a', 'b', 'c', 'd'):
+            assert tts.say(text)
+        assert _queued(tts) == ['b', 'c', 'd']
+        assert tts.say('urgent', priority=5)
+        assert _queued(tts) == ['c', 'd', 'urgent']
+        assert tts.metrics()['dropped'] == 2
+    finally:
+        release.set()
+        tts.close()
+
+
+def test_drop_new_refuses_phrase(tmp_path):
+    tts, release = _held_speech(tmp_path, max_queue=2, policy='drop_new')
+    try:
+        assert tts.say('a') and tts.say('b')
+        assert not tts.say('c')
+        assert _queued(tts) == ['a', 'b']
+    finally:
+        release.set()
+        tts.close()
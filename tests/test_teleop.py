@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+from picarx.teleop import KeyboardTeleop
+
+
+def _hold(teleop, key, start, end, interval=0.033):
+    # first press, then the terminal's autorepeat after its initial delay
+    teleop.feed(key, start)
+    t = start + 0.5
+    while t <= end:
+        teleop.feed(key, t)
+        t += interval
+
+
+def test_held_turn_keeps_driving_forward():
+    teleop = KeyboardTeleop(px=None)
+    _hold(teleop, 'w', 0.0, 1.0)
+    # pressing a takes over the autorepeat; w stops repeating
+    _hold(teleop, 'a', 1.01, 3.0)
+    assert teleop.held(2.0) == ['a']
+    speed, steering, _, _ = teleop.intent(2.0)
+    assert speed == teleop.speed and steering == -teleop.steer
+
+
+def test_turn_while_reversing():
+    teleop = KeyboardTeleop(px=None)
+    teleop.feed('s', 0.0)
+    teleop.feed('d', 0.1)
+    speed, steering, _, _ = teleop.intent(0.2)
+    assert speed == -teleop.speed and steering == teleop.steer
+
+
+def test_no_keys_no_motion():
+    teleop = KeyboardTeleop(px=None)
+    assert teleop.intent(0.0)[:2] == (0, 0)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+import numpy as np
+
+from picarx.tracking import TargetTracker
+from picarx.vision import ChangeGate, VisionControl, VisionEvents
+
+
+class FakeVilib:
+    img = None
+    detect_obj_parameter: dict = {}
+
+    def __getattr__(self, name):
+        # detector switches
+        return lambda *args: None
+
+
+class FakeCar:
+    cam_pan_current_angle = 0.0
+    cam_tilt_current_angle = 0.0
+
+
+def test_replay_marks_events_stale():
+    vision = VisionEvents(source=FakeVilib())
+    seen = []
+    vision.subscribe('face', seen.append)
+    vision.process({'human_n': 1, 'human_x': 400, 'human_y': 240, 'human_w': 40, 'human_h': 40})
+    vision.replay()
+    assert [d.stale for d in seen] == [False, True]
+    assert seen[1].seq == seen[0].seq + 1
+
+
+def test_tracker_does_not_steer_on_stale_events():
+    vision = VisionEvents(source=FakeVilib())
+    tracker = TargetTracker(FakeCar(), latency=0.0)
+    vision.subscribe('face', tracker.on_detection)
+    vision.process({'human_n': 1, 'human_x': 400, 'human_y': 240, 'human_w': 40, 'human_h': 40})
+    first = tracker.last_update
+    vision.replay()
+    assert tracker.measurements == 1
+    assert tracker.last_update >= first
+
+
+def test_gate_resumes_detectors_suspended_elsewhere():
+    control = VisionControl(FakeVilib())
+    control.face(True)
+    gate = ChangeGate(control)
+    frame = np.zeros((48, 64), dtype=np.uint8)
+    gate.observe(frame)
+    control.suspend()
+    assert gate.observe(frame + 100)
+    assert not control.suspended
+    assert gate.metrics()['suspended_time'] == 0.0